@@ -0,0 +1,64 @@
+"""Joint limit and collision checks, per call, in batches and over a planned trajectory"""
+
+import numpy as np
+from suite import benchmark, time_callable
+
+from crane.crane_service import CraneService
+from crane.models import DEFAULT_CRANE, CraneState
+from crane.motion_controller import state_to_array
+from crane.simulation import random_states
+from crane.trajectory import Trajectory
+
+N_CALLS = 5_000
+N_BATCH = 100_000
+STATE = CraneState(swing=30, lift=1.5, elbow=120, wrist=45, gripper=0.2)
+
+
+@benchmark("collision.valid_state_per_call")
+def valid_state_per_call():
+    return time_callable(
+        lambda: CraneService.is_valid_state(STATE, DEFAULT_CRANE), N_CALLS
+    )
+
+
+@benchmark("collision.valid_batch_per_state")
+def valid_batch():
+    rng = np.random.default_rng(0)
+    states = rng.uniform(
+        [-180, 0, -180, -180, 0], [180, 3, 180, 180, 0.5], size=(N_BATCH, 5)
+    )
+    result = time_callable(
+        lambda: CraneService.is_valid_state_batch(states, DEFAULT_CRANE), number=1
+    )
+    return per_row(result, N_BATCH)
+
+
+@benchmark("collision.trajectory_per_tick")
+def valid_trajectory():
+    start, end = random_states(DEFAULT_CRANE, 2, np.random.default_rng(1))
+    trajectory = Trajectory.plan(
+        start,
+        end,
+        state_to_array(DEFAULT_CRANE.max_speeds),
+        state_to_array(DEFAULT_CRANE.max_accelerations),
+    )
+    ticks = int(trajectory.duration * 100) + 1
+    result = time_callable(
+        lambda: CraneService.is_valid_trajectory(trajectory, DEFAULT_CRANE), number=1
+    )
+    return per_row(result, ticks)
+
+
+def per_row(result: dict, rows: int) -> dict:
+    """Scale a timing of one call on a batch to the time per row"""
+    for key in ("seconds_per_op", "min", "mean", "stdev"):
+        result[key] /= rows
+    result["ops_per_second"] *= rows
+    result["batch_size"] = rows
+    return result
+
+
+if __name__ == "__main__":
+    from run import main
+
+    main(["collision."])
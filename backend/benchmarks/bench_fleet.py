@@ -0,0 +1,43 @@
+"""Stepping a fleet of simulated cranes"""
+
+import numpy as np
+from suite import benchmark, time_callable
+
+from crane.fleet import Fleet
+from crane.models import DEFAULT_CRANE, CraneState
+from crane.motion_controller import array_to_state
+from crane.simulation import random_states
+
+N_CRANES = 1_000
+RATE_HZ = 100
+
+
+def moving_fleet() -> Fleet:
+    fleet = Fleet(RATE_HZ)
+    targets = random_states(DEFAULT_CRANE, N_CRANES, np.random.default_rng(0))
+    for i in range(N_CRANES):
+        fleet.add(
+            f"crane-{i}",
+            DEFAULT_CRANE,
+            CraneState(swing=0, lift=1, elbow=0, wrist=0, gripper=0),
+        )
+        fleet.set_target(f"crane-{i}", array_to_state(targets[i]), max_duration=1e9)
+    return fleet
+
+
+@benchmark(f"fleet.step_{N_CRANES}_cranes")
+def fleet_step():
+    fleet = moving_fleet()
+    return time_callable(lambda: fleet.step(1 / RATE_HZ), number=200, cranes=N_CRANES)
+
+
+@benchmark(f"fleet.xyz_{N_CRANES}_cranes")
+def fleet_xyz():
+    fleet = moving_fleet()
+    return time_callable(fleet.xyz, number=200, cranes=N_CRANES)
+
+
+if __name__ == "__main__":
+    from run import main
+
+    main(["fleet."])
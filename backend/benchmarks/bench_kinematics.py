@@ -0,0 +1,149 @@
+"""Inverse and forward kinematics, per call and in batches"""
+
+import numpy as np
+from suite import benchmark, time_callable
+
+from crane.crane_service import CraneService
+from crane.models import DEFAULT_CRANE, CraneOrientation, SwingLiftElbow, XYZPosition
+
+N_CALLS = 20_000
+N_BATCH = 100_000
+
+
+def matrix_swing_lift_elbow_to_xyz(state, crane, orientation):
+    """The original implementation, three fresh 4x4 matrices chained per call, for reference"""
+
+    def cos(angle_degrees):
+        return np.cos(angle_degrees * np.pi / 180)
+
+    def sin(angle_degrees):
+        return np.sin(angle_degrees * np.pi / 180)
+
+    mat_lift = np.array(
+        [
+            [1, 0, 0, 0],
+            [
+                0,
+                1,
+                0,
+                state.lift - crane.upper_spacer.height - crane.lower_spacer.height,
+            ],
+            [0, 0, 1, 0],
+            [0, 0, 0, 1],
+        ]
+    )
+    mat_swing = np.array(
+        [
+            [
+                cos(state.swing),
+                0,
+                sin(state.swing),
+                cos(state.swing) * crane.upper_arm.width,
+            ],
+            [0, 1, 0, 0],
+            [
+                -sin(state.swing),
+                0,
+                cos(state.swing),
+                -sin(state.swing) * crane.upper_arm.width,
+            ],
+            [0, 0, 0, 1],
+        ]
+    )
+    mat_elbow = np.array(
+        [
+            [
+                cos(state.elbow),
+                0,
+                sin(state.elbow),
+                cos(state.elbow) * crane.lower_arm.width,
+            ],
+            [0, 1, 0, 0],
+            [
+                -sin(state.elbow),
+                0,
+                cos(state.elbow),
+                -sin(state.elbow) * crane.lower_arm.width,
+            ],
+            [0, 0, 0, 1],
+        ]
+    )
+    full_matrix = (
+        CraneService.orientation_to_matrix(orientation)
+        @ mat_lift
+        @ mat_swing
+        @ mat_elbow
+    )
+    return full_matrix[0, -1], full_matrix[1, -1], full_matrix[2, -1]
+
+
+STATE = SwingLiftElbow(swing=30, lift=2, elbow=70)
+ORIENTATION = CraneOrientation(x=0.4, y=0.3, z=0.7, rotationZ=-90)
+XYZ = XYZPosition(x=1, y=1, z=0.5)
+
+
+def random_joints(n: int) -> np.ndarray:
+    return np.random.default_rng(0).uniform([-180, 0, -180], [180, 3, 180], size=(n, 3))
+
+
+@benchmark("kinematics.fk_matrix_chain_reference")
+def fk_matrix_chain():
+    return time_callable(
+        lambda: matrix_swing_lift_elbow_to_xyz(STATE, DEFAULT_CRANE, ORIENTATION),
+        N_CALLS,
+    )
+
+
+@benchmark("kinematics.fk_per_call")
+def fk_per_call():
+    return time_callable(
+        lambda: CraneService.swing_lift_elbow_to_xyz(STATE, DEFAULT_CRANE, ORIENTATION),
+        N_CALLS,
+    )
+
+
+@benchmark("kinematics.fk_batch_per_position")
+def fk_batch():
+    joints = random_joints(N_BATCH)
+    result = time_callable(
+        lambda: CraneService.swing_lift_elbow_to_xyz_batch(
+            joints, DEFAULT_CRANE, ORIENTATION
+        ),
+        number=1,
+    )
+    return per_row(result, N_BATCH)
+
+
+@benchmark("kinematics.ik_per_call")
+def ik_per_call():
+    return time_callable(
+        lambda: CraneService.xyz_to_swing_lift_elbow(XYZ, DEFAULT_CRANE, ORIENTATION),
+        N_CALLS,
+    )
+
+
+@benchmark("kinematics.ik_batch_per_position")
+def ik_batch():
+    xyz = CraneService.swing_lift_elbow_to_xyz_batch(random_joints(N_BATCH))
+    result = time_callable(
+        lambda: CraneService.xyz_to_swing_lift_elbow_batch(
+            xyz, DEFAULT_CRANE, ORIENTATION
+        ),
+        number=1,
+    )
+    return per_row(result, N_BATCH)
+
+
+def per_row(result: dict, rows: int) -> dict:
+    """Scale a timing of one call on a batch to the time per row"""
+    for key in ("seconds_per_op", "min", "mean", "stdev"):
+        result[key] /= rows
+    result["ops_per_second"] *= rows
+    result["batch_size"] = rows
+    return result
+
+
+if __name__ == "__main__":
+    from run import main
+
+    main(["kinematics."])
@@ -0,0 +1,41 @@
+"""Cost of one motion controller tick"""
+
+from suite import benchmark, time_callable
+
+from crane.models import DEFAULT_CRANE, CraneState
+from crane.motion_controller import MotionController
+
+TICK_SECONDS = 0.001
+# Far enough away that the controller is still moving after every timed tick
+FAR_TARGET = CraneState(swing=1e6, lift=3, elbow=1e6, wrist=1e6, gripper=1)
+
+
+def moving_controller() -> MotionController:
+    controller = MotionController(
+        CraneState(swing=0, lift=0, elbow=0, wrist=0, gripper=0), DEFAULT_CRANE
+    )
+    controller.plan(FAR_TARGET)
+    return controller
+
+
+@benchmark("motion.controller_tick")
+def controller_tick():
+    controller = moving_controller()
+    return time_callable(lambda: controller.step(TICK_SECONDS), number=10_000)
+
+
+@benchmark("motion.controller_tick_with_state_view")
+def controller_tick_with_state():
+    controller = moving_controller()
+
+    def tick():
+        controller.step(TICK_SECONDS)
+        return controller.state
+
+    return time_callable(tick, number=10_000)
+
+
+if __name__ == "__main__":
+    from run import main
+
+    main(["motion."])
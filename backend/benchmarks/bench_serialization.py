@@ -0,0 +1,67 @@
+"""Encoding state frames for the websocket stream"""
+
+import json
+
+from suite import benchmark, time_callable
+
+from crane.models import CraneState, Response, Status, XYZPosition
+from crane.snapshot import StateSnapshot
+from crane.wire import BinaryEncoder
+
+N_CALLS = 20_000
+
+
+def make_response() -> Response:
+    return Response(
+        craneState=CraneState(swing=12.5, lift=2, elbow=70, wrist=0, gripper=0.1),
+        xyzPosition=XYZPosition(x=1.2, y=1.5, z=-0.3),
+        status=Status.MOVING,
+        success=True,
+    )
+
+
+@benchmark("serialization.response_build")
+def response_build():
+    return time_callable(make_response, N_CALLS)
+
+
+@benchmark("serialization.response_model_dump_json_dumps")
+def response_model_dump():
+    response = make_response()
+    return time_callable(lambda: json.dumps(response.model_dump(mode="json")), N_CALLS)
+
+
+@benchmark("serialization.response_model_dump_json")
+def response_model_dump_json():
+    response = make_response()
+    return time_callable(response.model_dump_json, N_CALLS)
+
+
+def make_snapshot() -> StateSnapshot:
+    return StateSnapshot(
+        "default", (12.5, 2.0, 70.0, 0.0, 0.1, 1.2, 1.5, -0.3), Status.MOVING
+    )
+
+
+@benchmark("serialization.snapshot_build")
+def snapshot_build():
+    return time_callable(make_snapshot, N_CALLS)
+
+
+@benchmark("serialization.snapshot_json")
+def snapshot_json():
+    snapshot = make_snapshot()
+    return time_callable(snapshot.to_json, N_CALLS)
+
+
+@benchmark("serialization.snapshot_binary")
+def snapshot_binary():
+    snapshot = make_snapshot()
+    encoder = BinaryEncoder()
+    return time_callable(lambda: encoder.encode("key", snapshot), N_CALLS)
+
+
+if __name__ == "__main__":
+    from run import main
+
+    main(["serialization."])
@@ -0,0 +1,86 @@
+"""
+End-to-end state streaming throughput over /ws
+
+Runs the app on uvicorn inside this process, with the broadcaster interval and heartbeat sped up
+so that it sends a frame to every client every BROADCAST_INTERVAL_SECONDS, and counts frames received by N websocket clients. Server and clients share one event loop, so
+the result is the combined cost per delivered frame.
+"""
+
+import asyncio
+import logging
+import socket
+
+import uvicorn
+import websockets
+from suite import benchmark
+
+DURATION_SECONDS = 2.0
+BROADCAST_INTERVAL_SECONDS = 0.005
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def stream_throughput(n_clients: int) -> dict:
+    import server
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server.logger.setLevel(logging.WARNING)
+    server.broadcaster.interval = BROADCAST_INTERVAL_SECONDS
+    server.broadcaster.heartbeat_interval = BROADCAST_INTERVAL_SECONDS
+    port = free_port()
+    uvicorn_server = uvicorn.Server(
+        uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    serve_task = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.01)
+
+    loop = asyncio.get_running_loop()
+    counts = [0] * n_clients
+
+    async def client(i: int) -> None:
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws") as websocket:
+            end = loop.time() + DURATION_SECONDS
+            while (remaining := end - loop.time()) > 0:
+                try:
+                    await asyncio.wait_for(websocket.recv(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                counts[i] += 1
+
+    await asyncio.gather(*(client(i) for i in range(n_clients)))
+    uvicorn_server.should_exit = True
+    await serve_task
+
+    frames = sum(counts)
+    frames_per_second = frames / DURATION_SECONDS
+    return {
+        "seconds_per_op": 1 / frames_per_second,
+        "min": 1 / frames_per_second,
+        "mean": 1 / frames_per_second,
+        "stdev": 0.0,
+        "ops_per_second": frames_per_second,
+        "clients": n_clients,
+        "slowest_client_frames": min(counts),
+        "fastest_client_frames": max(counts),
+    }
+
+
+@benchmark("websocket.stream_10_clients_per_frame")
+def stream_10_clients():
+    return asyncio.run(stream_throughput(10))
+
+
+@benchmark("websocket.stream_100_clients_per_frame")
+def stream_100_clients():
+    return asyncio.run(stream_throughput(100))
+
+
+if __name__ == "__main__":
+    from run import main
+
+    main(["websocket."])
@@ -0,0 +1,423 @@
+"""
+Load test the /ws endpoint with many concurrent websocket clients
+
+Viewers only receive state frames, and record when each arrives. Commanders each drive one
+crane with bursts of crane_state or xyz_position commands, alternating between two poses on
+either side of the crane, and record the latency from the last command of a burst to the first
+frame showing the crane swing towards the new pose. Commands within a burst supersede each
+other, as a user dragging a slider would. With more commanders than cranes, commanders share
+cranes and can see each other's motion, so give every commander a crane of its own for exact
+latencies.
+
+Clients are spread across worker processes so that the clients are not the bottleneck. With
+--spawn the server is started here, on a free port with a fleet of --cranes cranes, and its CPU
+and memory use is sampled from /proc while the clients run; --server-pid samples a server that
+is already running.
+
+Run from the backend directory, for example
+    python benchmarks/loadtest.py --spawn --viewers 2000 --commanders 20 --cranes 20 \\
+        --rate 5 --burst 3 --processes 4 --duration 30 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlencode
+
+import numpy as np
+import websockets
+
+BACKEND_DIR = Path(__file__).parent.parent
+DEFAULT_CRANE_ID = "default"
+# Commanders alternate between two poses, the second with the larger swing. The xyz poses are
+# where the gripper of the default crane is in the crane_state poses, so both kinds of command
+# move the swing to the same angle and the direction of every move is known.
+CRANE_STATE_POSES = (
+    {"swing": -30, "lift": 1.5, "elbow": 45, "wrist": 0, "gripper": 0},
+    {"swing": 30, "lift": 1.5, "elbow": 45, "wrist": 0, "gripper": 0},
+)
+XYZ_POSES = (
+    {"x": 1.832, "y": 1.0, "z": 0.2412},
+    {"x": 1.1248, "y": 1.0, "z": -1.4659},
+)
+# Commands also move fleet cranes to the origin, so the xyz poses suit every crane
+ORIENTATION = {"x": 0, "y": 0, "z": 0, "rotationZ": 0}
+# Interval at which the server's CPU time and memory are sampled
+SAMPLE_INTERVAL_SECONDS = 0.5
+# Time allowed for clients still connecting, and for the last frames, at the end of a run
+GRACE_SECONDS = 2.0
+# Clients still running this long after the end of a run are abandoned as failed
+CLIENT_TIMEOUT_SECONDS = 10.0
+# Time the spawned server gets to shut down before it is killed
+SHUTDOWN_TIMEOUT_SECONDS = 10.0
+
+
+def crane_ids(count: int) -> list[str]:
+    """The default crane followed by fleet cranes crane-1 ... crane-(count - 1)"""
+    return [DEFAULT_CRANE_ID] + [f"crane-{i}" for i in range(1, count)]
+
+
+async def viewer(url: str, start: float, end: float, interarrivals: array) -> int:
+    """Receive frames until end and record the time between frames after start"""
+    frames = 0
+    last = None
+    async with websockets.connect(url, max_queue=None, close_timeout=1) as websocket:
+        while (remaining := end - time.time()) > 0:
+            try:
+                await asyncio.wait_for(websocket.recv(), remaining)
+            except asyncio.TimeoutError:
+                break
+            now = time.time()
+            if now < start:
+                continue
+            if last is not None:
+                interarrivals.append(now - last)
+            last = now
+            frames += 1
+    return frames
+
+
+async def commander(
+    url: str,
+    crane_id: str,
+    start: float,
+    end: float,
+    rate: float,
+    burst: int,
+    xyz_fraction: float,
+    rng: random.Random,
+    latencies: array,
+) -> dict[str, int]:
+    """Send bursts of commands from start until end and time the motion they cause"""
+    counts = {"commands": 0, "unanswered": 0, "errors": 0}
+    # Send time of the last command of the current burst and the swing direction it causes
+    pending: Optional[tuple[float, int]] = None
+    async with websockets.connect(url, max_queue=None, close_timeout=1) as websocket:
+
+        async def receive() -> None:
+            nonlocal pending
+            previous = None
+            async for message in websocket:
+                frame = json.loads(message)
+                if frame.get("craneId") != crane_id or "craneState" not in frame:
+                    continue
+                if frame["status"] == "error":
+                    counts["errors"] += 1
+                swing = frame["craneState"]["swing"]
+                if (
+                    pending is not None
+                    and previous is not None
+                    and frame["status"] == "moving"
+                    and (swing - previous) * pending[1] > 0
+                ):
+                    latencies.append(time.time() - pending[0])
+                    pending = None
+                previous = swing
+
+        await websocket.send(json.dumps({"type": "subscribe", "craneIds": [crane_id]}))
+        receiver = asyncio.create_task(receive())
+        await asyncio.sleep(max(start - time.time(), 0))
+        pose = 0
+        next_burst = time.time()
+        while next_burst < end:
+            await asyncio.sleep(max(next_burst - time.time(), 0))
+            if pending is not None:
+                counts["unanswered"] += 1
+            pose = 1 - pose
+            for _ in range(burst):
+                command = {"craneId": crane_id, "orientation": ORIENTATION}
+                # Small changes, so no two commands in a burst are the same
+                if rng.random() < xyz_fraction:
+                    target = dict(XYZ_POSES[pose], y=1.0 + rng.uniform(-0.05, 0.05))
+                    command.update(type="xyz_position", target=target)
+                else:
+                    lift = rng.uniform(1.45, 1.55)
+                    target = dict(CRANE_STATE_POSES[pose], lift=lift)
+                    command.update(type="crane_state", target=target)
+                await websocket.send(json.dumps(command))
+                counts["commands"] += 1
+            pending = (time.time(), 1 if pose else -1)
+            next_burst += 1 / rate
+        await asyncio.sleep(max(end - time.time(), 0) + GRACE_SECONDS / 2)
+        if pending is not None:
+            counts["unanswered"] += 1
+        receiver.cancel()
+    return counts
+
+
+def run_clients(
+    url: str,
+    viewer_url: str,
+    viewers: int,
+    commanders: list[str],
+    start: float,
+    duration: float,
+    options: dict,
+    seed: int,
+) -> dict:
+    """Run one worker's share of clients, connecting them evenly until start"""
+    latencies = array("d")
+    interarrivals = array("d")
+    end = start + duration
+    rng = random.Random(seed)
+
+    async def staggered(delay: float, client):
+        await asyncio.sleep(delay)
+        # A client the server never answers must not hold up the results of the others
+        timeout = end + GRACE_SECONDS + CLIENT_TIMEOUT_SECONDS - time.time()
+        return await asyncio.wait_for(client, max(timeout, 0))
+
+    async def run() -> list:
+        ramp = max(start - time.time() - GRACE_SECONDS / 2, 0)
+        clients = [
+            viewer(viewer_url, start, end, interarrivals) for _ in range(viewers)
+        ] + [
+            commander(
+                url,
+                crane_id,
+                start,
+                end,
+                options["rate"],
+                options["burst"],
+                options["xyz_fraction"],
+                random.Random(rng.random()),
+                latencies,
+            )
+            for crane_id in commanders
+        ]
+        return await asyncio.gather(
+            *(
+                staggered(ramp * i / max(len(clients), 1), client)
+                for i, client in enumerate(clients)
+            ),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    failures = [result for result in results if isinstance(result, BaseException)]
+    viewer_frames = [result for result in results[:viewers] if isinstance(result, int)]
+    counts = [result for result in results[viewers:] if isinstance(result, dict)]
+    return {
+        "latencies": np.frombuffer(latencies, dtype=float),
+        "interarrivals": np.frombuffer(interarrivals, dtype=float),
+        "viewer_frames": viewer_frames,
+        "failures": len(failures),
+        "failure_examples": sorted({repr(failure) for failure in failures})[:3],
+        "commands": sum(count["commands"] for count in counts),
+        "unanswered": sum(count["unanswered"] for count in counts),
+        "errors": sum(count["errors"] for count in counts),
+    }
+
+
+class ProcessSampler:
+    """CPU time and resident memory of a process, read from /proc, so Linux only"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.samples: list[tuple[float, float, int]] = []
+
+    def sample(self) -> None:
+        try:
+            with open(f"/proc/{self.pid}/stat") as stat:
+                # Fields after the parenthesized command name, utime and stime are 14 and 15
+                fields = stat.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{self.pid}/status") as status:
+                rss = next(
+                    int(line.split()[1]) * 1024
+                    for line in status
+                    if line.startswith("VmRSS:")
+                )
+        except (OSError, StopIteration):
+            return
+        cpu = (int(fields[11]) + int(fields[12])) / self.ticks
+        self.samples.append((time.time(), cpu, rss))
+
+    def summary(self, start: float, end: float) -> Optional[dict]:
+        window = [sample for sample in self.samples if start <= sample[0] <= end]
+        if len(window) < 2:
+            return None
+        (t0, cpu0, _), (t1, cpu1, _) = window[0], window[-1]
+        return {
+            "cpu_percent": 100 * (cpu1 - cpu0) / (t1 - t0),
+            "rss_start_mb": window[0][2] / 2**20,
+            "rss_peak_mb": max(sample[2] for sample in window) / 2**20,
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(port: int, cranes: int) -> subprocess.Popen:
+    env = dict(os.environ, CRANE_FLEET_SIZE=str(cranes - 1))
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "server:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError("The server exited while starting")
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("The server did not start within 30s")
+
+
+def percentiles(values: np.ndarray, scale: float = 1e3) -> Optional[dict]:
+    """Percentiles of values, in milliseconds by default"""
+    if len(values) == 0:
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99]) * scale
+    return {
+        "count": len(values),
+        "p50": p50,
+        "p90": p90,
+        "p99": p99,
+        "max": values.max() * scale,
+        "stdev": values.std() * scale,
+    }
+
+
+def summarize(chunks: list[dict], duration: float) -> dict:
+    viewer_frames = [frames for chunk in chunks for frames in chunk["viewer_frames"]]
+    return {
+        "command_latency_ms": percentiles(
+            np.concatenate([chunk["latencies"] for chunk in chunks])
+        ),
+        "frame_interarrival_ms": percentiles(
+            np.concatenate([chunk["interarrivals"] for chunk in chunks])
+        ),
+        "viewer_frames_per_second": {
+            "total": sum(viewer_frames) / duration,
+            "min_client": min(viewer_frames, default=0) / duration,
+            "max_client": max(viewer_frames, default=0) / duration,
+        },
+        "commands": sum(chunk["commands"] for chunk in chunks),
+        "unanswered_bursts": sum(chunk["unanswered"] for chunk in chunks),
+        "error_frames": sum(chunk["errors"] for chunk in chunks),
+        "failed_clients": sum(chunk["failures"] for chunk in chunks),
+        "failure_examples": sorted(
+            {example for chunk in chunks for example in chunk["failure_examples"]}
+        )[:3],
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws")
+    parser.add_argument("--spawn", action="store_true", help="Start a local server")
+    parser.add_argument("--server-pid", type=int, help="Sample this server's CPU")
+    parser.add_argument("--viewers", type=int, default=100)
+    parser.add_argument("--commanders", type=int, default=1)
+    parser.add_argument(
+        "--cranes", type=int, default=1, help="Cranes the commanders are spread over"
+    )
+    parser.add_argument("--rate", type=float, default=1.0, help="Bursts per second")
+    parser.add_argument("--burst", type=int, default=1, help="Commands per burst")
+    parser.add_argument("--xyz-fraction", type=float, default=0.5)
+    parser.add_argument("--format", choices=("json", "binary"), default="json")
+    parser.add_argument("--interpolate", action="store_true")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds to connect")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Save the results as JSON")
+    args = parser.parse_args(argv)
+    # Exit through the finally below, so that a spawned server is always stopped
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+
+    server = None
+    url, pid = args.url, args.server_pid
+    if args.spawn:
+        port = free_port()
+        server = spawn_server(port, args.cranes)
+        url, pid = f"ws://127.0.0.1:{port}/ws", server.pid
+    query = {"format": args.format}
+    if args.interpolate:
+        query["interpolate"] = "1"
+    viewer_url = f"{url}?{urlencode(query)}"
+
+    targets = crane_ids(args.cranes)
+    commanders = [targets[i % len(targets)] for i in range(args.commanders)]
+    processes = max(min(args.processes, args.viewers + args.commanders), 1)
+    start = time.time() + args.ramp + GRACE_SECONDS / 2
+    sampler = ProcessSampler(pid) if pid else None
+    options = {
+        "rate": args.rate,
+        "burst": args.burst,
+        "xyz_fraction": args.xyz_fraction,
+    }
+    try:
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [
+                pool.submit(
+                    run_clients,
+                    url,
+                    viewer_url,
+                    len(range(i, args.viewers, processes)),
+                    commanders[i::processes],
+                    start,
+                    args.duration,
+                    options,
+                    args.seed + i,
+                )
+                for i in range(processes)
+            ]
+            while not all(future.done() for future in futures):
+                if sampler:
+                    sampler.sample()
+                time.sleep(SAMPLE_INTERVAL_SECONDS)
+            chunks = [future.result() for future in futures]
+    finally:
+        if server:
+            server.terminate()
+            try:
+                server.wait(SHUTDOWN_TIMEOUT_SECONDS)
+            except subprocess.TimeoutExpired:
+                # uvicorn waits for every connection to close before it exits
+                server.kill()
+                server.wait()
+
+    results = summarize(chunks, args.duration)
+    results["server"] = (
+        sampler.summary(start, start + args.duration) if sampler else None
+    )
+    results["config"] = {
+        key: value for key, value in vars(args).items() if key != "output"
+    } | {"url": url}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
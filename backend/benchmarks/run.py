@@ -0,0 +1,101 @@
+"""
+Run the benchmark suite, save results as JSON and compare against a baseline
+
+Run from the backend directory, for example
+    python benchmarks/run.py --output baseline.json
+    python benchmarks/run.py --compare baseline.json --threshold 0.2
+Comparison exits with status 1 if any benchmark is slower than the baseline by more than the
+threshold.
+"""
+
+import argparse
+import importlib
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).parent
+# Make server.py importable for the websocket benchmarks
+sys.path.insert(1, str(BENCHMARK_DIR.parent))
+
+from suite import BENCHMARKS  # noqa: E402
+
+
+def load_benchmarks() -> None:
+    for path in sorted(BENCHMARK_DIR.glob("bench_*.py")):
+        importlib.import_module(path.stem)
+
+
+def run(patterns: list[str]) -> dict:
+    results = {}
+    for name, function in BENCHMARKS.items():
+        if patterns and not any(pattern in name for pattern in patterns):
+            continue
+        result = function()
+        results[name] = result
+        print(
+            f"{name:45s} {result['seconds_per_op'] * 1e6:12.3f} us/op"
+            f"  ({result['ops_per_second']:,.0f} ops/s)"
+        )
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Names of benchmarks more than threshold slower than the baseline"""
+    regressions = []
+    print(f"\n{'benchmark':45s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:45s} {'-':>12s} {result['seconds_per_op'] * 1e6:12.3f}   new")
+            continue
+        change = result["seconds_per_op"] / previous["seconds_per_op"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:45s} {previous['seconds_per_op'] * 1e6:12.3f}"
+            f" {result['seconds_per_op'] * 1e6:12.3f} {change:+8.1%}{flag}"
+        )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "patterns", nargs="*", help="Only run benchmarks containing these"
+    )
+    parser.add_argument("--output", type=Path, help="Save results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON file to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown relative to the baseline before flagging (default 0.2)",
+    )
+    args = parser.parse_args(argv)
+
+    load_benchmarks()
+    current = run(args.patterns)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2))
+    if args.compare:
+        regressions = compare(
+            current, json.loads(args.compare.read_text()), args.threshold
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
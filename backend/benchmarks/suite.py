@@ -0,0 +1,44 @@
+"""Registry and timing helpers shared by the benchmark modules"""
+
+import statistics
+import timeit
+from typing import Callable
+
+# Benchmark name to a function returning its measurements
+BENCHMARKS: dict[str, Callable[[], dict]] = {}
+
+
+def benchmark(name: str) -> Callable[[Callable[[], dict]], Callable[[], dict]]:
+    """Register a function returning measurements, usually from time_callable"""
+
+    def register(function: Callable[[], dict]) -> Callable[[], dict]:
+        if name in BENCHMARKS:
+            raise ValueError(f"Duplicate benchmark {name}")
+        BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def time_callable(
+    function: Callable[[], object], number: int, repeat: int = 5, **extra
+) -> dict:
+    """
+    Time number calls of function, repeat times
+
+    seconds_per_op is the median over the repeats and is what comparisons use;
+    lower is always better.
+    """
+    function()  # warm up caches and lazy initialization
+    per_op = [
+        total / number
+        for total in timeit.repeat(function, number=number, repeat=repeat)
+    ]
+    return {
+        "seconds_per_op": statistics.median(per_op),
+        "min": min(per_op),
+        "mean": statistics.mean(per_op),
+        "stdev": statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+        "ops_per_second": 1 / statistics.median(per_op),
+        **extra,
+    }
@@ -0,0 +1,182 @@
+"""
+Stateless websocket front end for running many uvicorn workers
+
+server.py owns the cranes and must run as a single process. With CRANE_BUS_PATH set it also
+serves a state bus, and any number of gateway workers connected to that bus serve /ws to clients
+with the same protocol: they stream state frames from the snapshots the motion process relays
+and forward commands to it. From within the backend directory, e.g.
+    CRANE_BUS_PATH=/tmp/crane.sock uvicorn server:app --port 8001
+    CRANE_BUS_PATH=/tmp/crane.sock uvicorn gateway:app --port 8000 --workers 4
+Orientation sensors (/ws/orientation) connect to the motion process directly.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+
+from crane.broadcaster import Subscriber
+from crane.bus import StateBusClient
+from crane.metrics import REGISTRY, monitor_event_loop
+from crane.models import (
+    DEFAULT_CRANE,
+    DEFAULT_CRANE_ID,
+    Crane,
+    CraneConfigMessage,
+    CraneOrientation,
+    MessageType,
+    SubscribeMessage,
+)
+from crane.snapshot import StateSnapshot
+from crane.streaming import (
+    EVENT_LOOP_LAG_INTERVAL_SECONDS,
+    METRICS_CONTENT_TYPE,
+    negotiate,
+    state_broadcaster,
+    state_encoder,
+    stream_state,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(process)d - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)],
+)
+logger = logging.getLogger(__name__)
+
+# Configuration, the state stream is configured in crane.streaming
+# Unix socket of the motion process
+BUS_PATH = os.environ.get("CRANE_BUS_PATH", "/tmp/crane.sock")
+# Messages that change the orientation of the default crane as seen by the sending client
+ORIENTED_MESSAGES = (
+    MessageType.CRANE_STATE,
+    MessageType.XYZ_POSITION,
+    MessageType.PROGRAM,
+)
+
+initial_orientation = CraneOrientation(x=0, y=0, z=0, rotationZ=0)
+# The config of every crane, as last sent by the motion process, and its JSON for new clients
+cranes: dict[str, Crane] = {}
+config_message = None
+
+
+def snapshot_states(crane_ids: set[str]) -> dict[str, StateSnapshot]:
+    """The latest relayed snapshot of each crane"""
+    return {
+        crane_id: bus.snapshots[crane_id]
+        for crane_id in crane_ids
+        if crane_id in bus.snapshots
+    }
+
+
+def apply_config(message: str) -> None:
+    """Take the crane configs of the motion process and pass them on to every client"""
+    global config_message
+    cranes.clear()
+    cranes.update(CraneConfigMessage.model_validate_json(message).cranes)
+    # Clients connected before the motion process was reached get it now
+    if config_message != message:
+        broadcaster.send_all(message)
+    config_message = message
+
+
+broadcaster = state_broadcaster(
+    snapshot_states,
+    state_encoder(lambda: cranes.get(DEFAULT_CRANE_ID, DEFAULT_CRANE)),
+)
+bus = StateBusClient(BUS_PATH, broadcaster.notify, apply_config)
+
+
+def update_subscriptions() -> None:
+    """Ask the motion process for the cranes the clients of this worker subscribe to"""
+    bus.subscribe(broadcaster.subscribed_ids())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    broadcaster.start()
+    bus.start()
+    lag_monitor = asyncio.create_task(
+        monitor_event_loop(EVENT_LOOP_LAG_INTERVAL_SECONDS)
+    )
+    yield
+    lag_monitor.cancel()
+    await bus.stop()
+    await broadcaster.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Metrics of this worker in the Prometheus text exposition format."""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+def handle_message(data: dict, subscriber: Subscriber) -> None:
+    """Keep the state of this client here and forward commands to the motion process"""
+    crane_id = data.get("craneId", DEFAULT_CRANE_ID)
+    if cranes and crane_id not in cranes:
+        logger.error(f"Unknown crane: {crane_id}")
+        return
+    message_type = data.get("type")
+    if message_type == MessageType.SUBSCRIBE:
+        message = SubscribeMessage(**data)
+        subscriber.crane_ids = {
+            crane_id
+            for crane_id in message.craneIds
+            if not cranes or crane_id in cranes
+        }
+        update_subscriptions()
+        broadcaster.notify(subscriber.crane_ids)
+        return
+    if message_type in ORIENTED_MESSAGES and crane_id == DEFAULT_CRANE_ID:
+        # Each client places the default crane itself, see server.apply_orientation
+        subscriber.orientation = CraneOrientation(**data.get("orientation", {}))
+    if not bus.send_command(data):
+        logger.error("The motion process is unreachable, dropping the command")
+    broadcaster.notify([crane_id])
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+
+    wire_format, interpolate = negotiate(websocket)
+
+    stream_task = None
+    subscriber = broadcaster.subscribe(
+        initial_orientation, {DEFAULT_CRANE_ID}, wire_format, interpolate
+    )
+    update_subscriptions()
+    try:
+        if config_message is not None:
+            await websocket.send_text(config_message)
+        stream_task = asyncio.create_task(stream_state(websocket, subscriber))
+        while True:
+            handle_message(await websocket.receive_json(), subscriber)
+    except WebSocketDisconnect:
+        pass
+    except RuntimeError as e:
+        if "disconnect" not in str(e).lower():
+            logger.error(f"RuntimeError in websocket connection: {e}", exc_info=True)
+    except Exception as e:
+        logger.error(f"Error in websocket connection: {e}", exc_info=True)
+    finally:
+        broadcaster.unsubscribe(subscriber)
+        update_subscriptions()
+        if stream_task:
+            stream_task.cancel()
+            try:
+                await stream_task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await websocket.close()
+        except (RuntimeError, WebSocketDisconnect):
+            pass
@@ -1,18 +1,59 @@
-from fastapi import FastAPI, WebSocket
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Optional
+
+import numpy as np
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from pydantic import TypeAdapter
+
+from crane.broadcaster import Subscriber
+from crane.bus import StateBusServer
+from crane.cartesian import plan_linear_move
+from crane.config import CraneConfigStore
 from crane.crane_service import CraneService, CraneState
-from crane.motion_controller import MotionController
+from crane.fleet import Fleet
+from crane.kinematics_cache import KinematicsCache
+from crane.metrics import REGISTRY, monitor_event_loop
 from crane.models import (
+    DEFAULT_CRANE_ID,
+    Crane,
     CraneOrientation,
-    MessageType,
     CraneStateMessage,
-    Response,
-    XYZPositionMessage,
-    DEFAULT_CRANE,
+    MessageType,
+    OrientationSample,
+    PathType,
+    ProgramCommand,
+    ProgramControlMessage,
+    ProgramMessage,
     Status,
+    SubscribeMessage,
+    XYZPositionMessage,
 )
-import logging
-import sys
-import asyncio
+from crane.motion_controller import MotionController
+from crane.orientation import SAMPLE_DTYPE, OrientationFilter, samples_from_models
+from crane.planning import PlanningPool, PoolKind
+from crane.program import plan_program
+from crane.recorder import Recorder, read_recording, replay
+from crane.scheduler import FixedRateScheduler
+from crane.snapshot import StateSnapshot
+from crane.streaming import (
+    EVENT_LOOP_LAG_INTERVAL_SECONDS,
+    METRICS_CONTENT_TYPE,
+    negotiate,
+    state_broadcaster,
+    state_encoder,
+    stream_state,
+)
+from crane.trajectory import ProgramTrajectory
+from crane.workspace import WorkspaceIndex
 
 # Set up logging configuration
 logging.basicConfig(
@@ -25,58 +66,342 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 # Configuration
-POLLING_INTERVAL_SECONDS = 0.1
+# Rate at which the motion controller steps the motors
+CONTROL_RATE_HZ = 1000
+# Workers that plan motions off the event loop
+PLANNING_WORKERS = int(os.environ.get("CRANE_PLANNING_WORKERS", "2"))
+# "thread" to plan on threads sharing the kinematics cache, "process" to plan on multiple cores
+PLANNING_POOL = PoolKind(os.environ.get("CRANE_PLANNING_POOL", PoolKind.THREAD.value))
+# Number of inverse and forward kinematics results kept for repeated targets
+KINEMATICS_CACHE_SIZE = 4096
+# Number of additional simulated cranes, addressed as crane-1 ... crane-N
+FLEET_SIZE = int(os.environ.get("CRANE_FLEET_SIZE", "0"))
+# Rate at which all simulated cranes are stepped
+FLEET_RATE_HZ = 100
+# Spacing between simulated cranes along x
+FLEET_SPACING = 3.0
+# Log every received message and every motion tick at DEBUG level
+TICK_LOGGING = os.environ.get("CRANE_TICK_LOGGING", "0") == "1"
+# Directory to record the motion of the default crane to, recording is off when unset
+RECORD_DIR = os.environ.get("CRANE_RECORD_DIR")
+# Recording to replay through the default crane instead of taking commands
+REPLAY_FILE = os.environ.get("CRANE_REPLAY_FILE")
+# Playback speed of the replay, relative to real time
+REPLAY_SPEED = float(os.environ.get("CRANE_REPLAY_SPEED", "1"))
+# Delay assumed for orientation samples that arrive without the time they were taken
+ORIENTATION_LATENCY_SECONDS = float(os.environ.get("CRANE_ORIENTATION_LATENCY", "0"))
+# Streamed orientations are predicted this far past now, e.g. to when a command takes effect
+ORIENTATION_LOOKAHEAD_SECONDS = float(
+    os.environ.get("CRANE_ORIENTATION_LOOKAHEAD", "0")
+)
+# Rate at which queued orientation samples are folded into the filters
+ORIENTATION_RATE_HZ = 100
+# Directory of <crane id>.json crane configs, every crane is the DEFAULT_CRANE when unset
+CONFIG_DIR = os.environ.get("CRANE_CONFIG_DIR")
+# Interval at which the config directory is checked for changed files
+CONFIG_RELOAD_INTERVAL_SECONDS = float(
+    os.environ.get("CRANE_CONFIG_RELOAD_INTERVAL", "1")
+)
+# Unix socket on which gateway workers (gateway.py) connect, off when unset
+BUS_PATH = os.environ.get("CRANE_BUS_PATH")
 
-app = FastAPI()
 initial_state = CraneState(swing=0, lift=2, elbow=0, wrist=0, gripper=0)
 initial_orientation = CraneOrientation(x=0, y=0, z=0, rotationZ=0)
-crane = DEFAULT_CRANE
-controller = MotionController(initial_state, crane)
+config_store = CraneConfigStore(Path(CONFIG_DIR) if CONFIG_DIR else None)
+config_store.load()
+controller = MotionController(
+    initial_state,
+    config_store.crane(DEFAULT_CRANE_ID),
+    CONTROL_RATE_HZ,
+    log_ticks=TICK_LOGGING,
+)
+kinematics_cache = KinematicsCache(KINEMATICS_CACHE_SIZE)
+orientation_filter = OrientationFilter(ORIENTATION_LATENCY_SECONDS)
+orientation_samples = TypeAdapter(list[OrientationSample])
+fleet = Fleet(FLEET_RATE_HZ)
+for i in range(1, FLEET_SIZE + 1):
+    fleet.add(
+        f"crane-{i}",
+        config_store.crane(f"crane-{i}"),
+        initial_state,
+        CraneOrientation(x=i * FLEET_SPACING, y=0, z=0, rotationZ=0),
+    )
 
 
 class StateManager:
     def __init__(self):
         self.error_state = None
         self.error_message = None
-        self.previous_state = None
 
 
-state_manager = StateManager()
+state_managers: defaultdict[str, StateManager] = defaultdict(StateManager)
+state_manager = state_managers[DEFAULT_CRANE_ID]
+
+
+def is_known_crane(crane_id: str) -> bool:
+    return crane_id == DEFAULT_CRANE_ID or crane_id in fleet
+
+
+def get_crane(crane_id: str) -> Crane:
+    return controller.crane if crane_id == DEFAULT_CRANE_ID else fleet.crane(crane_id)
+
+
+def crane_ids() -> list[str]:
+    return [DEFAULT_CRANE_ID, *fleet.ids]
+
+
+def get_state(crane_id: str) -> CraneState:
+    return controller.state if crane_id == DEFAULT_CRANE_ID else fleet.state(crane_id)
+
+
+def current_orientation(crane_id: str, commanded: CraneOrientation) -> CraneOrientation:
+    """The filtered sensor orientation of a crane while it streams one, else the commanded one"""
+    estimate = orientation_filter.estimate(
+        crane_id, time.time() + ORIENTATION_LOOKAHEAD_SECONDS
+    )
+    return commanded if estimate is None else estimate
+
+
+def snapshot_fleet(crane_ids: list[str]) -> dict[str, StateSnapshot]:
+    """Snapshot simulated cranes with a single vectorized forward kinematics call."""
+    rows = fleet.rows(crane_ids)
+    values = np.hstack([fleet.positions[rows], fleet.xyz(rows)]).tolist()
+    now = time.monotonic()
+    snapshots = {}
+    for crane_id, row_values, moving, version in zip(
+        crane_ids, values, fleet.moving[rows].tolist(), fleet.versions[rows].tolist()
+    ):
+        manager = state_managers[crane_id]
+        status = Status.MOVING if moving else Status.STOPPED
+        snapshots[crane_id] = StateSnapshot(
+            crane_id,
+            tuple(row_values),
+            manager.error_state or status,
+            manager.error_state is None,
+            manager.error_message,
+            version=version,
+            time=now,
+        )
+    return snapshots
+
+
+def snapshot_states(crane_ids: set[str]) -> dict[str, StateSnapshot]:
+    """Snapshot every subscribed crane once per tick, shared by all clients."""
+    snapshots = snapshot_fleet(
+        [crane_id for crane_id in crane_ids if crane_id in fleet]
+    )
+    if DEFAULT_CRANE_ID in crane_ids:
+        snapshots[DEFAULT_CRANE_ID] = snapshot_state()
+    return snapshots
+
+
+def snapshot_state() -> StateSnapshot:
+    """Snapshot the state of the default crane."""
+    if state_manager.error_state:
+        status = state_manager.error_state
+    elif controller.paused:
+        status = Status.PAUSED
+    else:
+        replaying = replay_task is not None and not replay_task.done()
+        status = Status.MOVING if controller.moving or replaying else Status.STOPPED
+    program = None
+    if isinstance(controller.trajectory, ProgramTrajectory):
+        program = (
+            controller.trajectory.step_index(controller.elapsed),
+            len(controller.trajectory.segments),
+        )
+    now = time.monotonic()
+    values = tuple(controller.positions.tolist())
+    version: Optional[int] = controller.version
+    # The controller runs on the event loop clock, which is the monotonic clock
+    segment = controller.segment()
+    if segment is not None:
+        offset, trajectory = segment
+        segment = (now - (controller.elapsed - offset), trajectory)
+    orientation = orientation_filter.estimate(DEFAULT_CRANE_ID)
+    if orientation is not None:
+        xyz = CraneService.swing_lift_elbow_to_xyz(
+            controller.state, controller.crane, orientation
+        )
+        values += (xyz.x, xyz.y, xyz.z)
+        # The streamed orientation moves the gripper without a new controller version
+        version = None
+    return StateSnapshot(
+        DEFAULT_CRANE_ID,
+        values,
+        status,
+        state_manager.error_state is None,
+        state_manager.error_message,
+        program,
+        version,
+        now,
+        segment,
+    )
+
+
+planning_pool = PlanningPool(PLANNING_WORKERS, PLANNING_POOL)
+# Inverse kinematics for the planning pool, memoized when the workers share this process
+solve_xyz_target = (
+    kinematics_cache.xyz_to_crane_state
+    if planning_pool.shares_memory
+    else CraneService.xyz_to_crane_state
+)
+broadcaster = state_broadcaster(
+    snapshot_states, state_encoder(lambda: controller.crane)
+)
+controller.listeners.append(lambda: broadcaster.notify([DEFAULT_CRANE_ID]))
+replay_task: Optional[asyncio.Task] = None
+# Commands waiting for their plans, referenced so they are not garbage collected
+command_tasks: set[asyncio.Task] = set()
+recorder: Optional[Recorder] = None
+if RECORD_DIR and not REPLAY_FILE:
+    session_recorder = Recorder(
+        Path(RECORD_DIR) / f"session-{datetime.now():%Y%m%d-%H%M%S}.crec",
+        controller.crane,
+    )
+    controller.tick_listeners.append(
+        lambda: session_recorder.record(
+            time.time(), controller.targets, controller.positions
+        )
+    )
+    recorder = session_recorder
+fleet.listeners.append(broadcaster.notify)
+
+
+async def track_orientations() -> None:
+    """Fold queued orientation samples into the filters and move the cranes they belong to"""
+    async for _ in FixedRateScheduler(ORIENTATION_RATE_HZ).ticks():
+        try:
+            updated = orientation_filter.update()
+            fleet_ids = [crane_id for crane_id in updated if crane_id in fleet]
+            if fleet_ids:
+                fleet.set_orientations(fleet_ids, orientation_filter.predict(fleet_ids))
+            if DEFAULT_CRANE_ID in updated:
+                broadcaster.notify([DEFAULT_CRANE_ID])
+        except Exception as e:
+            logger.error(f"Error filtering orientations: {e}", exc_info=True)
+
+
+def reload_crane_configs() -> dict[str, Crane]:
+    """
+    Read changed config files and return the new config of every crane whose config changed
+
+    Loads or builds the workspace index of each new config, so blocks and runs on a worker
+    thread; the configs are swapped in afterwards on the event loop by apply_crane_configs.
+    """
+    config_store.load()
+    changed = {
+        crane_id: config_store.crane(crane_id)
+        for crane_id in crane_ids()
+        if config_store.crane(crane_id) is not get_crane(crane_id)
+    }
+    for crane_config in {id(c): c for c in changed.values()}.values():
+        WorkspaceIndex.for_crane(crane_config)
+    return changed
 
 
-async def stream_state(websocket: WebSocket, orientation: CraneOrientation):
-    """Stream the current crane state at fixed intervals."""
-    state_manager.previous_state = controller.state.model_copy()
+def apply_crane_configs(changed: dict[str, Crane]) -> None:
+    """Swap in reloaded configs without interrupting motion, and send them to every client"""
+    for crane_id, crane_config in changed.items():
+        if crane_id == DEFAULT_CRANE_ID:
+            if recorder:
+                recorder.set_crane(crane_config)
+            controller.set_crane(crane_config)
+        else:
+            fleet.set_crane(crane_id, crane_config)
+    message = config_store.message(crane_ids())
+    broadcaster.send_all(message)
+    if bus_server:
+        bus_server.send_config(message)
+
+
+async def watch_crane_configs() -> None:
+    """Poll the config directory and hot reload changed crane configs"""
+    loop = asyncio.get_running_loop()
     while True:
+        await asyncio.sleep(CONFIG_RELOAD_INTERVAL_SECONDS)
         try:
-            new_state = controller.state
-            message = Response(
-                craneState=controller.state,
-                xyzPosition=CraneService.swing_lift_elbow_to_xyz(
-                    controller.state, crane, orientation
-                ),
-                success=state_manager.error_state is None,
-                status=state_manager.error_state
-                if state_manager.error_state
-                else (
-                    Status.MOVING
-                    if new_state != state_manager.previous_state
-                    else Status.STOPPED
-                ),
-                errorMessage=state_manager.error_message,
-            )
-            await websocket.send_json(message.model_dump())
-            state_manager.previous_state = new_state.model_copy()
-            await asyncio.sleep(POLLING_INTERVAL_SECONDS)
+            changed = await loop.run_in_executor(None, reload_crane_configs)
+            if changed:
+                logger.info(f"Reloaded the configs of {sorted(changed)}")
+                apply_crane_configs(changed)
         except Exception as e:
-            logger.error(f"Error in state stream: {e}", exc_info=True)
-            break
+            logger.error(f"Error reloading crane configs: {e}", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load or build the workspace index of every crane config before taking commands
+    loop = asyncio.get_running_loop()
+    for crane_config in {id(c): c for c in map(get_crane, crane_ids())}.values():
+        await loop.run_in_executor(None, WorkspaceIndex.for_crane, crane_config)
+    broadcaster.start()
+    fleet.start()
+    if bus_server:
+        await bus_server.start()
+    lag_monitor = asyncio.create_task(
+        monitor_event_loop(EVENT_LOOP_LAG_INTERVAL_SECONDS)
+    )
+    orientation_task = asyncio.create_task(track_orientations())
+    config_task = None
+    if CONFIG_DIR:
+        config_task = asyncio.create_task(watch_crane_configs())
+    global replay_task
+    if REPLAY_FILE:
+        records = read_recording(REPLAY_FILE)
+        logger.info(f"Replaying {len(records)} records from {REPLAY_FILE}")
+        replay_task = asyncio.create_task(
+            replay(records, controller.set_positions, REPLAY_SPEED)
+        )
+        # Announce the STOPPED status once the replay ends
+        replay_task.add_done_callback(lambda _: broadcaster.notify([DEFAULT_CRANE_ID]))
+    yield
+    lag_monitor.cancel()
+    orientation_task.cancel()
+    if config_task:
+        config_task.cancel()
+    if replay_task:
+        replay_task.cancel()
+    if recorder:
+        await loop.run_in_executor(None, recorder.close)
+    if bus_server:
+        await bus_server.stop()
+    planning_pool.shutdown()
+    await fleet.stop()
+    await broadcaster.stop()
+
 
+app = FastAPI(lifespan=lifespan)
 
-async def update_crane_state(target_state: CraneState) -> None:
-    """Update the crane state without sending updates."""
-    logger.info(f"Moving to target state: {target_state.__dict__}")
-    await controller.apply_motion(target_state)
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+async def update_crane_state(
+    target_state: CraneState, crane_id: str = DEFAULT_CRANE_ID
+) -> bool:
+    """Update the crane state without sending updates. Returns False if the target is invalid."""
+    logger.info(f"Moving {crane_id} to target state: {target_state.__dict__}")
+    if crane_id == DEFAULT_CRANE_ID:
+        if not CraneService.is_valid_state(target_state, controller.crane):
+            return False
+        motion = await controller.apply_motion(target_state)
+        motion.add_done_callback(report_rejected_motion)
+        return True
+    return fleet.set_target(crane_id, target_state)
+
+
+def report_rejected_motion(motion: asyncio.Task) -> None:
+    """Report a move whose path collides, which is only known once it has been planned"""
+    if motion.cancelled() or motion.exception() is not None or motion.result():
+        return
+    manager = state_managers[DEFAULT_CRANE_ID]
+    manager.error_state = Status.ERROR
+    manager.error_message = "Path to the target collides or leaves the motor limits"
+    broadcaster.notify([DEFAULT_CRANE_ID])
 
 
 async def handle_crane_state_message(message: CraneStateMessage) -> None:
@@ -87,24 +412,255 @@ async def handle_crane_state_message(message: CraneStateMessage) -> None:
         wrist=message.target.wrist,
         gripper=message.target.gripper,
     )
-    state_manager.error_state = None
-    state_manager.error_message = None
-    await update_crane_state(target_state)
+    # A direct target supersedes any move still being planned for the crane
+    planning_pool.cancel(message.craneId)
+    manager = state_managers[message.craneId]
+    manager.error_state = None
+    manager.error_message = None
+    if not await update_crane_state(target_state, message.craneId):
+        manager.error_state = Status.ERROR
+        manager.error_message = "Target state is outside the motor limits or collides"
+
+
+async def handle_linear_move(message: XYZPositionMessage) -> None:
+    manager = state_managers[message.craneId]
+    if message.craneId != DEFAULT_CRANE_ID:
+        manager.error_state = Status.ERROR
+        manager.error_message = "Linear moves are only supported for the default crane"
+        return
+    # Stop first so the plan starts where the crane actually is
+    await controller.cancel()
+    job = planning_pool.submit(
+        message.craneId,
+        plan_linear_move,
+        controller.state,
+        message.target,
+        controller.crane,
+        current_orientation(message.craneId, message.orientation),
+    )
+    trajectory = await job
+    if job.cancelled:
+        return
+    if trajectory is None:
+        logger.error("Linear path to XYZ position is out of reach or blocked")
+        manager.error_state = Status.ERROR
+        manager.error_message = "Linear path to XYZ position is out of reach or blocked"
+        return
+    manager.error_state = None
+    manager.error_message = None
+    logger.info(
+        f"Moving along {len(trajectory.waypoints)} waypoints in {trajectory.duration:.2f}s"
+    )
+    await controller.apply_trajectory(trajectory)
 
 
 async def handle_xyz_position_message(message: XYZPositionMessage) -> None:
     logger.info(f"Received XYZ position request: {message.target}")
-    target_state = CraneService.xyz_to_crane_state(
-        message.target, controller.state, message.orientation, crane
+    if message.path == PathType.LINEAR:
+        await handle_linear_move(message)
+        return
+    manager = state_managers[message.craneId]
+    orientation = current_orientation(message.craneId, message.orientation)
+    workspace = WorkspaceIndex.for_crane(get_crane(message.craneId))
+    if not workspace.contains(message.target, orientation):
+        logger.error("XYZ position is outside the workspace")
+        manager.error_state = Status.ERROR
+        manager.error_message = "XYZ position is outside the workspace"
+        return
+    job = planning_pool.submit(
+        message.craneId,
+        solve_xyz_target,
+        message.target,
+        get_state(message.craneId),
+        orientation,
+        get_crane(message.craneId),
     )
+    target_state = await job
+    if job.cancelled:
+        return
     if target_state:
-        state_manager.error_state = None
-        state_manager.error_message = None
-        await update_crane_state(target_state)
+        manager.error_state = None
+        manager.error_message = None
+        if not await update_crane_state(target_state, message.craneId):
+            manager.error_state = Status.ERROR
+            manager.error_message = "XYZ position collides"
     else:
         logger.error("Failed to convert XYZ position to crane state")
-        state_manager.error_state = Status.ERROR
-        state_manager.error_message = "Failed to convert XYZ position to crane state"
+        manager.error_state = Status.ERROR
+        manager.error_message = "Failed to convert XYZ position to crane state"
+
+
+async def handle_program_message(message: ProgramMessage) -> None:
+    manager = state_managers[message.craneId]
+    if message.craneId != DEFAULT_CRANE_ID:
+        manager.error_state = Status.ERROR
+        manager.error_message = "Programs are only supported for the default crane"
+        return
+    # Stop first so the program starts where the crane actually is
+    await controller.cancel()
+    job = planning_pool.submit(
+        message.craneId,
+        plan_program,
+        controller.state,
+        message.steps,
+        controller.crane,
+        current_orientation(message.craneId, message.orientation),
+    )
+    program = await job
+    if job.cancelled:
+        return
+    if program is None:
+        logger.error("Program has an unreachable or invalid step")
+        manager.error_state = Status.ERROR
+        manager.error_message = "Program has an unreachable or invalid step"
+        return
+    manager.error_state = None
+    manager.error_message = None
+    logger.info(f"Running {len(message.steps)} step program in {program.duration:.2f}s")
+    await controller.apply_trajectory(program)
+
+
+async def handle_program_control_message(message: ProgramControlMessage) -> None:
+    if message.craneId != DEFAULT_CRANE_ID:
+        logger.error("Programs are only supported for the default crane")
+        return
+    logger.info(f"Program command: {message.command.value}")
+    match message.command:
+        case ProgramCommand.PAUSE:
+            controller.pause()
+        case ProgramCommand.RESUME:
+            controller.resume()
+        case ProgramCommand.ABORT:
+            planning_pool.cancel(message.craneId)
+            await controller.cancel()
+
+
+async def run_planned_command(handler: Awaitable[None], crane_id: str) -> None:
+    """Handle a command that waits for planning, then announce its outcome"""
+    try:
+        await handler
+    except Exception as e:
+        logger.error(f"Error handling command for {crane_id}: {e}", exc_info=True)
+    broadcaster.notify([crane_id])
+
+
+def start_planned_command(handler: Awaitable[None], crane_id: str) -> None:
+    """Plan in the background so the client can send newer commands that supersede it"""
+    task = asyncio.create_task(run_planned_command(handler, crane_id))
+    command_tasks.add(task)
+    task.add_done_callback(command_tasks.discard)
+
+
+def handle_subscribe_message(message: SubscribeMessage, subscriber: Subscriber) -> None:
+    unknown = [
+        crane_id for crane_id in message.craneIds if not is_known_crane(crane_id)
+    ]
+    if unknown:
+        logger.error(f"Cannot subscribe to unknown cranes: {unknown}")
+    subscriber.crane_ids = {
+        crane_id for crane_id in message.craneIds if is_known_crane(crane_id)
+    }
+    broadcaster.notify(subscriber.crane_ids)
+
+
+def apply_orientation(
+    subscriber: Optional[Subscriber], crane_id: str, orientation: CraneOrientation
+) -> None:
+    if crane_id == DEFAULT_CRANE_ID:
+        # Clients of front-end workers are subscribers of the worker, which applies it
+        if subscriber is not None:
+            subscriber.orientation = orientation
+    elif not orientation_filter.live([crane_id])[0]:
+        # A streamed orientation takes precedence over the one in commands
+        fleet.set_orientation(crane_id, orientation)
+
+
+async def handle_message(data: dict, subscriber: Optional[Subscriber] = None) -> None:
+    """Handle a message from a client, or one relayed by a front-end worker without subscriber"""
+    if TICK_LOGGING:
+        logger.debug(f"Received data: {data}")
+
+    crane_id = data.get("craneId", DEFAULT_CRANE_ID)
+    if not is_known_crane(crane_id):
+        logger.error(f"Unknown crane: {crane_id}")
+        return
+    if (
+        REPLAY_FILE
+        and crane_id == DEFAULT_CRANE_ID
+        and data.get("type") != MessageType.SUBSCRIBE
+    ):
+        logger.error("The default crane is replaying a recording")
+        return
+
+    match data.get("type"):
+        case MessageType.CRANE_STATE:
+            crane_state_message = CraneStateMessage(**data)
+            apply_orientation(subscriber, crane_id, crane_state_message.orientation)
+            await handle_crane_state_message(crane_state_message)
+        case MessageType.XYZ_POSITION:
+            xyz_message = XYZPositionMessage(**data)
+            apply_orientation(subscriber, crane_id, xyz_message.orientation)
+            start_planned_command(handle_xyz_position_message(xyz_message), crane_id)
+        case MessageType.PROGRAM:
+            program_message = ProgramMessage(**data)
+            apply_orientation(subscriber, crane_id, program_message.orientation)
+            start_planned_command(handle_program_message(program_message), crane_id)
+        case MessageType.PROGRAM_CONTROL:
+            await handle_program_control_message(ProgramControlMessage(**data))
+        case MessageType.SUBSCRIBE if subscriber is not None:
+            handle_subscribe_message(SubscribeMessage(**data), subscriber)
+        case _:
+            logger.error(f"Unknown message type: {data.get('type')}")
+            return
+    # Errors and orientation changes are not motion, so announce them here
+    broadcaster.notify([crane_id])
+
+
+# Front-end workers stream state to clients and relay their commands here
+bus_server = None
+if BUS_PATH:
+    bus_server = StateBusServer(
+        BUS_PATH,
+        broadcaster,
+        handle_message,
+        lambda: config_store.message(crane_ids()),
+    )
+
+
+@app.websocket("/ws/orientation")
+async def orientation_endpoint(websocket: WebSocket):
+    """
+    High-rate orientation samples of one crane, e.g. /ws/orientation?craneId=crane-1
+
+    Binary messages carry any number of packed SAMPLE_DTYPE records, text messages a JSON list
+    of samples. Samples are only queued here; track_orientations filters them.
+    """
+    crane_id = websocket.query_params.get("craneId", DEFAULT_CRANE_ID)
+    await websocket.accept()
+    if not is_known_crane(crane_id):
+        logger.error(f"Unknown crane for orientation samples: {crane_id}")
+        await websocket.close()
+        return
+    logger.info(f"Receiving orientation samples for {crane_id}")
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                if message.get("bytes") is not None:
+                    samples = np.frombuffer(message["bytes"], SAMPLE_DTYPE)
+                else:
+                    samples = samples_from_models(
+                        orientation_samples.validate_json(message["text"])
+                    )
+            except ValueError as e:
+                logger.error(f"Invalid orientation samples for {crane_id}: {e}")
+                continue
+            orientation_filter.push(crane_id, samples)
+    except WebSocketDisconnect:
+        pass
+    logger.info(f"Orientation samples for {crane_id} ended")
 
 
 @app.websocket("/ws")
@@ -112,31 +668,26 @@ async def websocket_endpoint(websocket: WebSocket):
     logger.info("New WebSocket connection established")
     await websocket.accept()
 
+    wire_format, interpolate = negotiate(websocket)
+
     # Start the state streaming task
     stream_task = None
-    current_orientation = initial_orientation
+    subscriber = broadcaster.subscribe(
+        initial_orientation, {DEFAULT_CRANE_ID}, wire_format, interpolate
+    )
 
     try:
+        # Clients build their cranes from the configs before the first state frame
+        await websocket.send_text(config_store.message(crane_ids()))
+
         # Start the state stream
-        stream_task = asyncio.create_task(stream_state(websocket, current_orientation))
+        stream_task = asyncio.create_task(stream_state(websocket, subscriber))
 
         # Handle incoming messages
         while True:
-            data = await websocket.receive_json()
-            logger.debug(f"Received data: {data}")
-
-            match data.get("type"):
-                case MessageType.CRANE_STATE:
-                    crane_state_message = CraneStateMessage(**data)
-                    current_orientation = crane_state_message.orientation
-                    await handle_crane_state_message(crane_state_message)
-                case MessageType.XYZ_POSITION:
-                    xyz_message = XYZPositionMessage(**data)
-                    current_orientation = xyz_message.orientation
-                    await handle_xyz_position_message(xyz_message)
-                case _:
-                    logger.error(f"Unknown message type: {data.get('type')}")
-                    continue
+            await handle_message(await websocket.receive_json(), subscriber)
+    except WebSocketDisconnect:
+        logger.info("Client disconnected")
     except RuntimeError as e:
         if "disconnect" in str(e).lower():
             logger.info("Client disconnected")
@@ -148,6 +699,7 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"Error in websocket connection: {e}", exc_info=True)
     finally:
+        broadcaster.unsubscribe(subscriber)
         # Cancel the streaming task
         if stream_task:
             stream_task.cancel()
@@ -156,4 +708,8 @@ async def websocket_endpoint(websocket: WebSocket):
             except asyncio.CancelledError:
                 pass
         logger.info("Closing WebSocket connection")
-        await websocket.close()
+        try:
+            await websocket.close()
+        except (RuntimeError, WebSocketDisconnect):
+            # The client already closed the connection
+            pass
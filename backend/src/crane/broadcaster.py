@@ -0,0 +1,319 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from typing import (
+    Callable,
+    Generic,
+    Hashable,
+    Iterable,
+    Optional,
+    Protocol,
+    TypeVar,
+    Union,
+)
+
+from crane.metrics import REGISTRY
+from crane.models import CraneOrientation, WireFormat
+
+logger = logging.getLogger(__name__)
+
+
+class MotionSnapshot(Protocol):
+    """A snapshot of a crane, which tells interpolating clients when its motion changes"""
+
+    def motion_key(self) -> Optional[Hashable]: ...
+
+
+Snapshot = TypeVar("Snapshot", bound=MotionSnapshot)
+Frame = Union[str, bytes]
+# Crane, orientation and wire format that subscribers share frames by
+FrameKey = tuple[str, tuple[float, float, float, float], WireFormat]
+
+CLIENTS = REGISTRY.gauge("websocket_clients", "Connected state stream clients")
+FRAMES_SENT = REGISTRY.counter(
+    "websocket_frames_sent_total", "State frames sent to a client", ("client",)
+)
+FRAMES_DROPPED = REGISTRY.counter(
+    "websocket_frames_dropped_total",
+    "State frames dropped because a client fell behind",
+    ("client",),
+)
+SEND_SECONDS = REGISTRY.histogram(
+    "websocket_send_seconds", "Time taken to send one frame to a client", ("client",)
+)
+_client_ids = itertools.count(1)
+
+
+def orientation_key(orientation: CraneOrientation) -> tuple[float, float, float, float]:
+    return (orientation.x, orientation.y, orientation.z, orientation.rotationZ)
+
+
+class Subscriber:
+    """
+    A single client of the broadcaster
+
+    Frames are queued in a bounded queue. When the client falls behind the oldest frame is dropped,
+    so a slow client only ever sees stale frames skipped and never delays the other clients.
+    Frames sent, dropped and send latency are reported per client_id.
+
+    A client that interpolates the motion segments of frames itself only needs a frame when
+    the motion changes, and otherwise one every interpolated_interval to correct drift.
+    """
+
+    def __init__(
+        self,
+        orientation: CraneOrientation,
+        crane_ids: set[str],
+        max_queue: int,
+        wire_format: WireFormat = WireFormat.JSON,
+        interpolate: bool = False,
+    ):
+        self.orientation = orientation
+        # Key of the last frame of each crane, see StateBroadcaster.publish
+        self.frame_keys: dict[str, FrameKey] = {}
+        self.crane_ids = crane_ids
+        self.wire_format = wire_format
+        self.interpolate = interpolate
+        # Motion key and time of the last frame of each crane, for interpolating clients
+        self.motions: dict[str, tuple[Hashable, float]] = {}
+        self.queue: asyncio.Queue[Frame] = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.client_id = str(next(_client_ids))
+        self._sent = FRAMES_SENT.labels(self.client_id)
+        self._dropped = FRAMES_DROPPED.labels(self.client_id)
+        self._send_seconds = SEND_SECONDS.labels(self.client_id)
+
+    @property
+    def crane_ids(self) -> set[str]:
+        return self._crane_ids
+
+    @crane_ids.setter
+    def crane_ids(self, crane_ids: set[str]) -> None:
+        self._crane_ids = crane_ids
+        # A crane subscribed to again starts from a keyframe
+        for crane_id in self.frame_keys.keys() - crane_ids:
+            del self.frame_keys[crane_id]
+
+    def needs_frame(
+        self, crane_id: str, motion_key: Optional[Hashable], now: float, interval: float
+    ) -> bool:
+        """Whether to send a frame of a crane whose motion is now motion_key"""
+        if not self.interpolate:
+            return True
+        last = self.motions.get(crane_id)
+        if (
+            motion_key is not None
+            and last is not None
+            and last[0] == motion_key
+            and now - last[1] < interval
+        ):
+            return False
+        self.motions[crane_id] = (motion_key, now)
+        return True
+
+    def offer(self, frame: Frame) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self._dropped.inc()
+        self.queue.put_nowait(frame)
+
+    async def next_frame(self) -> Frame:
+        return await self.queue.get()
+
+    def record_send(self, seconds: float) -> None:
+        self._sent.inc()
+        self._send_seconds.observe(seconds)
+
+    def close(self) -> None:
+        """Stop reporting metrics for this client"""
+        for metric in (FRAMES_SENT, FRAMES_DROPPED, SEND_SECONDS):
+            metric.remove(self.client_id)
+
+
+class Relay(Protocol[Snapshot]):
+    """Receives the unencoded snapshots of crane_ids, e.g. to stream them to another process"""
+
+    crane_ids: set[str]
+
+    def offer(self, snapshots: dict[str, Snapshot]) -> None: ...
+
+
+class StateBroadcaster(Generic[Snapshot]):
+    """
+    Shared state stream for all websocket clients, driven by state changes
+
+    State owners call notify() with the cranes that changed. The broadcaster wakes on the first
+    change, snapshots only the changed cranes that have subscribers, and then waits interval
+    before publishing again, so a burst of changes, such as every tick of a move, is coalesced
+    into at most one frame per crane per interval. While nothing changes it stays idle, apart
+    from a heartbeat frame for each crane that has not been sent for heartbeat_interval.
+
+    Each snapshot is encoded once per distinct orientation and wire format among its
+    subscribers, and the same encoded frame is handed to every subscriber of that crane with
+    that orientation and format. The first frame a subscriber gets of a key is encoded as a
+    keyframe, so that encoders sending deltas against the previous frame of a key, such as the
+    binary wire format, never send a delta to a subscriber that missed that frame.
+    Subscribers that interpolate skip frames of snapshots whose
+    motion_key() has not changed, for up to interpolated_interval. Relays get the snapshots of
+    their cranes as they are taken, and count as subscribers of them.
+    """
+
+    def __init__(
+        self,
+        snapshot: Callable[[set[str]], dict[str, Snapshot]],
+        encode: Callable[[Snapshot, CraneOrientation, WireFormat, bool], Frame],
+        interval: float,
+        max_queue: int = 8,
+        heartbeat_interval: float = 1.0,
+        interpolated_interval: float = 0.25,
+    ):
+        self.snapshot = snapshot
+        self.encode = encode
+        self.interval = interval
+        self.max_queue = max_queue
+        self.heartbeat_interval = heartbeat_interval
+        self.interpolated_interval = interpolated_interval
+        self.subscribers: set[Subscriber] = set()
+        self.relays: set[Relay[Snapshot]] = set()
+        self.last_sent: dict[str, float] = {}
+        self._changed_ids: set[str] = set()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(
+        self,
+        orientation: CraneOrientation,
+        crane_ids: set[str],
+        wire_format: WireFormat = WireFormat.JSON,
+        interpolate: bool = False,
+    ) -> Subscriber:
+        subscriber = Subscriber(
+            orientation, crane_ids, self.max_queue, wire_format, interpolate
+        )
+        self.subscribers.add(subscriber)
+        CLIENTS.set(len(self.subscribers))
+        # New clients get the current state straight away
+        self.notify(crane_ids)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+        subscriber.close()
+        CLIENTS.set(len(self.subscribers))
+
+    def notify(self, crane_ids: Iterable[str]) -> None:
+        """Mark cranes as changed so that they are sent in the next frame"""
+        self._changed_ids.update(crane_ids)
+        self._changed.set()
+
+    def send_all(self, frame: Frame) -> None:
+        """Queue a frame that is not a state frame, such as a config change, for every client"""
+        for subscriber in self.subscribers:
+            subscriber.offer(frame)
+
+    def subscribed_ids(self) -> set[str]:
+        return set().union(
+            *(subscriber.crane_ids for subscriber in self.subscribers),
+            *(relay.crane_ids for relay in self.relays),
+        )
+
+    def publish(self, crane_ids: Optional[set[str]] = None) -> None:
+        """Take one snapshot of the given cranes, or of every subscribed crane, and fan it out"""
+        if not self.subscribers and not self.relays:
+            return
+        subscribed = self.subscribed_ids()
+        crane_ids = subscribed if crane_ids is None else crane_ids & subscribed
+        if not crane_ids:
+            return
+        snapshots = self.snapshot(crane_ids)
+        # Subscribers of each frame, and whether it has to be a keyframe for any of them
+        groups: dict[FrameKey, list[Subscriber]] = {}
+        keyframes: set[FrameKey] = set()
+        motion_keys: dict[str, Optional[Hashable]] = {}
+        now = time.monotonic()
+        for subscriber in self.subscribers:
+            for crane_id in subscriber.crane_ids:
+                snapshot = snapshots.get(crane_id)
+                if snapshot is None:
+                    continue
+                if subscriber.interpolate:
+                    if crane_id not in motion_keys:
+                        motion_keys[crane_id] = snapshot.motion_key()
+                    if not subscriber.needs_frame(
+                        crane_id, motion_keys[crane_id], now, self.interpolated_interval
+                    ):
+                        continue
+                key = (
+                    crane_id,
+                    orientation_key(subscriber.orientation),
+                    subscriber.wire_format,
+                )
+                groups.setdefault(key, []).append(subscriber)
+                if subscriber.frame_keys.get(crane_id) != key:
+                    subscriber.frame_keys[crane_id] = key
+                    keyframes.add(key)
+        for key, subscribers in groups.items():
+            crane_id, _, wire_format = key
+            frame = self.encode(
+                snapshots[crane_id],
+                subscribers[0].orientation,
+                wire_format,
+                key in keyframes,
+            )
+            for subscriber in subscribers:
+                subscriber.offer(frame)
+        for relay in self.relays:
+            relayed = {
+                crane_id: snapshots[crane_id]
+                for crane_id in relay.crane_ids
+                if crane_id in snapshots
+            }
+            if relayed:
+                relay.offer(relayed)
+        for crane_id in snapshots:
+            self.last_sent[crane_id] = now
+
+    def due_ids(self) -> set[str]:
+        """Changed cranes, plus any subscribed crane that is due a heartbeat"""
+        crane_ids, self._changed_ids = self._changed_ids, set()
+        self._changed.clear()
+        stale = time.monotonic() - self.heartbeat_interval
+        crane_ids.update(
+            crane_id
+            for crane_id in self.subscribed_ids()
+            if self.last_sent.get(crane_id, -math.inf) <= stale
+        )
+        return crane_ids
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.heartbeat_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.publish(self.due_ids())
+            except Exception as e:
+                logger.error(f"Error in state broadcast: {e}", exc_info=True)
+            # Changes during the wait are coalesced into the next frame
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            # Bind the event to the running loop, e.g. when the app is restarted in a new one
+            self._changed = asyncio.Event()
+            if self._changed_ids:
+                self._changed.set()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
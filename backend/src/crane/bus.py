@@ -0,0 +1,308 @@
+"""
+State bus between the motion process and stateless websocket front-end workers
+
+Crane state lives in one process, the motion process, which owns the motion controller, the
+fleet and planning. Running several uvicorn workers of it would give each worker a crane of its
+own, so to spread websocket clients across cores, front-end workers instead connect to the
+motion process over a Unix socket. The motion process relays the snapshots its broadcaster takes
+of the cranes each worker's clients subscribe to, and the crane configs, and workers forward
+their clients' commands back. Each worker streams to its clients from the latest snapshots with
+a broadcaster of its own, so encoding and sending frames, the bulk of the work for many
+clients, happens on the workers.
+
+Messages are a 4-byte little-endian payload length, a 1-byte BusMessage kind and the payload.
+Snapshots are pickled, which is only safe because both ends are processes of this deployment,
+and the socket should be only accessible to its user. Snapshot times are on the monotonic
+clock, which every process on the host shares.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import pickle
+import socket
+import struct
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+import numpy as np
+
+from crane.metrics import REGISTRY
+from crane.snapshot import StateSnapshot
+from crane.trajectory import Trajectory
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<IB")
+# Snapshot batches are dropped while this many bytes are waiting to be sent to a worker
+MAX_BUFFERED_BYTES = 1 << 20
+# Delay between attempts to reach the motion process
+RECONNECT_SECONDS = 0.5
+
+BUS_WORKERS = REGISTRY.gauge(
+    "crane_bus_workers", "Front-end workers connected to the motion process"
+)
+BUS_DROPPED = REGISTRY.counter(
+    "crane_bus_batches_dropped_total",
+    "Snapshot batches not relayed because a front-end worker fell behind",
+)
+
+
+class BusMessage(IntEnum):
+    # Motion process to worker: pickled dict of crane id to StateSnapshot
+    SNAPSHOTS = 1
+    # Motion process to worker: JSON of a CraneConfigMessage
+    CONFIG = 2
+    # Worker to motion process: JSON of a client message
+    COMMAND = 3
+    # Worker to motion process: JSON list of the crane ids its clients subscribe to
+    SUBSCRIBE = 4
+
+
+def write_message(
+    writer: asyncio.StreamWriter, kind: BusMessage, payload: bytes
+) -> None:
+    writer.write(HEADER.pack(len(payload), kind) + payload)
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple[BusMessage, bytes]:
+    """The next message, raising IncompleteReadError once the other end closes"""
+    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return BusMessage(kind), await reader.readexactly(length)
+
+
+class Relay:
+    """
+    A front-end worker as seen by the broadcaster of the motion process
+
+    The broadcaster hands it the snapshots of the cranes in crane_ids. A worker that falls
+    behind has whole batches dropped rather than buffered without bound; the next change or
+    heartbeat of each crane brings it up to date again.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.crane_ids: set[str] = set()
+        self.dropped = 0
+        self._dropped = BUS_DROPPED.labels()
+
+    def offer(self, snapshots: dict[str, StateSnapshot]) -> None:
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFERED_BYTES:
+            self.dropped += 1
+            self._dropped.inc()
+            return
+        write_message(
+            self.writer,
+            BusMessage.SNAPSHOTS,
+            pickle.dumps(snapshots, pickle.HIGHEST_PROTOCOL),
+        )
+
+    def send(self, kind: BusMessage, payload: bytes) -> None:
+        if not self.writer.is_closing():
+            write_message(self.writer, kind, payload)
+
+
+class StateBusServer:
+    """
+    The motion process end of the bus, accepting front-end workers on a Unix socket
+
+    Workers are added as relays of the broadcaster, sent the crane configs on connect, and their
+    commands are passed to handle_command one at a time, in the order they were sent.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        broadcaster,
+        handle_command: Callable[[dict[str, Any]], Awaitable[None]],
+        config_message: Callable[[], str],
+    ):
+        self.path = path
+        self.broadcaster = broadcaster
+        self.handle_command = handle_command
+        self.config_message = config_message
+        self.relays: set[Relay] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        # A socket left behind by a previous motion process would fail the bind
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self.path)
+            # Only the owner may connect; the socket refuses connections until it listens
+            os.chmod(self.path, 0o600)
+            self._server = await asyncio.start_unix_server(self._serve, sock=sock)
+        except BaseException:
+            sock.close()
+            raise
+        logger.info(f"State bus listening on {self.path}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for relay in list(self.relays):
+                relay.writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def send_config(self, message: str) -> None:
+        """Send reloaded crane configs to every worker"""
+        for relay in self.relays:
+            relay.send(BusMessage.CONFIG, message.encode())
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        relay = Relay(writer)
+        relay.send(BusMessage.CONFIG, self.config_message().encode())
+        self.relays.add(relay)
+        self.broadcaster.relays.add(relay)
+        BUS_WORKERS.set(len(self.relays))
+        logger.info("Front-end worker connected")
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == BusMessage.COMMAND:
+                    try:
+                        await self.handle_command(json.loads(payload))
+                    except Exception as e:
+                        logger.error(
+                            f"Error handling relayed command: {e}", exc_info=True
+                        )
+                elif kind == BusMessage.SUBSCRIBE:
+                    relay.crane_ids = set(json.loads(payload))
+                    # New subscriptions get the current state straight away
+                    self.broadcaster.notify(relay.crane_ids)
+                else:
+                    logger.error(f"Unexpected bus message from a worker: {kind.name}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.relays.discard(relay)
+            self.broadcaster.relays.discard(relay)
+            BUS_WORKERS.set(len(self.relays))
+            writer.close()
+            logger.info("Front-end worker disconnected")
+
+
+def _same_motion(
+    first: tuple[float, Trajectory], second: tuple[float, Trajectory]
+) -> bool:
+    a, b = first[1], second[1]
+    return (
+        a.duration == b.duration
+        and a.t_accel == b.t_accel
+        and np.array_equal(a.start, b.start)
+        and np.array_equal(a.end, b.end)
+    )
+
+
+class StateBusClient:
+    """
+    The front-end worker end of the bus, keeping the latest snapshot of every subscribed crane
+
+    on_snapshots is called with the ids of cranes with a new snapshot, and on_config with the
+    JSON of every config message. Reconnects until stopped, so workers may start before the
+    motion process and survive it restarting.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        on_snapshots: Callable[[list[str]], None],
+        on_config: Callable[[str], None],
+    ):
+        self.path = path
+        self.on_snapshots = on_snapshots
+        self.on_config = on_config
+        self.snapshots: dict[str, StateSnapshot] = {}
+        self.crane_ids: set[str] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._open_writer() is not None
+
+    def _open_writer(self) -> Optional[asyncio.StreamWriter]:
+        """The connection to the motion process, None while it is unreachable"""
+        if self._writer is None or self._writer.is_closing():
+            return None
+        return self._writer
+
+    def send_command(self, message: dict[str, Any]) -> bool:
+        """Forward a client message, returning False while the motion process is unreachable"""
+        writer = self._open_writer()
+        if writer is None:
+            return False
+        write_message(writer, BusMessage.COMMAND, json.dumps(message).encode())
+        return True
+
+    def subscribe(self, crane_ids: Iterable[str]) -> None:
+        """Set the cranes this worker's clients subscribe to"""
+        self.crane_ids = set(crane_ids)
+        writer = self._open_writer()
+        if writer is not None:
+            payload = json.dumps(sorted(self.crane_ids)).encode()
+            write_message(writer, BusMessage.SUBSCRIBE, payload)
+
+    def _receive_snapshots(self, snapshots: dict[str, StateSnapshot]) -> None:
+        for crane_id, snapshot in snapshots.items():
+            previous = self.snapshots.get(crane_id)
+            # Unpickling makes a new Trajectory every batch; keep the old one while the motion
+            # is the same, so interpolating clients can tell that nothing changed
+            segment = snapshot.segment
+            if (
+                previous is not None
+                and previous.segment is not None
+                and segment is not None
+                and _same_motion(previous.segment, segment)
+            ):
+                snapshot.segment = (segment[0], previous.segment[1])
+            self.snapshots[crane_id] = snapshot
+        self.on_snapshots(list(snapshots))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionError):
+                await asyncio.sleep(RECONNECT_SECONDS)
+                continue
+            logger.info(f"Connected to the motion process on {self.path}")
+            self.subscribe(self.crane_ids)
+            try:
+                while True:
+                    kind, payload = await read_message(reader)
+                    if kind == BusMessage.SNAPSHOTS:
+                        self._receive_snapshots(pickle.loads(payload))
+                    elif kind == BusMessage.CONFIG:
+                        self.on_config(payload.decode())
+                    else:
+                        logger.error(f"Unexpected bus message: {kind.name}")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.error("Lost the motion process, reconnecting")
+            finally:
+                self._writer.close()
+                self._writer = None
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
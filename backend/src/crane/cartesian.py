@@ -0,0 +1,72 @@
+import logging
+import math
+from typing import Optional
+
+import numpy as np
+
+from crane.crane_service import CraneService
+from crane.models import Crane, CraneOrientation, CraneState, XYZPosition
+from crane.motion_controller import state_to_array
+from crane.trajectory import WaypointTrajectory
+
+logger = logging.getLogger(__name__)
+
+# Default distance between waypoints of a straight-line move
+WAYPOINT_SPACING = 0.001
+
+
+def plan_linear_move(
+    current_state: CraneState,
+    target: XYZPosition,
+    crane: Crane,
+    orientation: Optional[CraneOrientation] = None,
+    spacing: float = WAYPOINT_SPACING,
+) -> Optional[WaypointTrajectory]:
+    """
+    Plan a move that takes the gripper along a straight line to the target
+
+    The line from the current position to the target is split into waypoints no more than
+    spacing apart and inverse kinematics is solved for all of them in one batch. The wrist and
+    gripper are held where they are. Returns None if any waypoint is out of reach, outside the
+    motor limits or in collision.
+    """
+    start = CraneService.swing_lift_elbow_to_xyz(current_state, crane, orientation)
+    start_xyz = np.array([start.x, start.y, start.z])
+    end_xyz = np.array([target.x, target.y, target.z])
+    n_segments = max(1, math.ceil(np.linalg.norm(end_xyz - start_xyz) / spacing))
+    fractions = np.linspace(0, 1, n_segments + 1)[:, None]
+    path = start_xyz + fractions * (end_xyz - start_xyz)
+
+    swing_lift_elbow, reachable = CraneService.xyz_to_swing_lift_elbow_batch(
+        path, crane, orientation
+    )
+    if not reachable.all():
+        first = int(np.argmin(reachable))
+        logger.warning(
+            f"Waypoint {first} of {len(path)} at {path[first].tolist()} is out of reach"
+        )
+        return None
+
+    # Keep the swing continuous along the path and on the same turn as the crane
+    swing = np.unwrap(swing_lift_elbow[:, 0], period=360)
+    swing += 360 * np.round((current_state.swing - swing[0]) / 360)
+    swing_lift_elbow[:, 0] = swing
+
+    current = state_to_array(current_state)
+    waypoints = np.empty((len(path) + 1, len(current)))
+    waypoints[:] = current
+    waypoints[1:, :3] = swing_lift_elbow
+    valid = CraneService.is_valid_state_batch(waypoints, crane)
+    if not valid.all():
+        first = int(np.argmin(valid))
+        logger.warning(
+            f"Waypoint {first} of {len(waypoints)} at {waypoints[first].tolist()} is invalid"
+        )
+        return None
+    # The first IK waypoint normally equals the current state. If the crane is in the other
+    # elbow configuration this first segment becomes a joint-space move onto the line.
+    return WaypointTrajectory.from_limits(
+        waypoints,
+        state_to_array(crane.max_speeds),
+        state_to_array(crane.max_accelerations),
+    )
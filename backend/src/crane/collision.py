@@ -0,0 +1,325 @@
+"""
+Joint limit and collision checking
+
+Every motor of a crane either turns about the vertical axis or slides along it, so every link
+is a vertical prism: a rectangle (boxes) or a circle (cylinders) in the horizontal x-z plane,
+extruded over a range of y. Two links collide exactly when their y ranges overlap and their
+footprints overlap, which reduces the 3D oriented box test to a 2D one with four separating
+axes, and cylinders to circles. All checks are vectorized over rows of motor positions.
+
+Link poses follow the transforms of the frontend Crane component. Links of the same body or of
+bodies joined by a motor touch by construction and are never checked against each other, and
+pairs of links whose relative heights never change are resolved once per crane rather than
+per state.
+"""
+
+import weakref
+from typing import Iterator, Optional, Union
+
+import numpy as np
+
+from crane.models import Box, Crane, CraneMotors, Cylinder, Obstacle
+
+# Links and the rigid body of the kinematic chain they belong to: the fixed base, then the
+# bodies moved by the swing, lift, elbow and wrist motors
+BODIES = {
+    "base": 0,
+    "column": 1,
+    "upper_arm": 2,
+    "upper_spacer": 2,
+    "lower_arm": 3,
+    "lower_spacer": 3,
+    "gripper": 4,
+}
+LINKS = tuple(BODIES)
+# Bodies from the lift onwards, whose heights relative to each other never change
+LIFTED_BODY = 2
+
+
+class Prism:
+    """
+    A vertical prism for every row: a rectangle or circle footprint over a range of y
+
+    center is (N, 2) x, z, axis and normal the (N, 2) unit vectors of the local x and z axes
+    and half the (N, 2) half width and half depth of a rectangle, or of the square around a
+    circle. radius is None for rectangles, and bound is the radius of a circle enclosing the
+    footprint, used to skip pairs that are far apart.
+    """
+
+    def __init__(
+        self,
+        center: np.ndarray,
+        bottom: np.ndarray,
+        top: np.ndarray,
+        axis: np.ndarray,
+        half: np.ndarray,
+        radius: Optional[float] = None,
+        normal: Optional[np.ndarray] = None,
+        bound: Optional[np.ndarray] = None,
+    ):
+        self.center = center
+        self.bottom = bottom
+        self.top = top
+        self.axis = axis
+        self.half = half
+        self.radius = radius
+        self.normal = perpendicular(axis) if normal is None else normal
+        if bound is None:
+            if radius is None:
+                bound = np.hypot(half[:, 0], half[:, 1])
+            else:
+                bound = np.full(len(center), radius)
+        self.bound = bound
+
+    def take(self, rows: np.ndarray) -> "Prism":
+        return Prism(
+            self.center[rows],
+            self.bottom[rows],
+            self.top[rows],
+            self.axis[rows],
+            self.half[rows],
+            self.radius,
+            self.normal[rows],
+            self.bound[rows],
+        )
+
+
+def rotation_axis(angle: np.ndarray) -> np.ndarray:
+    """Local x axis in the x-z plane after turning by angle degrees about y, as in three.js"""
+    radians = angle * np.pi / 180
+    return np.stack([np.cos(radians), -np.sin(radians)], axis=1)
+
+
+def perpendicular(axis: np.ndarray) -> np.ndarray:
+    """Local z axis for a local x axis"""
+    return np.stack([-axis[:, 1], axis[:, 0]], axis=1)
+
+
+def _dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1]
+
+
+def _extent(prism: Prism, direction: np.ndarray) -> np.ndarray:
+    """Half the length of the projection of a rectangle onto direction"""
+    return prism.half[:, 0] * np.abs(_dot(prism.axis, direction)) + prism.half[
+        :, 1
+    ] * np.abs(_dot(prism.normal, direction))
+
+
+def footprints_overlap(a: Prism, b: Prism) -> np.ndarray:
+    """Whether the footprints of a and b overlap in every row, touching does not count"""
+    offset = b.center - a.center
+    if a.radius is not None and b.radius is not None:
+        return _dot(offset, offset) < (a.radius + b.radius) ** 2
+    if a.radius is not None:
+        a, b, offset = b, a, -offset
+    if b.radius is not None:
+        # Distance from the centre of the circle to the nearest point of the rectangle
+        local = np.abs(np.stack([_dot(offset, a.axis), _dot(offset, a.normal)], axis=1))
+        outside = np.maximum(local - a.half, 0)
+        return _dot(outside, outside) < b.radius**2
+    # Separating axis test, the edge normals of both rectangles are the only candidates
+    overlap = np.ones(len(offset), dtype=bool)
+    for direction in (a.axis, a.normal, b.axis, b.normal):
+        overlap &= np.abs(_dot(offset, direction)) < _extent(a, direction) + _extent(
+            b, direction
+        )
+    return overlap
+
+
+def prisms_overlap(a: Prism, b: Prism) -> np.ndarray:
+    """
+    Whether a and b overlap in every row
+
+    Rows whose y ranges or bounding circles are apart are settled without the exact footprint
+    test, which only runs on the remaining rows.
+    """
+    offset = b.center - a.center
+    candidates = (
+        (a.bottom < b.top)
+        & (b.bottom < a.top)
+        & (_dot(offset, offset) < (a.bound + b.bound) ** 2)
+    )
+    rows = np.flatnonzero(candidates)
+    if not len(rows):
+        return candidates
+    if len(rows) < len(candidates):
+        candidates[rows] = footprints_overlap(a.take(rows), b.take(rows))
+        return candidates
+    return footprints_overlap(a, b)
+
+
+def shape_prism(
+    shape: Union[Box, Cylinder],
+    center: np.ndarray,
+    middle: np.ndarray,
+    axis: np.ndarray,
+    width: Optional[np.ndarray] = None,
+) -> Prism:
+    """A box or cylinder centred on (N, 2) center and (N,) middle height, turned to axis"""
+    bottom = middle - shape.height / 2
+    top = middle + shape.height / 2
+    if isinstance(shape, Cylinder):
+        half = np.full((len(center), 2), shape.radius)
+        return Prism(center, bottom, top, axis, half, radius=shape.radius)
+    if width is None:
+        width = np.full(len(center), shape.width)
+    half = np.stack([width / 2, np.full(len(center), shape.depth / 2)], axis=1)
+    return Prism(center, bottom, top, axis, half)
+
+
+def obstacle_prism(obstacle: Obstacle) -> Prism:
+    center = np.array([[obstacle.position.x, obstacle.position.z]])
+    middle = np.array([obstacle.position.y])
+    axis = rotation_axis(np.array([obstacle.rotationY]))
+    shape = obstacle.box or obstacle.cylinder
+    if shape is None:
+        raise ValueError("An obstacle needs exactly one of box and cylinder")
+    return shape_prism(shape, center, middle, axis)
+
+
+def limits_array(limits: Optional[CraneMotors], default: float) -> np.ndarray:
+    if limits is None:
+        return np.full(5, default)
+    return np.array(
+        [limits.swing, limits.lift, limits.elbow, limits.wrist, limits.gripper]
+    )
+
+
+class CollisionModel:
+    """
+    Joint limits, links and static obstacles of a crane, precomputed for fast checks
+
+    Built once per crane: the limit arrays, the obstacle prisms, which never move, and the list
+    of link pairs that can collide at all. Checking a state then only places the moving links
+    and runs the remaining pair tests.
+    """
+
+    _cache: dict[int, tuple[weakref.ref, "CollisionModel"]] = {}
+
+    def __init__(self, crane: Crane):
+        self.crane = crane
+        self.lower = limits_array(crane.min_positions, -np.inf)
+        self.upper = limits_array(crane.max_positions, np.inf)
+        self.obstacles = [obstacle_prism(obstacle) for obstacle in crane.obstacles]
+        self.pairs = self._possible_pairs()
+
+    @classmethod
+    def for_crane(cls, crane: Crane) -> "CollisionModel":
+        """Get the cached model for a crane, building it on first use"""
+        key = id(crane)
+        cached = cls._cache.get(key)
+        if cached is not None and cached[0]() is crane:
+            return cached[1]
+        model = cls(crane)
+        cls._cache[key] = (
+            weakref.ref(crane, lambda _: cls._cache.pop(key, None)),
+            model,
+        )
+        return model
+
+    def _possible_pairs(self) -> list[tuple[str, str]]:
+        """
+        Pairs of links that are not on the same or adjacent bodies and can collide
+
+        Links on the lift keep their heights relative to each other, so if they do not overlap
+        in height in one state they never collide.
+        """
+        links = self.links(np.zeros((1, 5)))
+        pairs = []
+        for i, first in enumerate(LINKS):
+            for second in LINKS[i + 1 :]:
+                if abs(BODIES[first] - BODIES[second]) <= 1:
+                    continue
+                a, b = links[first], links[second]
+                if (
+                    min(BODIES[first], BODIES[second]) >= LIFTED_BODY
+                    and not ((a.bottom < b.top) & (b.bottom < a.top))[0]
+                ):
+                    continue
+                pairs.append((first, second))
+        return pairs
+
+    def links(self, states: np.ndarray) -> dict[str, Prism]:
+        """Prisms of every link for an (N, 5) array of motor positions in AXES order"""
+        crane = self.crane
+        n = len(states)
+        swing, lift, elbow, wrist, gripper = states.T
+        origin = np.zeros((n, 2))
+        swing_axis = rotation_axis(swing)
+        elbow_axis = rotation_axis(swing + elbow)
+        elbow_joint = crane.upper_arm.width * swing_axis
+        wrist_joint = elbow_joint + crane.lower_arm.width * elbow_axis
+        lower_arm_height = lift - crane.upper_spacer.height
+        gripper_height = lower_arm_height - crane.lower_spacer.height
+        return {
+            "base": shape_prism(
+                crane.base, origin, np.full(n, crane.base.height / 2), swing_axis
+            ),
+            "column": shape_prism(
+                crane.column, origin, np.full(n, crane.column.height / 2), swing_axis
+            ),
+            "upper_arm": shape_prism(
+                crane.upper_arm, elbow_joint / 2, lift, swing_axis
+            ),
+            "upper_spacer": shape_prism(
+                crane.upper_spacer,
+                elbow_joint,
+                lift - crane.upper_spacer.height / 2,
+                swing_axis,
+            ),
+            "lower_arm": shape_prism(
+                crane.lower_arm,
+                elbow_joint + crane.lower_arm.width / 2 * elbow_axis,
+                lower_arm_height,
+                elbow_axis,
+            ),
+            "lower_spacer": shape_prism(
+                crane.lower_spacer,
+                wrist_joint,
+                lower_arm_height - crane.lower_spacer.height / 2,
+                elbow_axis,
+            ),
+            "gripper": shape_prism(
+                crane.gripper,
+                wrist_joint,
+                gripper_height,
+                rotation_axis(swing + elbow + wrist),
+                width=crane.gripper.width + gripper,
+            ),
+        }
+
+    def within_limits(self, states: np.ndarray) -> np.ndarray:
+        """Which rows of an (N, 5) array of motor positions are within the motor limits"""
+        return np.all((states >= self.lower) & (states <= self.upper), axis=1)
+
+    def _collisions(self, states: np.ndarray) -> Iterator[tuple[str, str, np.ndarray]]:
+        links = self.links(states)
+        for first, second in self.pairs:
+            yield first, second, prisms_overlap(links[first], links[second])
+        for index, obstacle in enumerate(self.obstacles):
+            obstacle = obstacle.take(np.zeros(len(states), dtype=np.intp))
+            for name in LINKS[1:]:
+                yield name, f"obstacle {index}", prisms_overlap(links[name], obstacle)
+
+    def colliding(self, states: np.ndarray) -> np.ndarray:
+        """Which rows of an (N, 5) array of motor positions put a link into collision"""
+        result = np.zeros(len(states), dtype=bool)
+        for _, _, hits in self._collisions(states):
+            result |= hits
+        return result
+
+    def colliding_pairs(self, states: np.ndarray) -> list[tuple[str, str]]:
+        """Names of the pairs that collide in any row, for error messages"""
+        return [(a, b) for a, b, hits in self._collisions(states) if hits.any()]
+
+    def valid(self, states: np.ndarray) -> np.ndarray:
+        """Which rows are within the motor limits and free of collisions"""
+        states = np.asarray(states, dtype=float)
+        if states.ndim != 2 or states.shape[1] != 5:
+            raise ValueError(f"Expected an (N, 5) array, got shape {states.shape}")
+        valid = self.within_limits(states)
+        rows = np.flatnonzero(valid)
+        if len(rows):
+            valid[rows] = ~self.colliding(states[rows])
+        return valid
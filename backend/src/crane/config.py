@@ -0,0 +1,103 @@
+"""
+Crane configs loaded from a directory of JSON files and reloaded when they change
+
+Each <crane id>.json file holds a Crane, e.g. default.json or crane-3.json. Cranes without a file
+of their own use default.json, or DEFAULT_CRANE without one. Every loaded Crane is compiled into
+its KinematicsContext as it is loaded, so inverse and forward kinematics never read the nested
+models on the hot path.
+
+Files are polled by modification time and size rather than watched, which needs no dependency
+and works on mounted volumes. A file that fails to parse or validate is logged and the last good
+config of its crane kept, so a half-written edit never takes a crane down, and so is the config
+of a crane whose file is deleted.
+"""
+
+import logging
+from pathlib import Path
+from typing import Iterable, Optional
+
+from crane.kinematics import KinematicsContext
+from crane.models import DEFAULT_CRANE, DEFAULT_CRANE_ID, Crane, CraneConfigMessage
+
+logger = logging.getLogger(__name__)
+
+CONFIG_SUFFIX = ".json"
+
+
+class CraneConfigStore:
+    """The current Crane of every crane id, loaded from directory when there is one"""
+
+    def __init__(
+        self, directory: Optional[Path] = None, default: Crane = DEFAULT_CRANE
+    ):
+        self.directory = directory
+        self.default = default
+        self.cranes: dict[str, Crane] = {}
+        # Modification time and size of every config file when it was last read
+        self._stamps: dict[Path, tuple[int, int]] = {}
+        # Incremented whenever a config changes
+        self.generation = 0
+        # The generation, crane ids and JSON of the last message, sent to every new client
+        self._message: Optional[tuple[tuple, str]] = None
+
+    def crane(self, crane_id: str) -> Crane:
+        """The config of a crane, falling back to the default crane's"""
+        crane = self.cranes.get(crane_id) or self.cranes.get(DEFAULT_CRANE_ID)
+        return self.default if crane is None else crane
+
+    def load(self) -> list[str]:
+        """
+        Read new and changed config files and return the ids of cranes whose config changed
+
+        Reads files, so call it from a worker thread once the event loop runs. The store is only
+        updated by assigning whole configs, so readers on other threads see the old or the new
+        config of a crane but never a mix.
+        """
+        if self.directory is None:
+            return []
+        try:
+            paths = sorted(self.directory.glob(f"*{CONFIG_SUFFIX}"))
+        except OSError as e:
+            logger.error(f"Cannot list crane configs in {self.directory}: {e}")
+            return []
+        changed = []
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                # Deleted since it was listed
+                continue
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if self._stamps.get(path) == stamp:
+                continue
+            self._stamps[path] = stamp
+            crane_id = path.stem
+            try:
+                crane = Crane.model_validate_json(path.read_bytes())
+            except (OSError, ValueError) as e:
+                logger.error(f"Invalid crane config {path}, keeping the last one: {e}")
+                continue
+            if crane == self.cranes.get(crane_id):
+                continue
+            # Compile before publishing, so no caller ever builds it on the hot path
+            KinematicsContext.for_crane(crane)
+            self.cranes[crane_id] = crane
+            self.generation += 1
+            changed.append(crane_id)
+            logger.info(f"Loaded crane config {path}")
+        for path in set(self._stamps).difference(paths):
+            del self._stamps[path]
+            logger.warning(f"Crane config {path} was removed, keeping its last config")
+        return changed
+
+    def message(self, crane_ids: Iterable[str]) -> str:
+        """The JSON of a CraneConfigMessage with the config of each crane"""
+        crane_ids = tuple(crane_ids)
+        # Keyed before reading the configs, so a reload while building it is never cached
+        key = (self.generation, crane_ids)
+        if self._message is None or self._message[0] != key:
+            message = CraneConfigMessage(
+                cranes={crane_id: self.crane(crane_id) for crane_id in crane_ids}
+            )
+            self._message = (key, message.model_dump_json())
+        return self._message[1]
@@ -1,25 +1,102 @@
-import math
-from typing import Optional
 import logging
+import math
+from typing import Optional, Protocol, Sequence, Union
+
 import numpy as np
+
+from crane.collision import CollisionModel
+from crane.kinematics import KinematicsContext
+from crane.metrics import REGISTRY
 from crane.models import (
+    DEFAULT_CRANE,
+    Crane,
     CraneOrientation,
-    XYZPosition,
-    SwingLiftElbow,
     CraneState,
-    Crane,
-    DEFAULT_CRANE,
+    SwingLiftElbow,
+    XYZPosition,
 )
+from crane.trajectory import JointTrajectory
 
 logger = logging.getLogger(__name__)
 
+# A single orientation applied to every row, one orientation per row, or an
+# array of [x, y, z, rotationZ] rows
+OrientationLike = Union[CraneOrientation, Sequence[CraneOrientation], np.ndarray]
+
+
+class Joints(Protocol):
+    """Anything with swing, lift and elbow, such as SwingLiftElbow or a StateSnapshot"""
+
+    @property
+    def swing(self) -> float: ...
+
+    @property
+    def lift(self) -> float: ...
+
+    @property
+    def elbow(self) -> float: ...
+
+
+KINEMATICS_SECONDS = REGISTRY.histogram(
+    "crane_kinematics_seconds",
+    "Time spent solving inverse and forward kinematics",
+    ("direction", "mode"),
+)
+_INVERSE_SCALAR_SECONDS = KINEMATICS_SECONDS.labels("inverse", "scalar")
+_INVERSE_BATCH_SECONDS = KINEMATICS_SECONDS.labels("inverse", "batch")
+_FORWARD_SCALAR_SECONDS = KINEMATICS_SECONDS.labels("forward", "scalar")
+_FORWARD_BATCH_SECONDS = KINEMATICS_SECONDS.labels("forward", "batch")
+
+# Rate at which planned trajectories are checked, independent of the control rate so a long
+# move at 1 kHz control is not checked a thousand times a second of motion
+VALIDATION_RATE = 100.0
+
 
 class CraneService:
     @staticmethod
     def is_valid_state(state: CraneState, crane: Optional[Crane] = None) -> bool:
-        # TODO: Add real check to see if state is valid for crane
+        """Whether the state is within the motor limits and free of collisions, see collision"""
+        model = CollisionModel.for_crane(crane or DEFAULT_CRANE)
+        row = np.array(
+            [[state.swing, state.lift, state.elbow, state.wrist, state.gripper]]
+        )
+        if not model.within_limits(row)[0]:
+            logger.warning(f"State {row[0].tolist()} is outside the motor limits")
+            return False
+        pairs = model.colliding_pairs(row)
+        if pairs:
+            collisions = ", ".join(f"{a} with {b}" for a, b in pairs)
+            logger.warning(f"State {row[0].tolist()} collides: {collisions}")
+            return False
         return True
 
+    @staticmethod
+    def is_valid_state_batch(
+        states: np.ndarray, crane: Optional[Crane] = None
+    ) -> np.ndarray:
+        """Vectorized version of is_valid_state for an (N, 5) array of motor positions"""
+        return CollisionModel.for_crane(crane or DEFAULT_CRANE).valid(states)
+
+    @staticmethod
+    def is_valid_trajectory(
+        trajectory: JointTrajectory,
+        crane: Optional[Crane] = None,
+        rate: float = VALIDATION_RATE,
+    ) -> bool:
+        """Whether every tick of a trajectory at rate Hz is valid, checked in one batch"""
+        times = np.append(
+            np.arange(0, trajectory.duration, 1 / rate), trajectory.duration
+        )
+        states = trajectory.sample_batch(times)
+        valid = CraneService.is_valid_state_batch(states, crane)
+        if valid.all():
+            return True
+        first = int(np.argmin(valid))
+        logger.warning(
+            f"Trajectory is invalid {times[first]:.2f}s in at {states[first].tolist()}"
+        )
+        return False
+
     @staticmethod
     def orientation_to_matrix(orientation: CraneOrientation) -> np.ndarray:
         theta = orientation.rotationZ * np.pi / 180
@@ -55,10 +132,133 @@ class CraneService:
         )
 
     @staticmethod
+    def orientations_to_array(
+        orientation: Optional[OrientationLike], n: int
+    ) -> Optional[np.ndarray]:
+        """
+        Convert orientations to an array of [x, y, z, rotationZ] rows
+
+        The result has shape (1, 4) for a single orientation, so it broadcasts against n rows,
+        or (n, 4) for one orientation per row. None is passed through.
+        """
+        if orientation is None:
+            return None
+        if isinstance(orientation, CraneOrientation):
+            orientation = [orientation]
+        if isinstance(orientation, np.ndarray):
+            arr = np.asarray(orientation, dtype=float).reshape(-1, 4)
+        else:
+            rows = [[o.x, o.y, o.z, o.rotationZ] for o in orientation]
+            arr = np.asarray(rows, dtype=float).reshape(-1, 4)
+        if arr.shape[0] not in (1, n):
+            raise ValueError(f"Expected 1 or {n} orientations, got {arr.shape[0]}")
+        return arr
+
+    @staticmethod
+    def xyz_to_crane_frame(
+        xyz: np.ndarray, orientation: Optional[OrientationLike] = None
+    ) -> np.ndarray:
+        """Transform an (N, 3) array of world positions into the frame of the crane"""
+        xyz = np.asarray(xyz, dtype=float)
+        if xyz.ndim != 2 or xyz.shape[1] != 3:
+            raise ValueError(f"Expected an (N, 3) array, got shape {xyz.shape}")
+        orientations = CraneService.orientations_to_array(orientation, xyz.shape[0])
+        if orientations is None:
+            return xyz
+        # Same as orientation_to_inverse_matrix, expanded for every row
+        theta = orientations[:, 3] * np.pi / 180
+        cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+        dx, dy = xyz[:, 0] - orientations[:, 0], xyz[:, 1] - orientations[:, 1]
+        return np.stack(
+            [
+                cos_theta * dx + sin_theta * dy,
+                -sin_theta * dx + cos_theta * dy,
+                xyz[:, 2] - orientations[:, 2],
+            ],
+            axis=1,
+        )
+
+    @staticmethod
+    @_INVERSE_BATCH_SECONDS.time
+    def xyz_to_swing_lift_elbow_batch(
+        xyz: np.ndarray,
+        crane: Optional[Crane] = None,
+        orientation: Optional[OrientationLike] = None,
+        closest_to: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized version of xyz_to_swing_lift_elbow for an (N, 3) array of xyz positions
+
+        Returns an (N, 3) array of swing, lift, elbow and an (N,) boolean mask of reachable rows.
+        Rows that cannot be reached are NaN rather than aborting the whole batch.
+        closest_to, a swing, lift, elbow row or (N, 3) array, picks the closest branch instead of
+        elbow down, see closest_ik_branch.
+        """
+        kinematics = KinematicsContext.for_crane(crane or DEFAULT_CRANE)
+        local = CraneService.xyz_to_crane_frame(xyz, orientation)
+        x, y, z = local[:, 0], local[:, 1], local[:, 2]
+        lift = y + kinematics.lift_offset
+
+        r_sq = x**2 + z**2
+        r = np.sqrt(r_sq)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cos_phi_1 = (kinematics.upper_sq + r_sq - kinematics.lower_sq) / (
+                kinematics.two_upper * r
+            )
+            cos_phi_2 = (
+                kinematics.upper_sq + kinematics.lower_sq - r_sq
+            ) / kinematics.two_upper_lower
+        reachable = (
+            (r_sq <= kinematics.max_reach_sq)
+            & (r_sq >= kinematics.min_reach_sq)
+            & (r > 0)
+            & (np.abs(cos_phi_1) <= 1)
+            & (np.abs(cos_phi_2) <= 1)
+        )
+        cos_phi_1 = np.where(reachable, cos_phi_1, np.nan)
+        cos_phi_2 = np.where(reachable, cos_phi_2, np.nan)
+
+        # See xyz_to_swing_lift_elbow for the derivation and sign conventions
+        phi_3 = np.arctan2(-z, x) * 180 / np.pi
+        phi_1 = np.arccos(cos_phi_1) * 180 / np.pi
+        phi_2 = np.arccos(cos_phi_2) * 180 / np.pi
+        swing = phi_3 - phi_1
+        elbow = 180 - phi_2
+        lift = np.where(reachable, lift, np.nan)
+        down = np.stack([swing, lift, elbow], axis=1)
+        if closest_to is None:
+            return down, reachable
+        up = np.stack([phi_3 + phi_1, lift, -elbow], axis=1)
+        return CraneService.closest_ik_branch(down, up, closest_to), reachable
+
+    @staticmethod
+    def closest_ik_branch(
+        down: np.ndarray, up: np.ndarray, current: np.ndarray
+    ) -> np.ndarray:
+        """
+        Pick the elbow down or elbow up solution of each row, whichever is closer to current
+
+        All are (N, 3) arrays of swing, lift, elbow, current may also be a single row. Swing is
+        first moved by whole turns onto the turn nearest the current swing, so that tracking a
+        moving target never jumps between branches or by 360 degrees. Closeness is the sum of
+        the swing and elbow changes in degrees.
+        """
+        current = np.broadcast_to(np.asarray(current, dtype=float), down.shape)
+        candidates = np.stack([down, up])
+        candidates[..., 0] += 360 * np.round((current[:, 0] - candidates[..., 0]) / 360)
+        distance = np.abs(candidates[..., 0] - current[:, 0]) + np.abs(
+            candidates[..., 2] - current[:, 2]
+        )
+        choice = np.argmin(distance, axis=0)
+        return candidates[choice, np.arange(len(down))]
+
+    @staticmethod
+    @_INVERSE_SCALAR_SECONDS.time
     def xyz_to_swing_lift_elbow(
         xyz: XYZPosition,
         crane: Optional[Crane] = None,
         orientation: Optional[CraneOrientation] = None,
+        closest_to: Optional[SwingLiftElbow] = None,
     ) -> Optional[SwingLiftElbow]:
         """
         Convert an xyz position to the necessary lift, swing, and elbow
@@ -67,9 +267,10 @@ class CraneService:
         The x and z values are a two-link planar arm.
         See for example https://opentextbooks.clemson.edu/wangrobotics/chapter/inverse-kinematics/
         Be aware that when solvable, there are two solutions, corresponding to the elbow up and elbow down configurations.
-        This solution is the elbow down solution with notation following the above reference
+        This solution is the elbow down solution with notation following the above reference,
+        unless closest_to is given, in which case it is whichever solution is closest to it
         """
-        crane = crane or DEFAULT_CRANE
+        kinematics = KinematicsContext.for_crane(crane or DEFAULT_CRANE)
         # Handle the orientation of the crane by applying the inverse rotation to the xyz
         if orientation:
             matrix = CraneService.orientation_to_inverse_matrix(orientation)
@@ -77,26 +278,29 @@ class CraneService:
             xyz_arr = matrix @ xyz_arr
             xyz = XYZPosition(x=xyz_arr[0], y=xyz_arr[1], z=xyz_arr[2])
         try:
-            if (
-                xyz.x**2 + xyz.z**2
-                > (crane.upper_arm.width + crane.lower_arm.width) ** 2
-            ):
+            r_sq = xyz.x**2 + xyz.z**2
+            if not kinematics.min_reach_sq <= r_sq <= kinematics.max_reach_sq:
                 logger.warning("Target is out of reach")
                 return None
-            lift = xyz.y + crane.upper_spacer.height + crane.lower_spacer.height
+            lift = xyz.y + kinematics.lift_offset
 
-            r = (xyz.x**2 + xyz.z**2) ** 0.5
+            r = math.sqrt(r_sq)
             # Note: there is an additional negative sign here to account for the rotations being left-handed when looking in the x-z plane
             phi_3 = math.atan2(-xyz.z, xyz.x) * 180 / math.pi
-            _numerator_1 = crane.upper_arm.width**2 + r**2 - crane.lower_arm.width**2
-            _denominator_2 = 2 * crane.upper_arm.width * r
-            phi_1 = math.acos(_numerator_1 / _denominator_2) * 180 / math.pi
+            _numerator_1 = kinematics.upper_sq + r_sq - kinematics.lower_sq
+            _denominator_1 = kinematics.two_upper * r
+            phi_1 = math.acos(_numerator_1 / _denominator_1) * 180 / math.pi
             swing = phi_3 - phi_1
 
-            _numerator_2 = crane.upper_arm.width**2 + crane.lower_arm.width**2 - r**2
-            _denominator_2 = 2 * crane.upper_arm.width * crane.lower_arm.width
-            phi_2 = math.acos(_numerator_2 / _denominator_2) * 180 / math.pi
+            _numerator_2 = kinematics.upper_sq + kinematics.lower_sq - r_sq
+            phi_2 = math.acos(_numerator_2 / kinematics.two_upper_lower) * 180 / math.pi
             elbow = 180 - phi_2
+            if closest_to is not None:
+                swing, lift, elbow = CraneService.closest_ik_branch(
+                    np.array([[swing, lift, elbow]]),
+                    np.array([[phi_3 + phi_1, lift, -elbow]]),
+                    np.array([closest_to.swing, closest_to.lift, closest_to.elbow]),
+                )[0].tolist()
         except ValueError:
             logger.error(
                 "Invalid state - this should never happen and suggests calculations are wrong"
@@ -108,77 +312,50 @@ class CraneService:
         return SwingLiftElbow(swing=swing, lift=lift, elbow=elbow)
 
     @staticmethod
+    @_FORWARD_SCALAR_SECONDS.time
     def swing_lift_elbow_to_xyz(
-        state: SwingLiftElbow,
+        state: Joints,
         crane: Optional[Crane] = None,
         orientation: Optional[CraneOrientation] = None,
     ) -> XYZPosition:
-        crane = crane or DEFAULT_CRANE
-
-        def cos(angle_degrees: float) -> float:
-            return np.cos(angle_degrees * np.pi / 180)
+        """
+        Convert swing, lift and elbow to an xyz position
 
-        def sin(angle_degrees: float) -> float:
-            return np.sin(angle_degrees * np.pi / 180)
+        Equivalent to chaining orientation @ lift @ swing @ elbow transforms, evaluated in closed form.
+        See KinematicsContext for details
+        """
+        kinematics = KinematicsContext.for_crane(crane or DEFAULT_CRANE)
+        x, y, z = kinematics.position(state.swing, state.lift, state.elbow, orientation)
+        return XYZPosition(x=x, y=y, z=z)
 
-        mat_lift = np.array(
-            [
-                [1, 0, 0, 0],
-                [
-                    0,
-                    1,
-                    0,
-                    state.lift - crane.upper_spacer.height - crane.lower_spacer.height,
-                ],
-                [0, 0, 1, 0],
-                [0, 0, 0, 1],
-            ]
+    @staticmethod
+    @_FORWARD_BATCH_SECONDS.time
+    def swing_lift_elbow_to_xyz_batch(
+        swing_lift_elbow: np.ndarray,
+        crane: Optional[Crane] = None,
+        orientation: Optional[OrientationLike] = None,
+    ) -> np.ndarray:
+        """Vectorized version of swing_lift_elbow_to_xyz returning an (N, 3) array of xyz positions"""
+        swing_lift_elbow = np.asarray(swing_lift_elbow, dtype=float)
+        orientations = CraneService.orientations_to_array(
+            orientation, swing_lift_elbow.shape[0]
         )
+        kinematics = KinematicsContext.for_crane(crane or DEFAULT_CRANE)
+        return kinematics.positions(swing_lift_elbow, orientations)
 
-        mat_swing = np.array(
-            [
-                [
-                    cos(state.swing),
-                    0,
-                    sin(state.swing),
-                    cos(state.swing) * crane.upper_arm.width,
-                ],
-                [0, 1, 0, 0],
-                [
-                    -sin(state.swing),
-                    0,
-                    cos(state.swing),
-                    -sin(state.swing) * crane.upper_arm.width,
-                ],
-                [0, 0, 0, 1],
-            ]
-        )
-        mat_elbow = np.array(
-            [
-                [
-                    cos(state.elbow),
-                    0,
-                    sin(state.elbow),
-                    cos(state.elbow) * crane.upper_arm.width,
-                ],
-                [0, 1, 0, 0],
-                [
-                    -sin(state.elbow),
-                    0,
-                    cos(state.elbow),
-                    -sin(state.elbow) * crane.upper_arm.width,
-                ],
-                [0, 0, 0, 1],
-            ]
-        )
-        if orientation:
-            orientation_matrix = CraneService.orientation_to_matrix(orientation)
-            full_matrix = orientation_matrix @ mat_lift @ mat_swing @ mat_elbow
-        else:
-            full_matrix = mat_lift @ mat_swing @ mat_elbow
-        return XYZPosition(
-            x=full_matrix[0, -1], y=full_matrix[1, -1], z=full_matrix[2, -1]
+    @staticmethod
+    def swing_lift_elbow_jacobian_batch(
+        swing_lift_elbow: np.ndarray,
+        crane: Optional[Crane] = None,
+        orientation: Optional[OrientationLike] = None,
+    ) -> np.ndarray:
+        """(N, 3, 3) Jacobians of xyz with respect to swing, lift, elbow, see kinematics.jacobian"""
+        swing_lift_elbow = np.asarray(swing_lift_elbow, dtype=float)
+        orientations = CraneService.orientations_to_array(
+            orientation, swing_lift_elbow.shape[0]
         )
+        kinematics = KinematicsContext.for_crane(crane or DEFAULT_CRANE)
+        return kinematics.jacobians(swing_lift_elbow, orientations)
 
     @staticmethod
     def xyz_to_crane_state(
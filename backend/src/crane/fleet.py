@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from crane.crane_service import CraneService
+from crane.kinematics import KinematicsContext, forward_kinematics
+from crane.models import Crane, CraneOrientation, CraneState
+from crane.motion_controller import (
+    AXES,
+    TICK_LATENESS,
+    TICK_OVERRUNS,
+    TICK_SECONDS,
+    array_to_state,
+    state_to_array,
+)
+from crane.scheduler import FixedRateScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Fleet:
+    """
+    Many simulated cranes stepped together
+
+    Each crane has its own Crane config and orientation. Their motors, targets, speeds, geometry
+    and orientations are stored as structure-of-arrays with one row per crane, so a single task
+    advances every crane with one vectorized step per tick.
+    Listeners are called with the ids of cranes whose state, status or orientation changed.
+    """
+
+    def __init__(self, rate: float = 100.0):
+        self.rate = rate
+        self.ids: list[str] = []
+        self.cranes: list[Crane] = []
+        self.index: dict[str, int] = {}
+        self.positions = np.empty((0, len(AXES)))
+        self.targets = np.empty((0, len(AXES)))
+        self.max_speeds = np.empty((0, len(AXES)))
+        # upper arm length, lower arm length and lift offset of each crane
+        self.geometry = np.empty((0, 3))
+        # x, y, z and rotationZ of each crane
+        self.orientations = np.empty((0, 4))
+        self.deadlines = np.empty(0)
+        self.versions = np.empty(0, dtype=np.int64)
+        self.moving = np.empty(0, dtype=bool)
+        self.time = 0.0
+        self.listeners: list[Callable[[list[str]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, crane_id: str) -> bool:
+        return crane_id in self.index
+
+    def add(
+        self,
+        crane_id: str,
+        crane: Crane,
+        state: CraneState,
+        orientation: Optional[CraneOrientation] = None,
+    ) -> int:
+        """Add a crane at rest in the given state and return its row"""
+        if crane_id in self.index:
+            raise ValueError(f"Crane {crane_id} already exists")
+        orientation = orientation or CraneOrientation()
+        positions = state_to_array(state)
+        self.index[crane_id] = len(self.ids)
+        self.ids.append(crane_id)
+        self.cranes.append(crane)
+        self.positions = np.vstack([self.positions, positions])
+        self.targets = np.vstack([self.targets, positions])
+        self.max_speeds = np.vstack([self.max_speeds, state_to_array(crane.max_speeds)])
+        self.geometry = np.vstack(
+            [self.geometry, KinematicsContext.for_crane(crane).key()]
+        )
+        self.orientations = np.vstack(
+            [
+                self.orientations,
+                [orientation.x, orientation.y, orientation.z, orientation.rotationZ],
+            ]
+        )
+        self.deadlines = np.append(self.deadlines, np.inf)
+        self.versions = np.append(self.versions, 0)
+        self.moving = np.append(self.moving, False)
+        return self.index[crane_id]
+
+    def crane(self, crane_id: str) -> Crane:
+        return self.cranes[self.index[crane_id]]
+
+    def set_crane(self, crane_id: str, crane: Crane) -> None:
+        """Swap the config of a crane, e.g. on reload, without stopping its motion"""
+        row = self.index[crane_id]
+        self.cranes[row] = crane
+        self.max_speeds[row] = state_to_array(crane.max_speeds)
+        self.geometry[row] = KinematicsContext.for_crane(crane).key()
+        # The gripper moves with the geometry even if the motors do not
+        self.versions[row] += 1
+        self._notify([crane_id])
+
+    def state(self, crane_id: str) -> CraneState:
+        return array_to_state(self.positions[self.index[crane_id]])
+
+    def orientation(self, crane_id: str) -> CraneOrientation:
+        x, y, z, rotation = self.orientations[self.index[crane_id]].tolist()
+        return CraneOrientation(x=x, y=y, z=z, rotationZ=rotation)
+
+    def set_orientation(self, crane_id: str, orientation: CraneOrientation) -> None:
+        self.orientations[self.index[crane_id]] = [
+            orientation.x,
+            orientation.y,
+            orientation.z,
+            orientation.rotationZ,
+        ]
+        self.versions[self.index[crane_id]] += 1
+        self._notify([crane_id])
+
+    def set_orientations(self, crane_ids: list[str], orientations: np.ndarray) -> None:
+        """Vectorized set_orientation from an (N, 4) array of x, y, z, rotationZ rows"""
+        if not crane_ids:
+            return
+        rows = self.rows(crane_ids)
+        self.orientations[rows] = orientations
+        self.versions[rows] += 1
+        self._notify(list(crane_ids))
+
+    def _notify(self, crane_ids: list[str]) -> None:
+        for listener in self.listeners:
+            listener(crane_ids)
+
+    def set_target(
+        self, crane_id: str, target_state: CraneState, max_duration: float = 30.0
+    ) -> bool:
+        """Start moving a crane towards a target, replacing any motion in progress"""
+        if not CraneService.is_valid_state(target_state, self.crane(crane_id)):
+            logger.error(f"Invalid target state for crane {crane_id}")
+            return False
+        row = self.index[crane_id]
+        self.targets[row] = state_to_array(target_state)
+        self.deadlines[row] = self.time + max_duration
+        self.moving[row] = True
+        self._notify([crane_id])
+        return True
+
+    def step(self, time_diff: float) -> None:
+        """Advance every crane by time_diff seconds"""
+        # Cranes that ran out of time stop where they are
+        expired = self.deadlines <= self.time
+        self.targets[expired] = self.positions[expired]
+        self.deadlines[expired] = np.inf
+
+        delta = self.targets - self.positions
+        max_step = self.max_speeds * time_diff
+        reached = np.abs(delta) <= max_step
+        positions = np.where(
+            reached, self.targets, self.positions + np.copysign(max_step, delta)
+        )
+        changed = (positions != self.positions).any(axis=1)
+        self.positions = positions
+        self.versions += changed
+        self.time += time_diff
+        moving = np.logical_not(reached.all(axis=1))
+        # Cranes that stopped this tick report their new status even if they did not move
+        changed |= self.moving & ~moving
+        self.moving = moving
+        self.deadlines[~self.moving] = np.inf
+        if self.listeners and changed.any():
+            self._notify([self.ids[row] for row in np.flatnonzero(changed).tolist()])
+
+    def rows(self, crane_ids: Iterable[str]) -> np.ndarray:
+        return np.array([self.index[crane_id] for crane_id in crane_ids], dtype=np.intp)
+
+    def xyz(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """End effector positions of the given rows, or of every crane, as an (N, 3) array"""
+        if rows is None:
+            rows = np.arange(len(self.ids))
+        geometry = self.geometry[rows]
+        return forward_kinematics(
+            self.positions[rows][:, :3],
+            geometry[:, 0],
+            geometry[:, 1],
+            geometry[:, 2],
+            self.orientations[rows],
+        )
+
+    async def run(self) -> None:
+        scheduler = FixedRateScheduler(self.rate)
+        tick_seconds = TICK_SECONDS.labels("fleet")
+        tick_lateness = TICK_LATENESS.labels("fleet")
+        tick_overruns = TICK_OVERRUNS.labels("fleet")
+        overruns = 0
+        async for time_diff in scheduler.ticks():
+            start = time.perf_counter()
+            self.step(time_diff)
+            tick_seconds.observe(time.perf_counter() - start)
+            tick_lateness.observe(max(scheduler.lateness, 0.0))
+            tick_overruns.inc(scheduler.overruns - overruns)
+            overruns = scheduler.overruns
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
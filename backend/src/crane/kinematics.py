@@ -0,0 +1,193 @@
+import math
+import weakref
+from dataclasses import dataclass
+from typing import ClassVar, Optional, Union
+
+import numpy as np
+
+from crane.models import Crane, CraneOrientation
+
+
+@dataclass(frozen=True, slots=True)
+class KinematicsContext:
+    """
+    The kinematics of one crane geometry, compiled once for inverse and forward kinematics
+
+    Chaining the lift, swing and elbow transforms of CraneService reduces to a planar two-link arm
+    in the x-z plane plus a vertical offset:
+        x = upper * cos(swing) + lower * cos(swing + elbow)
+        y = lift - spacer heights
+        z = -(upper * sin(swing) + lower * sin(swing + elbow))
+    followed by the crane orientation (rotation about z and a translation).
+    The geometry terms, their squares and products used by inverse kinematics, and the annulus
+    of horizontal distances the arm can reach are constant for a crane, so they are read once and
+    cached per Crane. Contexts are immutable, so a reloaded crane config gets a new one while
+    planners still holding the old one keep a consistent view.
+    """
+
+    upper: float
+    lower: float
+    lift_offset: float
+    upper_sq: float
+    lower_sq: float
+    two_upper: float
+    two_upper_lower: float
+    min_reach: float
+    max_reach: float
+    min_reach_sq: float
+    max_reach_sq: float
+
+    _cache: ClassVar[dict[int, tuple[weakref.ref, "KinematicsContext"]]] = {}
+
+    @classmethod
+    def from_crane(cls, crane: Crane) -> "KinematicsContext":
+        """Compile the kinematics of a crane, see for_crane for the cached version"""
+        upper = float(crane.upper_arm.width)
+        lower = float(crane.lower_arm.width)
+        return cls(
+            upper=upper,
+            lower=lower,
+            lift_offset=float(crane.upper_spacer.height + crane.lower_spacer.height),
+            upper_sq=upper**2,
+            lower_sq=lower**2,
+            two_upper=2 * upper,
+            two_upper_lower=2 * upper * lower,
+            min_reach=abs(upper - lower),
+            max_reach=upper + lower,
+            min_reach_sq=(upper - lower) ** 2,
+            max_reach_sq=(upper + lower) ** 2,
+        )
+
+    def key(self) -> tuple[float, float, float]:
+        """The dimensions that inverse and forward kinematics depend on"""
+        return (self.upper, self.lower, self.lift_offset)
+
+    @classmethod
+    def for_crane(cls, crane: Crane) -> "KinematicsContext":
+        """Get the cached kinematics for a crane, building them on first use"""
+        key = id(crane)
+        cached = cls._cache.get(key)
+        if cached is not None and cached[0]() is crane:
+            return cached[1]
+        context = cls.from_crane(crane)
+        cls._cache[key] = (
+            weakref.ref(crane, lambda _: cls._cache.pop(key, None)),
+            context,
+        )
+        return context
+
+    def position(
+        self,
+        swing: float,
+        lift: float,
+        elbow: float,
+        orientation: Optional[CraneOrientation] = None,
+    ) -> tuple[float, float, float]:
+        """End effector position for a single joint state, using scalar math"""
+        swing_rad = swing * math.pi / 180
+        swing_elbow_rad = swing_rad + elbow * math.pi / 180
+        x = self.upper * math.cos(swing_rad) + self.lower * math.cos(swing_elbow_rad)
+        y = lift - self.lift_offset
+        z = -(self.upper * math.sin(swing_rad) + self.lower * math.sin(swing_elbow_rad))
+        if orientation is None:
+            return x, y, z
+        theta = orientation.rotationZ * math.pi / 180
+        cos_theta, sin_theta = math.cos(theta), math.sin(theta)
+        return (
+            cos_theta * x - sin_theta * y + orientation.x,
+            sin_theta * x + cos_theta * y + orientation.y,
+            z + orientation.z,
+        )
+
+    def positions(
+        self, joints: np.ndarray, orientations: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        End effector positions for an (N, 3) array of swing, lift, elbow
+
+        orientations is None or an array of [x, y, z, rotationZ] rows with shape (1, 4) or (N, 4)
+        """
+        return forward_kinematics(
+            joints, self.upper, self.lower, self.lift_offset, orientations
+        )
+
+    def jacobians(
+        self, joints: np.ndarray, orientations: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """(N, 3, 3) Jacobians of position with respect to swing, lift, elbow, see jacobian"""
+        return jacobian(joints, self.upper, self.lower, orientations)
+
+
+def forward_kinematics(
+    joints: np.ndarray,
+    upper: Union[float, np.ndarray],
+    lower: Union[float, np.ndarray],
+    lift_offset: Union[float, np.ndarray],
+    orientations: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Vectorized closed-form forward kinematics, see KinematicsContext
+
+    The geometry terms are either scalars shared by every row or (N,) arrays with one crane per row.
+    """
+    joints = np.asarray(joints, dtype=float)
+    if joints.ndim != 2 or joints.shape[1] != 3:
+        raise ValueError(f"Expected an (N, 3) array, got shape {joints.shape}")
+    swing_rad = joints[:, 0] * np.pi / 180
+    swing_elbow_rad = swing_rad + joints[:, 2] * np.pi / 180
+    x = upper * np.cos(swing_rad) + lower * np.cos(swing_elbow_rad)
+    y = joints[:, 1] - lift_offset
+    z = -(upper * np.sin(swing_rad) + lower * np.sin(swing_elbow_rad))
+    if orientations is not None:
+        theta = orientations[:, 3] * np.pi / 180
+        cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+        x, y = (
+            cos_theta * x - sin_theta * y + orientations[:, 0],
+            sin_theta * x + cos_theta * y + orientations[:, 1],
+        )
+        z = z + orientations[:, 2]
+    return np.stack([x, y, z], axis=1)
+
+
+def jacobian(
+    joints: np.ndarray,
+    upper: Union[float, np.ndarray],
+    lower: Union[float, np.ndarray],
+    orientations: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Vectorized closed-form Jacobian of forward_kinematics
+
+    Returns an (N, 3, 3) array where [n, i, j] is the derivative of x, y, z (i) with respect to
+    swing, lift, elbow (j) for row n, per degree for swing and elbow and per metre for lift.
+    Differentiating the planar arm with k = pi / 180:
+        dx/dswing = -k * (upper * sin(swing) + lower * sin(swing + elbow))
+        dx/delbow = -k * lower * sin(swing + elbow)
+        dz/dswing = -k * (upper * cos(swing) + lower * cos(swing + elbow))
+        dz/delbow = -k * lower * cos(swing + elbow)
+        dy/dlift = 1
+    Its determinant is -k**2 * upper * lower * sin(elbow), so the arm is singular when it is
+    fully stretched or folded. The orientation rotates the x and y rows.
+    """
+    joints = np.asarray(joints, dtype=float)
+    if joints.ndim != 2 or joints.shape[1] != 3:
+        raise ValueError(f"Expected an (N, 3) array, got shape {joints.shape}")
+    k = np.pi / 180
+    swing_rad = joints[:, 0] * k
+    swing_elbow_rad = swing_rad + joints[:, 2] * k
+    lower_sin = lower * np.sin(swing_elbow_rad)
+    lower_cos = lower * np.cos(swing_elbow_rad)
+    result = np.zeros((len(joints), 3, 3))
+    result[:, 0, 0] = -k * (upper * np.sin(swing_rad) + lower_sin)
+    result[:, 0, 2] = -k * lower_sin
+    result[:, 1, 1] = 1
+    result[:, 2, 0] = -k * (upper * np.cos(swing_rad) + lower_cos)
+    result[:, 2, 2] = -k * lower_cos
+    if orientations is not None:
+        theta = orientations[:, 3] * np.pi / 180
+        cos_theta = np.cos(theta)[:, None]
+        sin_theta = np.sin(theta)[:, None]
+        x_row, y_row = result[:, 0].copy(), result[:, 1].copy()
+        result[:, 0] = cos_theta * x_row - sin_theta * y_row
+        result[:, 1] = sin_theta * x_row + cos_theta * y_row
+    return result
@@ -0,0 +1,180 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from crane.crane_service import CraneService
+from crane.kinematics import KinematicsContext
+from crane.models import (
+    DEFAULT_CRANE,
+    Crane,
+    CraneOrientation,
+    CraneState,
+    SwingLiftElbow,
+    XYZPosition,
+)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        # Compute outside the lock so a slow computation does not block other threads
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def kinematic_key(crane: Crane) -> tuple[float, float, float]:
+    """The dimensions of a crane that its inverse and forward kinematics depend on"""
+    return KinematicsContext.for_crane(crane).key()
+
+
+class KinematicsCache:
+    """
+    Memoized CraneService inverse and forward kinematics
+
+    Inputs are quantized to position_quantum (distances) and angle_quantum (degrees), so repeated
+    targets such as pallet slots and home positions are solved once. Results can differ from an
+    exact solve by the effect of moving the input by up to half a quantum.
+    Keys include the crane dimensions, so changing a crane config never returns results for the
+    old one; stale entries age out of the LRU, or invalidate() drops them immediately.
+    Inverse and forward results are kept in separate LRUs of max_size each, so a run of
+    one-off forward solves, such as of a moving crane, never evicts the inverse solutions.
+    Safe to share between concurrent handlers and planning threads.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 4096,
+        position_quantum: float = 1e-6,
+        angle_quantum: float = 1e-6,
+    ):
+        self.position_quantum = position_quantum
+        self.angle_quantum = angle_quantum
+        self.inverse = LRUCache(max_size)
+        self.forward = LRUCache(max_size)
+
+    def _quantize_orientation(
+        self, orientation: Optional[CraneOrientation]
+    ) -> Optional[tuple[int, int, int, int]]:
+        if orientation is None:
+            return None
+        return (
+            round(orientation.x / self.position_quantum),
+            round(orientation.y / self.position_quantum),
+            round(orientation.z / self.position_quantum),
+            round(orientation.rotationZ / self.angle_quantum),
+        )
+
+    def xyz_to_swing_lift_elbow(
+        self,
+        xyz: XYZPosition,
+        crane: Optional[Crane] = None,
+        orientation: Optional[CraneOrientation] = None,
+    ) -> Optional[SwingLiftElbow]:
+        crane = crane or DEFAULT_CRANE
+        key = (
+            "ik",
+            kinematic_key(crane),
+            round(xyz.x / self.position_quantum),
+            round(xyz.y / self.position_quantum),
+            round(xyz.z / self.position_quantum),
+            self._quantize_orientation(orientation),
+        )
+
+        def compute() -> Optional[tuple[float, float, float]]:
+            result = CraneService.xyz_to_swing_lift_elbow(xyz, crane, orientation)
+            return None if result is None else (result.swing, result.lift, result.elbow)
+
+        result = self.inverse.get_or_compute(key, compute)
+        if result is None:
+            return None
+        swing, lift, elbow = result
+        return SwingLiftElbow.model_construct(swing=swing, lift=lift, elbow=elbow)
+
+    def swing_lift_elbow_to_xyz(
+        self,
+        state: SwingLiftElbow,
+        crane: Optional[Crane] = None,
+        orientation: Optional[CraneOrientation] = None,
+    ) -> XYZPosition:
+        crane = crane or DEFAULT_CRANE
+        key = (
+            "fk",
+            kinematic_key(crane),
+            round(state.swing / self.angle_quantum),
+            round(state.lift / self.position_quantum),
+            round(state.elbow / self.angle_quantum),
+            self._quantize_orientation(orientation),
+        )
+
+        def compute() -> tuple[float, float, float]:
+            result = CraneService.swing_lift_elbow_to_xyz(state, crane, orientation)
+            return (result.x, result.y, result.z)
+
+        x, y, z = self.forward.get_or_compute(key, compute)
+        return XYZPosition.model_construct(x=x, y=y, z=z)
+
+    def xyz_to_crane_state(
+        self,
+        xyz: XYZPosition,
+        current_state: CraneState,
+        orientation: CraneOrientation,
+        crane: Optional[Crane] = None,
+    ) -> Optional[CraneState]:
+        swing_lift_elbow = self.xyz_to_swing_lift_elbow(xyz, crane, orientation)
+        if swing_lift_elbow is None:
+            return None
+        return CraneState(
+            swing=swing_lift_elbow.swing,
+            lift=swing_lift_elbow.lift,
+            elbow=swing_lift_elbow.elbow,
+            wrist=current_state.wrist,
+            gripper=current_state.gripper,
+        )
+
+    def invalidate(self) -> None:
+        self.inverse.clear()
+        self.forward.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Totals over the inverse and forward LRUs"""
+        inverse, forward = self.inverse.stats(), self.forward.stats()
+        return {name: inverse[name] + forward[name] for name in inverse}
@@ -1,6 +1,8 @@
+import hashlib
 from enum import Enum
-from typing import Optional
-from pydantic import BaseModel
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field, model_validator
 
 
 class CraneOrientation(BaseModel):
@@ -10,6 +12,11 @@ class CraneOrientation(BaseModel):
     rotationZ: float = 0  # in degrees
 
 
+class OrientationSample(CraneOrientation):
+    # Seconds since the epoch when the sample was taken, None if only its arrival is known
+    time: Optional[float] = None
+
+
 class SwingLiftElbow(BaseModel):
     swing: float
     lift: float
@@ -21,7 +28,20 @@ class CraneMotors(SwingLiftElbow):
     gripper: float
 
 
-class CraneSpeeds(CraneMotors):
+class MotorLimits(CraneMotors):
+    # Trajectories divide by the limits, so every motor must be able to move
+    swing: float = Field(gt=0)
+    lift: float = Field(gt=0)
+    elbow: float = Field(gt=0)
+    wrist: float = Field(gt=0)
+    gripper: float = Field(gt=0)
+
+
+class CraneSpeeds(MotorLimits):
+    pass
+
+
+class CraneAccelerations(MotorLimits):
     pass
 
 
@@ -29,6 +49,10 @@ class CraneState(CraneMotors):
     pass
 
 
+class CranePositions(CraneMotors):
+    pass
+
+
 class XYZPosition(BaseModel):
     x: float
     y: float
@@ -47,9 +71,27 @@ class Box(BaseModel):
     depth: float = 1
 
 
+class Obstacle(BaseModel):
+    # A static box or vertical cylinder in the frame of the crane, exactly one of box and cylinder
+    position: XYZPosition  # of its centre
+    rotationY: float = 0  # about the vertical axis, in degrees
+    box: Optional[Box] = None
+    cylinder: Optional[Cylinder] = None
+
+    @model_validator(mode="after")
+    def check_shape(self) -> "Obstacle":
+        if (self.box is None) == (self.cylinder is None):
+            raise ValueError("An obstacle needs exactly one of box and cylinder")
+        return self
+
+
+# Time to reach full speed for cranes configured before acceleration limits were added
+DEFAULT_ACCELERATION_SECONDS = 1.0
+
+
 class Crane(BaseModel):
-    # TODO: a crane also needs to have maximum extents for each motor
     max_speeds: CraneSpeeds
+    max_accelerations: CraneAccelerations
     base: Cylinder
     column: Box
     upper_arm: Box
@@ -57,10 +99,36 @@ class Crane(BaseModel):
     lower_arm: Box
     lower_spacer: Cylinder
     gripper: Box
-
-
-# TODO: this should be used to initialize the frontend crane dimensions
-# This needs to be kept in sync with the Crane.tsx dimensions
+    # Travel of each motor, None for no limits
+    min_positions: Optional[CranePositions] = None
+    max_positions: Optional[CranePositions] = None
+    obstacles: list[Obstacle] = []
+
+    @model_validator(mode="before")
+    @classmethod
+    def default_accelerations(cls, data: Any) -> Any:
+        """Configs without acceleration limits reach full speed in DEFAULT_ACCELERATION_SECONDS"""
+        if not isinstance(data, dict) or "max_accelerations" in data:
+            return data
+        speeds = data.get("max_speeds")
+        if isinstance(speeds, BaseModel):
+            speeds = speeds.model_dump()
+        if not isinstance(speeds, dict):
+            return data
+        accelerations = {
+            motor: speed / DEFAULT_ACCELERATION_SECONDS
+            for motor, speed in speeds.items()
+            if isinstance(speed, (int, float))
+        }
+        return {**data, "max_accelerations": accelerations}
+
+    def geometry_hash(self) -> str:
+        """Hash of the dimensions, limits and obstacles, which determine the workspace"""
+        geometry = self.model_dump_json(exclude={"max_speeds", "max_accelerations"})
+        return hashlib.sha256(geometry.encode()).hexdigest()
+
+
+# Used when no crane config file overrides it, see crane.config
 DEFAULT_CRANE = Crane(
     max_speeds=CraneSpeeds(
         swing=10,
@@ -69,6 +137,13 @@ DEFAULT_CRANE = Crane(
         wrist=10,
         gripper=0.1,
     ),
+    max_accelerations=CraneAccelerations(
+        swing=20,
+        lift=0.4,
+        elbow=20,
+        wrist=20,
+        gripper=0.2,
+    ),
     base=Cylinder(radius=0.5, height=0.4, segment=32),
     column=Box(width=0.3, height=3, depth=0.3),
     upper_arm=Box(width=1, height=0.3, depth=0.2),
@@ -79,20 +154,49 @@ DEFAULT_CRANE = Crane(
 )
 
 
+# Id of the crane driven by the MotionController, used when a message does not name a crane
+DEFAULT_CRANE_ID = "default"
+
+
 class MessageType(str, Enum):
     CRANE_STATE = "crane_state"
     XYZ_POSITION = "xyz_position"
+    SUBSCRIBE = "subscribe"
+    PROGRAM = "program"
+    PROGRAM_CONTROL = "program_control"
+    # Sent by the server on connect and whenever a crane config is reloaded
+    CRANE_CONFIG = "crane_config"
 
 
 class Status(str, Enum):
     MOVING = "moving"
     STOPPED = "stopped"
     ERROR = "error"
+    PAUSED = "paused"
+
+
+class PathType(str, Enum):
+    # Interpolate the motors, the gripper follows an arc
+    JOINT = "joint"
+    # Keep the gripper on a straight line to the target
+    LINEAR = "linear"
+
+
+class ProgramCommand(str, Enum):
+    PAUSE = "pause"
+    RESUME = "resume"
+    ABORT = "abort"
+
+
+class WireFormat(str, Enum):
+    JSON = "json"
+    BINARY = "binary"
 
 
 class BaseMessage(BaseModel):
     type: MessageType
     orientation: CraneOrientation
+    craneId: str = DEFAULT_CRANE_ID
 
 
 class CraneStateMessage(BaseMessage):
@@ -103,11 +207,67 @@ class CraneStateMessage(BaseMessage):
 class XYZPositionMessage(BaseMessage):
     type: MessageType = MessageType.XYZ_POSITION
     target: XYZPosition
+    path: PathType = PathType.JOINT
+
+
+class SubscribeMessage(BaseModel):
+    type: MessageType = MessageType.SUBSCRIBE
+    craneIds: list[str]
+
+
+class ProgramStep(BaseModel):
+    # Exactly one of craneState and xyzPosition
+    craneState: Optional[CraneState] = None
+    xyzPosition: Optional[XYZPosition] = None
+    # Start the next step once the gripper is this close to the target, in metres
+    blendRadius: float = 0.0
+    # Seconds to hold the target before the next step
+    dwell: float = 0.0
+
+
+class ProgramMessage(BaseMessage):
+    type: MessageType = MessageType.PROGRAM
+    steps: list[ProgramStep]
+
+
+class ProgramControlMessage(BaseModel):
+    type: MessageType = MessageType.PROGRAM_CONTROL
+    craneId: str = DEFAULT_CRANE_ID
+    command: ProgramCommand
+
+
+class ProgramProgress(BaseModel):
+    # Index of the step being executed
+    step: int
+    steps: int
+
+
+class MotionSegment(BaseModel):
+    # The motors move from start to end over duration seconds, beginning at startTime on the
+    # server clock. They accelerate evenly for accelTime, cruise, and decelerate for accelTime,
+    # together as in crane.trajectory.Trajectory. An accelTime of 0 is constant velocity.
+    startTime: float
+    duration: float
+    accelTime: float
+    start: CraneState
+    end: CraneState
 
 
 class Response(BaseModel):
+    craneId: str = DEFAULT_CRANE_ID
     craneState: Optional[CraneState] = None
     xyzPosition: Optional[XYZPosition] = None
+    program: Optional[ProgramProgress] = None
     errorMessage: Optional[str] = None
     status: Status
     success: bool
+    # Monotonic server clock when the state was taken, in seconds
+    time: Optional[float] = None
+    # The motion ahead, for clients to interpolate between frames
+    segment: Optional[MotionSegment] = None
+
+
+class CraneConfigMessage(BaseModel):
+    type: MessageType = MessageType.CRANE_CONFIG
+    # The config of every crane, by crane id
+    cranes: dict[str, Crane]
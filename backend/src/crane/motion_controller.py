@@ -1,64 +1,266 @@
 import asyncio
-from crane.crane_service import CraneService
-from crane.models import CraneState, Crane
-from typing import Optional
-
 import logging
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from crane.crane_service import CraneService
+from crane.metrics import REGISTRY
+from crane.models import Crane, CraneMotors, CraneState
+from crane.scheduler import Clock, FixedRateScheduler
+from crane.trajectory import JointTrajectory, Piece, Trajectory
 
 logger = logging.getLogger(__name__)
 
+# Longest piece of a path without a closed form, such as a straight-line move, that is handed
+# to clients as one linear move to interpolate
+SEGMENT_HORIZON = 0.5
+
+# Order of the motors in the position, target and speed arrays
+AXES = tuple(CraneState.model_fields.keys())
+
+TICK_SECONDS = REGISTRY.histogram(
+    "motion_tick_seconds", "Time spent computing one motion tick", ("loop",)
+)
+TICK_LATENESS = REGISTRY.histogram(
+    "motion_tick_lateness_seconds",
+    "How long after its scheduled time a motion tick started",
+    ("loop",),
+)
+TICK_OVERRUNS = REGISTRY.counter(
+    "motion_tick_overruns_total",
+    "Times a motion loop fell more than a period behind and skipped ticks",
+    ("loop",),
+)
+
+
+def state_to_array(state: CraneMotors) -> np.ndarray:
+    """Motor values, such as positions, speeds or accelerations, in AXES order"""
+    return np.array([getattr(state, axis) for axis in AXES], dtype=float)
+
+
+def array_to_state(values: np.ndarray) -> CraneState:
+    return CraneState(**dict(zip(AXES, values.tolist())))
+
 
 class MotionController:
-    def __init__(self, state: CraneState, crane: Crane):
-        self.state = state
+    """
+    Moves the crane motors towards a target along a planned trajectory
+
+    Each motion is planned once as a synchronized Trajectory within the crane's speed and
+    acceleration limits, then sampled on a fixed-rate schedule. Positions, targets and limits
+    are stored as arrays in AXES order. The CraneState view is only built when read.
+    Ticks follow clock, wall-clock time by default, or a SimulatedClock to run headless.
+    With log_ticks the positions are logged at DEBUG level on every tick.
+    Listeners are called whenever the positions change and when a motion ends, and tick
+    listeners after every control tick of a motion, whether or not the positions changed.
+
+    Pausing slows time along the trajectory down to a stop, and resuming speeds it back up,
+    each over stop_time, the time the slowest-stopping motor needs to brake from full speed.
+    """
+
+    def __init__(
+        self,
+        state: CraneState,
+        crane: Crane,
+        rate: float = 100.0,
+        log_ticks: bool = False,
+        clock: Optional[Clock] = None,
+    ):
         self.crane = crane
-        self.time_step = 0.1
+        self.rate = rate
+        self.clock = clock
+        self.log_ticks = log_ticks
+        self.positions = state_to_array(state)
+        self.targets = self.positions.copy()
+        self.max_speeds = state_to_array(crane.max_speeds)
+        self.max_accelerations = state_to_array(crane.max_accelerations)
+        self.trajectory: Optional[JointTrajectory] = None
+        self.elapsed = 0.0
+        self.paused = False
+        # Rate at which time advances along the trajectory, ramped towards 0 while paused
+        self.time_scale = 1.0
+        self.stop_time = float(np.max(self.max_speeds / self.max_accelerations))
+        self.version = 0
+        self.listeners: list[Callable[[], None]] = []
+        self.tick_listeners: list[Callable[[], None]] = []
+        self._state: Optional[CraneState] = state.model_copy()
+        self._piece: Optional[Piece] = None
         self._current_task: Optional[asyncio.Task] = None
-        self._motion_lock = asyncio.Lock()
+
+    @property
+    def state(self) -> CraneState:
+        if self._state is None:
+            self._state = array_to_state(self.positions)
+        return self._state
+
+    @state.setter
+    def state(self, state: CraneState) -> None:
+        self.set_positions(state_to_array(state))
+
+    def set_positions(self, positions: np.ndarray) -> None:
+        """Jump straight to positions in AXES order, e.g. to replay a recording"""
+        self.positions = np.array(positions, dtype=float)
+        self._mark_changed()
+
+    def set_crane(self, crane: Crane) -> None:
+        """
+        Swap the crane config, e.g. on reload, without interrupting the motion in progress
+
+        The current trajectory was planned and checked against the old config and plays out as
+        planned; the new speed, acceleration and motor limits apply from the next plan.
+        """
+        self.crane = crane
+        self.max_speeds = state_to_array(crane.max_speeds)
+        self.max_accelerations = state_to_array(crane.max_accelerations)
+        self.stop_time = float(np.max(self.max_speeds / self.max_accelerations))
+        # The gripper moves with the geometry even if the motors do not
+        self._mark_changed()
+
+    @property
+    def moving(self) -> bool:
+        return self.trajectory is not None
+
+    def _mark_changed(self) -> None:
+        self.version += 1
+        self._state = None
+        self._notify()
+
+    def _notify(self) -> None:
+        for listener in self.listeners:
+            listener()
+
+    def segment(self) -> Optional[tuple[float, Trajectory]]:
+        """
+        The motion ahead as one Trajectory, and the elapsed time at which it starts
+
+        Lets clients interpolate between state frames. The same Trajectory is returned until the
+        crane leaves it or the motion changes, and None while the crane is stopped, or slowing
+        down or speeding up to pause or resume.
+        """
+        trajectory = self.trajectory
+        if trajectory is None or self.paused or self.time_scale < 1.0:
+            return None
+        piece = self._piece
+        if piece is None or not piece[0] <= self.elapsed < piece[1]:
+            piece = self._piece = trajectory.piece(self.elapsed, SEGMENT_HORIZON)
+        return piece[0], piece[2]
+
+    def _start(self, trajectory: JointTrajectory) -> None:
+        self.targets = trajectory.end.copy()
+        self.trajectory = trajectory
+        self._piece = None
+        self.elapsed = 0.0
+        self.paused = False
+        self.time_scale = 1.0
+
+    def _plan(self, target_state: CraneState) -> Trajectory:
+        return Trajectory.plan(
+            self.positions,
+            state_to_array(target_state),
+            self.max_speeds,
+            self.max_accelerations,
+        )
+
+    def plan(self, target_state: CraneState) -> Trajectory:
+        """Plan a trajectory from the current positions to the target"""
+        trajectory = self._plan(target_state)
+        self._start(trajectory)
+        return trajectory
+
+    def pause(self) -> bool:
+        """Bring the motion in progress to a stop, ready to resume. Returns False if idle."""
+        if self.trajectory is None:
+            return False
+        self.paused = True
+        self._piece = None
+        self._notify()
+        return True
+
+    def resume(self) -> bool:
+        """Continue a paused motion. Returns False if there is nothing to resume."""
+        if self.trajectory is None or not self.paused:
+            return False
+        self.paused = False
+        self._piece = None
+        self._notify()
+        return True
+
+    def step(self, time_diff: float) -> bool:
+        """Advance along the trajectory by time_diff seconds. Returns True once it is complete."""
+        if self.trajectory is None:
+            return True
+        if self.paused:
+            self.time_scale = max(self.time_scale - time_diff / self.stop_time, 0.0)
+        elif self.time_scale < 1.0:
+            self.time_scale = min(self.time_scale + time_diff / self.stop_time, 1.0)
+        self.elapsed += time_diff * self.time_scale
+        positions = self.trajectory.sample(self.elapsed)
+        if (positions != self.positions).any():
+            self.positions = positions
+            self._mark_changed()
+        if self.elapsed >= self.trajectory.duration:
+            self.trajectory = None
+            return True
+        return False
 
     async def _execute_motion(
         self,
         target_state: CraneState,
         max_duration: float = 30.0,
-    ):
-        """Internal method to execute the motion asynchronously."""
+    ) -> bool:
+        """Internal method to execute the motion asynchronously. Returns False if rejected."""
         if not CraneService.is_valid_state(target_state, self.crane):
             logger.error("Invalid target state")
-            return
-        start_time = asyncio.get_event_loop().time()
-        last_time = start_time
-
-        while asyncio.get_event_loop().time() - start_time < max_duration:
-            current_time = asyncio.get_event_loop().time()
-            time_diff = current_time - last_time
-            last_time = current_time
-
-            async with self._motion_lock:
-                for field in self.crane.max_speeds.model_fields.keys():
-                    step = getattr(self.crane.max_speeds, field) * time_diff
-                    current = getattr(self.state, field)
-                    target = getattr(target_state, field)
-
-                    if abs(target - current) > step:
-                        logger.debug(
-                            f"Moving {field} from {current} to {current + step if target > current else current - step}"
-                        )
-                        setattr(
-                            self.state,
-                            field,
-                            current + step if target > current else current - step,
-                        )
-                    else:
-                        setattr(self.state, field, target)
-
-                # Check if we've reached the target state
-                if all(
-                    getattr(self.state, field) == getattr(target_state, field)
-                    for field in self.state.model_fields.keys()
-                ):
+            return False
+        trajectory = self._plan(target_state)
+        if not CraneService.is_valid_trajectory(trajectory, self.crane):
+            logger.error(
+                "Motion to the target state collides or leaves the motor limits"
+            )
+            return False
+        self._start(trajectory)
+        logger.info(f"Planned {trajectory.duration:.2f}s trajectory")
+        await self._follow(max_duration)
+        return True
+
+    async def _follow(self, max_duration: float) -> None:
+        """Step along the current trajectory until it completes or max_duration passes."""
+        scheduler = FixedRateScheduler(self.rate, self.clock)
+        tick_seconds = TICK_SECONDS.labels("controller")
+        tick_lateness = TICK_LATENESS.labels("controller")
+        try:
+            async for time_diff in scheduler.ticks():
+                start = time.perf_counter()
+                done = self.step(time_diff)
+                for listener in self.tick_listeners:
+                    listener()
+                tick_seconds.observe(time.perf_counter() - start)
+                tick_lateness.observe(max(scheduler.lateness, 0.0))
+                if self.log_ticks:
+                    logger.debug(
+                        f"Positions {self.positions.tolist()} at {self.elapsed:.3f}s"
+                    )
+                if done:
                     logger.info("Reached target state")
                     break
-            await asyncio.sleep(self.time_step)
+                if self.elapsed >= max_duration:
+                    break
+        finally:
+            self.trajectory = None
+            self.paused = False
+            self._notify()
+            TICK_OVERRUNS.labels("controller").inc(scheduler.overruns)
+
+    async def _execute_trajectory(
+        self, trajectory: JointTrajectory, max_duration: Optional[float] = None
+    ):
+        """Internal method to follow a precomputed trajectory asynchronously."""
+        self._start(trajectory)
+        await self._follow(
+            trajectory.duration if max_duration is None else max_duration
+        )
 
     async def apply_motion(
         self,
@@ -66,16 +268,35 @@ class MotionController:
         max_duration: float = 30.0,
     ):
         """Smoothly transitions to target state over a duration asynchronously."""
-        # Cancel any ongoing motion
-        if self._current_task and not self._current_task.done():
-            self._current_task.cancel()
-            try:
-                await self._current_task
-            except asyncio.CancelledError:
-                pass
+        await self.cancel()
 
         # Create and start new motion task
         self._current_task = asyncio.create_task(
             self._execute_motion(target_state, max_duration)
         )
         return self._current_task
+
+    async def apply_trajectory(
+        self,
+        trajectory: JointTrajectory,
+        max_duration: Optional[float] = None,
+    ):
+        """
+        Follows a precomputed trajectory, replacing any motion in progress.
+
+        By default the trajectory is followed for as long as it takes.
+        """
+        await self.cancel()
+        self._current_task = asyncio.create_task(
+            self._execute_trajectory(trajectory, max_duration)
+        )
+        return self._current_task
+
+    async def cancel(self) -> None:
+        """Stop any motion in progress where it is."""
+        if self._current_task and not self._current_task.done():
+            self._current_task.cancel()
+            try:
+                await self._current_task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,223 @@
+"""
+Filtering and latency compensation of streamed crane orientations
+
+Orientation sensors report x, y, z and rotationZ of a crane with noise and after a delay. Each
+axis of each crane is tracked by a constant-velocity Kalman filter, and the estimate used for
+kinematics is the filtered state predicted forward from the time the last sample was taken to
+now, which compensates the delay as well as the time between samples.
+
+Samples are only queued when they arrive, so a sensor sending thousands of samples a second
+costs the event loop little more than receiving them. update() folds the queue into the filters
+of all cranes at once: in round k it applies the k-th queued sample of every crane that has one,
+vectorized across cranes and axes.
+"""
+
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+
+from crane.metrics import REGISTRY
+from crane.models import CraneOrientation, OrientationSample
+
+logger = logging.getLogger(__name__)
+
+# A sample on the wire: seconds since the epoch when it was taken, NaN if unknown, then x, y, z
+# in metres and rotationZ in degrees, all little-endian f64
+SAMPLE_DTYPE = np.dtype([("time", "<f8"), ("orientation", "<f8", (4,))])
+# Standard deviation of sensor noise on x, y, z and rotationZ
+MEASUREMENT_NOISE = np.array([0.01, 0.01, 0.01, 0.5])
+# Standard deviation of the random acceleration of the crane base, per second squared
+PROCESS_NOISE = np.array([0.5, 0.5, 0.5, 20.0])
+# Standard deviation of the velocity of a crane before its first sample, per second
+INITIAL_VELOCITY = np.array([1.0, 1.0, 1.0, 30.0])
+# Cranes without a sample for this long have no estimate and fall back to commanded orientations
+STALE_SECONDS = 0.5
+
+ORIENTATION_SAMPLES = REGISTRY.counter(
+    "crane_orientation_samples_total",
+    "Orientation samples received, by whether they were applied or older than the filter",
+    ("outcome",),
+)
+ORIENTATION_DELAY = REGISTRY.histogram(
+    "crane_orientation_delay_seconds",
+    "Time from an orientation sample being taken to it reaching the filter",
+)
+
+
+def samples_from_models(samples: list[OrientationSample]) -> np.ndarray:
+    """Convert samples from JSON messages to an array of SAMPLE_DTYPE"""
+    result = np.empty(len(samples), dtype=SAMPLE_DTYPE)
+    result["time"] = [np.nan if s.time is None else s.time for s in samples]
+    result["orientation"] = [[s.x, s.y, s.z, s.rotationZ] for s in samples]
+    return result
+
+
+def wrap_degrees(angle: np.ndarray) -> np.ndarray:
+    """Wrap angles to [-180, 180)"""
+    return (angle + 180) % 360 - 180
+
+
+class OrientationFilter:
+    """
+    Kalman filters of the orientation of many cranes, vectorized across cranes and axes
+
+    Stored as structure-of-arrays with one row per crane and one column per axis: the estimated
+    position and velocity, and the three distinct entries of their 2x2 covariance. rotationZ is
+    tracked unwrapped, so a crane turning past 180 degrees moves smoothly rather than jumping.
+    Samples without a timestamp are assumed to have been taken latency seconds before arrival.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        measurement_noise: np.ndarray = MEASUREMENT_NOISE,
+        process_noise: np.ndarray = PROCESS_NOISE,
+        stale_seconds: float = STALE_SECONDS,
+    ):
+        self.latency = latency
+        self.measurement_variance = np.asarray(measurement_noise, dtype=float) ** 2
+        self.process_variance = np.asarray(process_noise, dtype=float) ** 2
+        self.stale_seconds = stale_seconds
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+        self.positions = np.empty((0, 4))
+        self.velocities = np.empty((0, 4))
+        self.variances = np.empty((0, 3, 4))
+        # Time of the last applied sample of each crane, NaN before the first
+        self.times = np.empty(0)
+        self._pending: list[tuple[int, np.ndarray, np.ndarray]] = []
+        self._applied = ORIENTATION_SAMPLES.labels("applied")
+        self._late = ORIENTATION_SAMPLES.labels("late")
+
+    def __contains__(self, crane_id: str) -> bool:
+        return crane_id in self.index
+
+    def _row(self, crane_id: str) -> int:
+        row = self.index.get(crane_id)
+        if row is None:
+            row = self.index[crane_id] = len(self.ids)
+            self.ids.append(crane_id)
+            self.positions = np.vstack([self.positions, np.zeros(4)])
+            self.velocities = np.vstack([self.velocities, np.zeros(4)])
+            self.variances = np.concatenate([self.variances, np.zeros((1, 3, 4))])
+            self.times = np.append(self.times, np.nan)
+        return row
+
+    def push(
+        self, crane_id: str, samples: np.ndarray, received: Optional[float] = None
+    ) -> None:
+        """Queue an array of SAMPLE_DTYPE samples of a crane, received at time.time()"""
+        if not len(samples):
+            return
+        received = time.time() if received is None else received
+        times = np.where(
+            np.isnan(samples["time"]), received - self.latency, samples["time"]
+        )
+        for delay in (received - times).tolist():
+            ORIENTATION_DELAY.observe(max(delay, 0.0))
+        self._pending.append(
+            (
+                self._row(crane_id),
+                times,
+                np.asarray(samples["orientation"], dtype=float),
+            )
+        )
+
+    def update(self) -> list[str]:
+        """Apply every queued sample in time order and return the ids of the updated cranes"""
+        if not self._pending:
+            return []
+        rows = np.concatenate(
+            [np.full(len(times), row) for row, times, _ in self._pending]
+        )
+        times = np.concatenate([times for _, times, _ in self._pending])
+        values = np.concatenate([values for _, _, values in self._pending])
+        self._pending = []
+        order = np.lexsort((times, rows))
+        rows, times, values = rows[order], times[order], values[order]
+        # Position of each sample among the samples of its crane
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        counts = np.diff(np.r_[starts, len(rows)])
+        ranks = np.arange(len(rows)) - np.repeat(starts, counts)
+
+        applied = 0
+        for rank in range(int(counts.max())):
+            selected = np.flatnonzero(ranks == rank)
+            selected_rows = rows[selected]
+            # Samples taken before the last applied sample of their crane are too late to use
+            fresh = ~(times[selected] < self.times[selected_rows])
+            selected, selected_rows = selected[fresh], selected_rows[fresh]
+            self._apply(selected_rows, times[selected], values[selected])
+            applied += len(selected)
+        self._applied.inc(applied)
+        self._late.inc(len(rows) - applied)
+        return [self.ids[row] for row in np.unique(rows).tolist()]
+
+    def _apply(self, rows: np.ndarray, times: np.ndarray, values: np.ndarray) -> None:
+        """Predict the filters of rows forward to times, then correct them with the values"""
+        new = np.isnan(self.times[rows])
+        if new.any():
+            first = rows[new]
+            self.positions[first] = values[new]
+            self.velocities[first] = 0.0
+            self.variances[first, 0] = self.measurement_variance
+            self.variances[first, 1] = 0.0
+            self.variances[first, 2] = INITIAL_VELOCITY**2
+            self.times[first] = times[new]
+            rows, times, values = rows[~new], times[~new], values[~new]
+        if not len(rows):
+            return
+        dt = (times - self.times[rows])[:, None]
+        position = self.positions[rows] + self.velocities[rows] * dt
+        velocity = self.velocities[rows]
+        p00, p01, p11 = self.variances[rows].transpose(1, 0, 2)
+        # Constant velocity prediction with white noise acceleration
+        q = self.process_variance
+        p00 = p00 + dt * (2 * p01 + dt * p11) + q * dt**4 / 4
+        p01 = p01 + dt * p11 + q * dt**3 / 2
+        p11 = p11 + q * dt**2
+
+        innovation = values - position
+        innovation[:, 3] = wrap_degrees(innovation[:, 3])
+        total = p00 + self.measurement_variance
+        gain_position = p00 / total
+        gain_velocity = p01 / total
+        self.positions[rows] = position + gain_position * innovation
+        self.velocities[rows] = velocity + gain_velocity * innovation
+        self.variances[rows] = np.stack(
+            [
+                (1 - gain_position) * p00,
+                (1 - gain_position) * p01,
+                p11 - gain_velocity * p01,
+            ],
+            axis=1,
+        )
+        self.times[rows] = times
+
+    def live(self, crane_ids: list[str], now: Optional[float] = None) -> np.ndarray:
+        """Which cranes have a filtered orientation that is not stale"""
+        now = time.time() if now is None else now
+        rows = np.array([self.index.get(crane_id, -1) for crane_id in crane_ids])
+        result = np.zeros(len(rows), dtype=bool)
+        known = rows >= 0
+        result[known] = now - self.times[rows[known]] <= self.stale_seconds
+        return result
+
+    def predict(self, crane_ids: list[str], at: Optional[float] = None) -> np.ndarray:
+        """(N, 4) orientations of cranes predicted to time at, defaulting to now"""
+        at = time.time() if at is None else at
+        rows = np.array([self.index[crane_id] for crane_id in crane_ids], dtype=np.intp)
+        ahead = np.clip(at - self.times[rows], 0.0, self.stale_seconds)[:, None]
+        return self.positions[rows] + self.velocities[rows] * ahead
+
+    def estimate(
+        self, crane_id: str, at: Optional[float] = None
+    ) -> Optional[CraneOrientation]:
+        """The orientation of a crane predicted to time at, or None if it has no live estimate"""
+        at = time.time() if at is None else at
+        if not self.live([crane_id], at)[0]:
+            return None
+        x, y, z, rotation = self.predict([crane_id], at)[0].tolist()
+        return CraneOrientation(x=x, y=y, z=z, rotationZ=rotation)
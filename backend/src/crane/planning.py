@@ -0,0 +1,196 @@
+"""
+Planning jobs run off the event loop on a thread or process pool
+
+Inverse kinematics and trajectory planning can take from milliseconds to seconds. Run inline
+they would stall the event loop, and with it the state stream of every client, so handlers
+submit them here instead. Each job is keyed, usually by crane, and submitting a job cancels the
+previous job with the same key: a queued job never runs, and the handler waiting on a running
+one resumes immediately with no result, so a crane only ever moves to its newest command.
+
+Threads share memory with the event loop, such as the kinematics cache, and start instantly,
+but only one of them runs Python at a time. Processes plan in parallel on multiple cores, at
+the cost of pickling every job's arguments and result.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Hashable
+
+from crane.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds for planning jobs, which take longer than motion ticks
+PLANNING_BUCKETS = (
+    1e-4,
+    1e-3,
+    5e-3,
+    1e-2,
+    2.5e-2,
+    5e-2,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+PLANNING_PENDING = REGISTRY.gauge(
+    "crane_planning_jobs_pending",
+    "Planning jobs submitted and not yet finished, queued or running",
+)
+PLANNING_WAIT = REGISTRY.histogram(
+    "crane_planning_wait_seconds",
+    "Time from a planning job being submitted to a worker starting it",
+    buckets=PLANNING_BUCKETS,
+)
+PLANNING_RUN = REGISTRY.histogram(
+    "crane_planning_run_seconds",
+    "Time a worker spent running a planning job",
+    buckets=PLANNING_BUCKETS,
+)
+PLANNING_JOBS = REGISTRY.counter(
+    "crane_planning_jobs_total",
+    "Finished planning jobs, by whether they completed, failed or were superseded",
+    ("outcome",),
+)
+
+
+class PoolKind(str, Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+def _timed_call(func: Callable, args: tuple) -> tuple[float, float, Any]:
+    """Run a job in a worker and return when it started and finished, in epoch seconds"""
+    started = time.time()
+    result = func(*args)
+    return started, time.time(), result
+
+
+class PlanningJob:
+    """A submitted job. Awaiting it gives its result, or None if it failed or was superseded."""
+
+    def __init__(self, key: Hashable, future: Future, submitted: float):
+        self.key = key
+        self.submitted = submitted
+        self.cancelled = False
+        self._future = future
+        self._waiter = asyncio.wrap_future(future)
+
+    def cancel(self) -> None:
+        """Stop waiting for the job, and drop it from the queue if it has not started"""
+        self.cancelled = True
+        # Cancelling the waiter only reaches the future on the next loop iteration, by which
+        # time a worker may have picked the job up
+        self._future.cancel()
+        self._waiter.cancel()
+
+    def done(self) -> bool:
+        return self._waiter.done()
+
+    def __await__(self):
+        return self._result().__await__()
+
+    async def _result(self) -> Any:
+        try:
+            _, _, result = await self._waiter
+            return result
+        except asyncio.CancelledError:
+            if self.cancelled:
+                return None
+            raise
+        except Exception as e:
+            logger.error(f"Planning job for {self.key} failed: {e}", exc_info=True)
+            return None
+
+
+class PlanningPool:
+    """
+    A thread or process pool running at most one current planning job per key
+
+    Queue depth, how long jobs wait for a worker and how long they run are reported as metrics.
+    """
+
+    def __init__(self, workers: int = 2, kind: PoolKind = PoolKind.THREAD):
+        self.kind = PoolKind(kind)
+        self.executor: Executor = (
+            ThreadPoolExecutor(workers, thread_name_prefix="planner")
+            if self.kind == PoolKind.THREAD
+            else ProcessPoolExecutor(workers)
+        )
+        self.jobs: dict[Hashable, PlanningJob] = {}
+        self.pending = 0
+        self._pending = PLANNING_PENDING.labels()
+        self._completed = PLANNING_JOBS.labels("completed")
+        self._failed = PLANNING_JOBS.labels("failed")
+        self._superseded = PLANNING_JOBS.labels("superseded")
+
+    @property
+    def shares_memory(self) -> bool:
+        """Whether jobs run in this process and can use objects shared with the event loop"""
+        return self.kind == PoolKind.THREAD
+
+    def submit(self, key: Hashable, func: Callable, *args) -> PlanningJob:
+        """
+        Run func(*args) on a worker, superseding the current job with the same key
+
+        With a process pool func and args must be picklable, e.g. module-level functions.
+        Must be called from the event loop.
+        """
+        self.cancel(key)
+        future = self.executor.submit(_timed_call, func, args)
+        job = PlanningJob(key, future, time.time())
+        self.jobs[key] = job
+        self.pending += 1
+        self._pending.set(self.pending)
+        loop = job._waiter.get_loop()
+
+        def on_done(done: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._finished, job, done)
+            except RuntimeError:
+                # The event loop closed while the job ran
+                pass
+
+        future.add_done_callback(on_done)
+        return job
+
+    def cancel(self, key: Hashable) -> bool:
+        """Supersede the current job with the key, e.g. when a command needs no planning"""
+        job = self.jobs.pop(key, None)
+        if job is None or job.done():
+            return False
+        job.cancel()
+        return True
+
+    def _finished(self, job: PlanningJob, future: Future) -> None:
+        self.pending -= 1
+        self._pending.set(self.pending)
+        if self.jobs.get(job.key) is job:
+            del self.jobs[job.key]
+        if future.cancelled():
+            # Superseded before a worker picked it up
+            self._superseded.inc()
+            return
+        if future.exception() is not None:
+            self._failed.inc()
+            return
+        started, finished, _ = future.result()
+        PLANNING_WAIT.observe(max(started - job.submitted, 0.0))
+        PLANNING_RUN.observe(finished - started)
+        if job.cancelled:
+            self._superseded.inc()
+        else:
+            self._completed.inc()
+
+    def shutdown(self) -> None:
+        """Drop queued jobs and stop the workers once running jobs finish"""
+        for key in list(self.jobs):
+            self.cancel(key)
+        self.executor.shutdown(wait=False, cancel_futures=True)
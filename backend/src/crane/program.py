@@ -0,0 +1,107 @@
+import logging
+from typing import Optional
+
+import numpy as np
+
+from crane.crane_service import CraneService
+from crane.models import Crane, CraneOrientation, CraneState, ProgramStep
+from crane.motion_controller import array_to_state, state_to_array
+from crane.trajectory import ProgramTrajectory, Trajectory
+
+logger = logging.getLogger(__name__)
+
+# Samples of the deceleration of a move searched for the start of a blend
+BLEND_SAMPLES = 64
+
+
+def blend_overlap(
+    segment: Trajectory, following: Trajectory, radius: float, crane: Crane
+) -> float:
+    """
+    How long the following move can overlap the end of segment
+
+    That is from when the gripper comes within radius of the target of segment, limited to the
+    deceleration of segment and the acceleration of following.
+    """
+    limit = min(segment.t_accel, following.t_accel)
+    if radius <= 0 or limit <= 0:
+        return 0.0
+    times = segment.duration - np.linspace(limit, 0, BLEND_SAMPLES)
+    joints = np.array([segment.sample(t)[:3] for t in times])
+    xyz = CraneService.swing_lift_elbow_to_xyz_batch(joints, crane)
+    distance = np.linalg.norm(xyz - xyz[-1], axis=1)
+    within = np.flatnonzero(distance <= radius)
+    return float(segment.duration - times[within[0]])
+
+
+def resolve_step(
+    step: ProgramStep,
+    previous: CraneState,
+    crane: Crane,
+    orientation: Optional[CraneOrientation],
+) -> Optional[CraneState]:
+    """The joint target of a program step, keeping the wrist and gripper for xyz steps"""
+    if (step.craneState is None) == (step.xyzPosition is None):
+        logger.error("A program step needs exactly one of craneState and xyzPosition")
+        return None
+    if step.xyzPosition is None:
+        target = step.craneState
+    else:
+        # Without an orientation the crane is at the origin
+        target = CraneService.xyz_to_crane_state(
+            step.xyzPosition, previous, orientation or CraneOrientation(), crane
+        )
+    if target is None or not CraneService.is_valid_state(target, crane):
+        return None
+    return target
+
+
+def plan_program(
+    current_state: CraneState,
+    steps: list[ProgramStep],
+    crane: Crane,
+    orientation: Optional[CraneOrientation] = None,
+) -> Optional[ProgramTrajectory]:
+    """
+    Plan a whole program up front so that it runs without gaps between steps
+
+    Returns None if the program is empty, any step is unreachable or invalid, or the motion
+    between them collides.
+    """
+    if not steps:
+        logger.error("Program has no steps")
+        return None
+    max_speeds = state_to_array(crane.max_speeds)
+    max_accelerations = state_to_array(crane.max_accelerations)
+    segments = []
+    previous = current_state
+    for index, step in enumerate(steps):
+        target = resolve_step(step, previous, crane, orientation)
+        if target is None:
+            logger.error(f"Program step {index} is unreachable or invalid")
+            return None
+        segments.append(
+            Trajectory.plan(
+                state_to_array(previous),
+                state_to_array(target),
+                max_speeds,
+                max_accelerations,
+            )
+        )
+        previous = array_to_state(segments[-1].end)
+
+    starts = np.zeros(len(segments))
+    for index in range(1, len(segments)):
+        step, segment = steps[index - 1], segments[index - 1]
+        end = starts[index - 1] + segment.duration
+        if step.dwell > 0:
+            starts[index] = end + step.dwell
+        else:
+            overlap = blend_overlap(segment, segments[index], step.blendRadius, crane)
+            starts[index] = end - overlap
+    program = ProgramTrajectory(segments, starts, max(steps[-1].dwell, 0.0))
+    # Blends leave the straight lines between valid targets, so check the whole program
+    if not CraneService.is_valid_trajectory(program, crane):
+        logger.error("Program collides or leaves the motor limits")
+        return None
+    return program
@@ -0,0 +1,144 @@
+"""
+Motion telemetry recording and replay
+
+A recording is a 16 byte header followed by fixed-size little-endian records
+
+    header      magic b"CRANEREC", version u32, record size u32
+    record      time f64, target f64 x 5, state f64 x 5, xyz f64 x 3
+
+time is seconds since the epoch, target and state are motor positions in AXES order and xyz is
+the gripper position in the frame of the crane. Records only ever get appended, so a recording
+can be read while it is being written; a partially written last record is ignored.
+"""
+
+import logging
+import struct
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Union
+
+import numpy as np
+
+from crane.crane_service import CraneService
+from crane.models import Crane
+from crane.motion_controller import AXES
+from crane.scheduler import FixedRateScheduler
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CRANEREC"
+VERSION = 1
+RECORD_DTYPE = np.dtype(
+    [
+        ("time", "<f8"),
+        ("target", "<f8", (len(AXES),)),
+        ("state", "<f8", (len(AXES),)),
+        ("xyz", "<f8", (3,)),
+    ]
+)
+HEADER = struct.Struct("<8sII")
+
+
+class Recorder:
+    """
+    Appends motion telemetry to a recording
+
+    Records are collected into a preallocated batch. Full batches are handed to a single writer
+    thread, which computes the xyz positions of the whole batch with one forward kinematics call
+    and appends it to the file, so the event loop never waits on the disk. A batch is handed
+    over early when the crane config changes, so its xyz use the geometry it was recorded with.
+    """
+
+    def __init__(self, path: Union[str, Path], crane: Crane, batch_size: int = 1024):
+        self.path = Path(path)
+        self.crane = crane
+        self.batch_size = batch_size
+        self.records_written = 0
+        self._batch = np.empty(batch_size, dtype=RECORD_DTYPE)
+        self._count = 0
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="recorder")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize))
+
+    def record(self, time: float, target: np.ndarray, state: np.ndarray) -> None:
+        record = self._batch[self._count]
+        record["time"] = time
+        record["target"] = target
+        record["state"] = state
+        self._count += 1
+        if self._count == self.batch_size:
+            self.flush()
+
+    def set_crane(self, crane: Crane) -> None:
+        """Compute the xyz of records from now on with a new config, e.g. after a reload"""
+        self.flush()
+        self.crane = crane
+
+    def flush(self) -> Future:
+        """Hand the records collected so far to the writer thread"""
+        batch = self._batch[: self._count]
+        self._batch = np.empty(self.batch_size, dtype=RECORD_DTYPE)
+        self._count = 0
+        return self._writer.submit(self._write, batch, self.crane)
+
+    def _write(self, batch: np.ndarray, crane: Crane) -> None:
+        if not len(batch):
+            return
+        batch["xyz"] = CraneService.swing_lift_elbow_to_xyz_batch(
+            batch["state"][:, :3], crane
+        )
+        try:
+            with open(self.path, "ab") as file:
+                file.write(batch.tobytes())
+            self.records_written += len(batch)
+        except OSError as e:
+            logger.error(f"Could not write {len(batch)} records to {self.path}: {e}")
+
+    def close(self) -> None:
+        """Write any remaining records and wait for the writer to finish"""
+        self.flush()
+        self._writer.shutdown(wait=True)
+
+
+def read_recording(path: Union[str, Path]) -> np.ndarray:
+    """Memory-map a recording as a structured array of RECORD_DTYPE, without copying it"""
+    path = Path(path)
+    with open(path, "rb") as file:
+        magic, version, record_size = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} crane recording")
+    count = (path.stat().st_size - HEADER.size) // record_size
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
+
+
+async def replay(
+    records: np.ndarray,
+    apply: Callable[[np.ndarray], None],
+    speed: float = 1.0,
+    rate: float = 100.0,
+) -> None:
+    """
+    Play recorded motor positions back through apply, at speed times real time
+
+    Runs at a fixed rate and applies the latest record due at each tick, so records between
+    ticks are skipped and faster playback costs no more than real time.
+    """
+    if speed <= 0:
+        raise ValueError(f"Replay speed must be positive, got {speed}")
+    if not len(records):
+        return
+    times = records["time"] - records["time"][0]
+    states = records["state"]
+    elapsed = 0.0
+    index = -1
+    async for time_diff in FixedRateScheduler(rate).ticks():
+        elapsed += time_diff * speed
+        due = int(np.searchsorted(times, elapsed, side="right")) - 1
+        if due != index:
+            index = due
+            apply(np.array(states[index]))
+        if index == len(times) - 1:
+            break
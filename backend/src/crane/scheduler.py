@@ -0,0 +1,76 @@
+import asyncio
+from typing import AsyncIterator, Optional, Union
+
+
+class LoopClock:
+    """Wall-clock time of the running event loop"""
+
+    def time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    async def sleep(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+
+class SimulatedClock:
+    """
+    Time that jumps forward instead of waiting
+
+    sleep advances the clock by the delay at once, so code scheduled against this clock runs
+    as fast as the CPU allows. A cooperative clock still yields to other tasks on every sleep;
+    without that, a single task such as a headless simulation runs without returning to the
+    event loop at all.
+    """
+
+    def __init__(self, start: float = 0.0, cooperative: bool = True):
+        self.now = start
+        self.cooperative = cooperative
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.now += max(delay, 0.0)
+        if self.cooperative:
+            await asyncio.sleep(0)
+
+
+Clock = Union[LoopClock, SimulatedClock]
+
+
+class FixedRateScheduler:
+    """
+    Drift-compensated fixed-rate ticks
+
+    Tick deadlines are computed from the start time rather than by sleeping a fixed period after
+    each tick, so time spent doing work and sleep overshoot do not accumulate into drift.
+    If the consumer falls more than a full period behind, the schedule is reset to now instead
+    of firing a burst of catch-up ticks. Time comes from clock, the event loop by default.
+    """
+
+    def __init__(self, rate: float, clock: Optional[Clock] = None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.period = 1 / rate
+        self.clock = clock or LoopClock()
+        self.overruns = 0
+        # How long after its deadline the most recent tick fired
+        self.lateness = 0.0
+
+    async def ticks(self) -> AsyncIterator[float]:
+        """Yield the time elapsed since the previous tick, starting with 0"""
+        clock = self.clock
+        next_time = last_time = clock.time()
+        while True:
+            now = clock.time()
+            self.lateness = now - next_time
+            yield now - last_time
+            last_time = now
+            next_time += self.period
+            delay = next_time - clock.time()
+            if delay < -self.period:
+                self.overruns += 1
+                next_time = clock.time()
+                delay = 0
+            await clock.sleep(max(delay, 0))
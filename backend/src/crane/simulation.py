@@ -0,0 +1,170 @@
+"""
+Headless batch simulation of randomized moves
+
+Each scenario moves a MotionController from a random valid start to a random valid target on
+a SimulatedClock, so a move takes as long as the CPU needs to compute it rather than as long as
+it would take in real time. Moves whose path would collide are rejected by the controller and
+counted. Batches of scenarios run across a process pool.
+
+Run from the backend directory with e.g.
+    python -m crane.simulation --scenarios 5000 --crane my_crane.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from crane.collision import CollisionModel
+from crane.crane_service import CraneService
+from crane.models import DEFAULT_CRANE, Crane
+from crane.motion_controller import AXES, MotionController, array_to_state
+from crane.scheduler import SimulatedClock
+
+# Scenarios simulated by one worker task
+CHUNK_SIZE = 250
+
+
+def state_bounds(crane: Crane) -> tuple[np.ndarray, np.ndarray]:
+    """Lower and upper bounds of random motor positions, in AXES order, within the limits"""
+    lower = np.array([-180.0, 0.0, -150.0, -180.0, 0.0])
+    upper = np.array([180.0, crane.column.height, 150.0, 180.0, crane.gripper.width])
+    model = CollisionModel.for_crane(crane)
+    return np.maximum(lower, model.lower), np.minimum(upper, model.upper)
+
+
+def random_states(crane: Crane, n: int, rng: np.random.Generator) -> np.ndarray:
+    """n random states free of collisions, drawn in batches and filtered in one call each"""
+    lower, upper = state_bounds(crane)
+    states = np.empty((0, len(AXES)))
+    while len(states) < n:
+        candidates = rng.uniform(lower, upper, size=(n, len(AXES)))
+        valid = CraneService.is_valid_state_batch(candidates, crane)
+        if not valid.any():
+            raise ValueError("No valid states found within the motor limits")
+        states = np.vstack([states, candidates[valid]])
+    return states[:n]
+
+
+def run_scenarios(
+    crane: Crane,
+    seed: np.random.SeedSequence,
+    count: int,
+    rate: float = 100.0,
+    max_duration: float = 30.0,
+) -> dict[str, np.ndarray]:
+    """
+    Simulate count random moves
+
+    Returns whether the controller accepted every move, the simulated cycle time, the absolute
+    error of each motor and the distance of the gripper from its target when the move ended.
+    """
+    rng = np.random.default_rng(seed)
+    starts = random_states(crane, count, rng)
+    targets = random_states(crane, count, rng)
+    cycle_times = np.empty(count)
+    finals = np.empty_like(targets)
+    accepted = np.empty(count, dtype=bool)
+
+    async def run() -> None:
+        for i in range(count):
+            clock = SimulatedClock(cooperative=False)
+            controller = MotionController(
+                array_to_state(starts[i]), crane, rate, clock=clock
+            )
+            motion = await controller.apply_motion(
+                array_to_state(targets[i]), max_duration
+            )
+            accepted[i] = await motion
+            cycle_times[i] = clock.time()
+            finals[i] = controller.positions
+
+    asyncio.run(run())
+    final_xyz = CraneService.swing_lift_elbow_to_xyz_batch(finals[:, :3], crane)
+    target_xyz = CraneService.swing_lift_elbow_to_xyz_batch(targets[:, :3], crane)
+    return {
+        "accepted": accepted,
+        "cycle_time": cycle_times,
+        "joint_error": np.abs(finals - targets),
+        "xyz_error": np.linalg.norm(final_xyz - target_xyz, axis=1),
+    }
+
+
+def simulate(
+    crane: Crane,
+    scenarios: int,
+    rate: float = 100.0,
+    max_duration: float = 30.0,
+    seed: int = 0,
+    workers: Optional[int] = None,
+) -> dict[str, np.ndarray]:
+    """Simulate random moves across a process pool, reproducibly for a given seed"""
+    counts = [CHUNK_SIZE] * (scenarios // CHUNK_SIZE)
+    if scenarios % CHUNK_SIZE:
+        counts.append(scenarios % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    with ProcessPoolExecutor(workers) as pool:
+        chunks = list(
+            pool.map(
+                run_scenarios,
+                [crane] * len(counts),
+                seeds,
+                counts,
+                [rate] * len(counts),
+                [max_duration] * len(counts),
+            )
+        )
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+
+def summarize(results: dict[str, np.ndarray], max_duration: float) -> dict:
+    """Statistics of the accepted moves, or only the counts if every move was rejected"""
+    accepted = results["accepted"]
+    counts = {"scenarios": len(accepted), "rejected": int((~accepted).sum())}
+    if not accepted.any():
+        return counts
+    cycle_time = results["cycle_time"][accepted]
+    return {
+        **counts,
+        "cycle_time": {
+            "mean": float(cycle_time.mean()),
+            "p50": float(np.percentile(cycle_time, 50)),
+            "p95": float(np.percentile(cycle_time, 95)),
+            "max": float(cycle_time.max()),
+        },
+        "timed_out": int((cycle_time >= max_duration).sum()),
+        "max_joint_error": dict(
+            zip(AXES, results["joint_error"][accepted].max(axis=0).tolist())
+        ),
+        "max_xyz_error": float(results["xyz_error"][accepted].max()),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", type=int, default=1000)
+    parser.add_argument("--crane", type=Path, help="Crane config as JSON")
+    parser.add_argument("--rate", type=float, default=100.0, help="Control rate in Hz")
+    parser.add_argument("--max-duration", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    crane = (
+        Crane.model_validate_json(args.crane.read_text())
+        if args.crane
+        else DEFAULT_CRANE
+    )
+    results = simulate(
+        crane, args.scenarios, args.rate, args.max_duration, args.seed, args.workers
+    )
+    print(json.dumps(summarize(results, args.max_duration), indent=2))
+
+
+if __name__ == "__main__":
+    main()
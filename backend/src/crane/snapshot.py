@@ -0,0 +1,236 @@
+"""
+Compact state snapshots for the streaming hot path
+
+The broadcaster snapshots every changed crane up to 60 times a second and encodes each snapshot
+once per distinct client orientation and wire format. Building, copying and dumping a pydantic
+Response for each would validate and allocate nested models on every frame, so the stream uses
+StateSnapshot, a slotted record of plain floats, and writes the JSON of the equivalent Response
+directly from a pre-built template. Response stays the schema of the API.
+"""
+
+import functools
+import json
+from typing import Hashable, Optional
+
+import numpy as np
+
+from crane.models import (
+    DEFAULT_CRANE_ID,
+    CraneState,
+    MotionSegment,
+    ProgramProgress,
+    Response,
+    Status,
+    XYZPosition,
+)
+from crane.trajectory import Trajectory
+
+MOTOR_FIELDS = ("swing", "lift", "elbow", "wrist", "gripper")
+XYZ_FIELDS = ("x", "y", "z")
+
+# The JSON of a Response, field for field as pydantic writes it, filled in with one % operation
+_JSON = (
+    '{"craneId":%s,'
+    '"craneState":{"swing":%r,"lift":%r,"elbow":%r,"wrist":%r,"gripper":%r},'
+    '"xyzPosition":%s,"program":%s,"errorMessage":%s,"status":%s,"success":%s,'
+    '"time":%s,"segment":%s}'
+)
+_XYZ_JSON = '{"x":%r,"y":%r,"z":%r}'
+_MOTORS_JSON = '{"swing":%r,"lift":%r,"elbow":%r,"wrist":%r,"gripper":%r}'
+_SEGMENT_JSON = (
+    '{"startTime":%r,"duration":%r,"accelTime":%r,"start":'
+    + _MOTORS_JSON
+    + ',"end":'
+    + _MOTORS_JSON
+    + "}"
+)
+_STATUS_JSON = {status: json.dumps(status.value) for status in Status}
+
+
+@functools.lru_cache(maxsize=4096)
+def _json_string(value: str) -> str:
+    return json.dumps(value)
+
+
+def segment_values(segment: tuple[float, Trajectory]) -> tuple[float, ...]:
+    """The start time, duration, acceleration time, start and end motors of a segment"""
+    start_time, trajectory = segment
+    return (
+        float(start_time),
+        float(trajectory.duration),
+        float(trajectory.t_accel),
+        *trajectory.start.tolist(),
+        *trajectory.end.tolist(),
+    )
+
+
+class StateSnapshot:
+    """
+    The state of one crane as streamed to clients
+
+    values holds the five motor positions in MOTOR_FIELDS order, followed by the gripper x, y
+    and z when they are known, all as Python floats. program is the (step, steps) of a running
+    program. version changes whenever values do, so consumers can tell that nothing moved
+    without comparing them; it is None when values can change without a new version.
+    time is when the snapshot was taken on the monotonic server clock, and segment the motion
+    ahead as the server time at which it starts and the Trajectory the motors follow from then.
+    """
+
+    __slots__ = (
+        "crane_id",
+        "values",
+        "status",
+        "success",
+        "error_message",
+        "program",
+        "version",
+        "time",
+        "segment",
+    )
+
+    def __init__(
+        self,
+        crane_id: str,
+        values: tuple[float, ...],
+        status: Status,
+        success: bool = True,
+        error_message: Optional[str] = None,
+        program: Optional[tuple[int, int]] = None,
+        version: Optional[Hashable] = None,
+        time: Optional[float] = None,
+        segment: Optional[tuple[float, Trajectory]] = None,
+    ):
+        self.crane_id = crane_id
+        self.values = values
+        self.status = status
+        self.success = success
+        self.error_message = error_message
+        self.program = program
+        self.version = version
+        self.time = time
+        self.segment = segment
+
+    # Read like a SwingLiftElbow, e.g. by forward kinematics
+    @property
+    def swing(self) -> float:
+        return self.values[0]
+
+    @property
+    def lift(self) -> float:
+        return self.values[1]
+
+    @property
+    def elbow(self) -> float:
+        return self.values[2]
+
+    @property
+    def has_xyz(self) -> bool:
+        return len(self.values) > len(MOTOR_FIELDS)
+
+    def with_xyz(self, xyz: tuple[float, float, float]) -> "StateSnapshot":
+        """A copy with the gripper position, e.g. as seen from one client's orientation"""
+        return StateSnapshot(
+            self.crane_id,
+            self.values[: len(MOTOR_FIELDS)] + xyz,
+            self.status,
+            self.success,
+            self.error_message,
+            self.program,
+            self.version,
+            self.time,
+            self.segment,
+        )
+
+    def motion_key(self) -> Optional[tuple]:
+        """
+        What a client interpolating the segment would see change, or None without a segment
+
+        While the key stays the same such a client can do without frames.
+        """
+        if self.segment is None:
+            return None
+        return (self.segment[1], self.status, self.success, self.error_message)
+
+    def to_json(self) -> str:
+        """The JSON of to_response(), without building it"""
+        values = self.values
+        return _JSON % (
+            _json_string(self.crane_id),
+            *values[:5],
+            _XYZ_JSON % values[5:8] if len(values) > 5 else "null",
+            "null" if self.program is None else '{"step":%d,"steps":%d}' % self.program,
+            "null" if self.error_message is None else json.dumps(self.error_message),
+            _STATUS_JSON[self.status],
+            "true" if self.success else "false",
+            "null" if self.time is None else repr(self.time),
+            "null"
+            if self.segment is None
+            else _SEGMENT_JSON % segment_values(self.segment),
+        )
+
+    def to_response(self) -> Response:
+        xyz = None
+        if self.has_xyz:
+            xyz = XYZPosition(**dict(zip(XYZ_FIELDS, self.values[5:8])))
+        program = None
+        if self.program is not None:
+            step, steps = self.program
+            program = ProgramProgress(step=step, steps=steps)
+        segment = None
+        if self.segment is not None:
+            values = segment_values(self.segment)
+            segment = MotionSegment(
+                startTime=values[0],
+                duration=values[1],
+                accelTime=values[2],
+                start=CraneState(**dict(zip(MOTOR_FIELDS, values[3:8]))),
+                end=CraneState(**dict(zip(MOTOR_FIELDS, values[8:13]))),
+            )
+        return Response(
+            craneId=self.crane_id,
+            craneState=CraneState(**dict(zip(MOTOR_FIELDS, self.values[:5]))),
+            xyzPosition=xyz,
+            program=program,
+            errorMessage=self.error_message,
+            status=self.status,
+            success=self.success,
+            time=self.time,
+            segment=segment,
+        )
+
+    @classmethod
+    def from_response(
+        cls, response: Response, version: Optional[Hashable] = None
+    ) -> "StateSnapshot":
+        state, xyz = response.craneState, response.xyzPosition
+        if state is None:
+            raise ValueError("Snapshots need a craneState")
+        values = tuple(float(getattr(state, field)) for field in MOTOR_FIELDS)
+        if xyz is not None:
+            values += (float(xyz.x), float(xyz.y), float(xyz.z))
+        program = None
+        if response.program is not None:
+            program = (response.program.step, response.program.steps)
+        segment = None
+        if response.segment is not None:
+            motion = response.segment
+            segment = (
+                motion.startTime,
+                Trajectory(
+                    np.array([getattr(motion.start, field) for field in MOTOR_FIELDS]),
+                    np.array([getattr(motion.end, field) for field in MOTOR_FIELDS]),
+                    motion.duration,
+                    motion.accelTime,
+                ),
+            )
+        return cls(
+            response.craneId or DEFAULT_CRANE_ID,
+            values,
+            response.status,
+            response.success,
+            response.errorMessage,
+            program,
+            version,
+            response.time,
+            segment,
+        )
@@ -0,0 +1,115 @@
+"""
+The state stream to websocket clients, shared by the motion process and the gateway workers
+
+server.py streams the cranes it owns and gateway.py the snapshots relayed to it over the state
+bus. Both negotiate the wire format the same way, place the default crane where each client
+puts it and send the same frames, so clients cannot tell them apart.
+"""
+
+import logging
+import time
+from typing import Callable
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from crane.broadcaster import Frame, StateBroadcaster, Subscriber, orientation_key
+from crane.crane_service import CraneService
+from crane.models import DEFAULT_CRANE_ID, Crane, CraneOrientation, WireFormat
+from crane.snapshot import StateSnapshot
+from crane.wire import BinaryEncoder
+
+logger = logging.getLogger(__name__)
+
+# Shortest interval between state frames, changes in between are coalesced
+STREAM_INTERVAL_SECONDS = 1 / 60
+# Frames are resent at least this often while a crane is stopped
+HEARTBEAT_INTERVAL_SECONDS = 1.0
+# Clients that interpolate motion segments get a frame at least this often while a crane moves
+INTERPOLATED_INTERVAL_SECONDS = 0.25
+# Frames buffered per client before the oldest is dropped
+CLIENT_QUEUE_SIZE = 8
+# Binary clients get a full frame at least this often while the crane is stopped
+KEYFRAME_INTERVAL = 50
+# Interval at which event loop lag is sampled
+EVENT_LOOP_LAG_INTERVAL_SECONDS = 0.05
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+StateEncoder = Callable[[StateSnapshot, CraneOrientation, WireFormat, bool], Frame]
+
+
+def state_encoder(default_crane: Callable[[], Crane]) -> StateEncoder:
+    """Encode snapshots for clients, with default_crane() giving the current default crane"""
+    binary_encoder = BinaryEncoder(KEYFRAME_INTERVAL)
+
+    def encode_state(
+        snapshot: StateSnapshot,
+        orientation: CraneOrientation,
+        wire_format: WireFormat,
+        keyframe: bool = False,
+    ) -> Frame:
+        """Encode a snapshot for clients viewing the crane with the given orientation."""
+        # Unless its orientation is streamed, the default crane is where each client puts it.
+        # Streamed positions rarely repeat, so they are solved directly rather than memoized.
+        if snapshot.crane_id == DEFAULT_CRANE_ID and not snapshot.has_xyz:
+            xyz = CraneService.swing_lift_elbow_to_xyz(
+                snapshot, default_crane(), orientation
+            )
+            snapshot = snapshot.with_xyz((xyz.x, xyz.y, xyz.z))
+        # Simulated cranes carry their own orientation, so their snapshot is already complete
+        if wire_format == WireFormat.BINARY:
+            return binary_encoder.encode(
+                (snapshot.crane_id, orientation_key(orientation)), snapshot, keyframe
+            )
+        return snapshot.to_json()
+
+    return encode_state
+
+
+def state_broadcaster(
+    snapshot: Callable[[set[str]], dict[str, StateSnapshot]],
+    encode: StateEncoder,
+) -> StateBroadcaster[StateSnapshot]:
+    """A broadcaster with the stream intervals and queue size shared by all processes"""
+    return StateBroadcaster(
+        snapshot,
+        encode,
+        STREAM_INTERVAL_SECONDS,
+        CLIENT_QUEUE_SIZE,
+        HEARTBEAT_INTERVAL_SECONDS,
+        INTERPOLATED_INTERVAL_SECONDS,
+    )
+
+
+def negotiate(websocket: WebSocket) -> tuple[WireFormat, bool]:
+    """
+    The wire format of a client and whether it interpolates, negotiated once at connect
+
+    e.g. /ws?format=binary for binary frames, and /ws?interpolate=1 for clients that
+    interpolate motion segments and opt in to fewer frames.
+    """
+    requested_format = websocket.query_params.get("format", WireFormat.JSON.value)
+    try:
+        wire_format = WireFormat(requested_format)
+    except ValueError:
+        logger.error(f"Unknown wire format {requested_format}, using JSON")
+        wire_format = WireFormat.JSON
+    interpolate = websocket.query_params.get("interpolate", "0") == "1"
+    return wire_format, interpolate
+
+
+async def stream_state(websocket: WebSocket, subscriber: Subscriber) -> None:
+    """Forward the shared state stream to a single client."""
+    while True:
+        try:
+            frame = await subscriber.next_frame()
+            start = time.perf_counter()
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+            subscriber.record_send(time.perf_counter() - start)
+        except WebSocketDisconnect:
+            break
+        except Exception as e:
+            logger.error(f"Error in state stream: {e}", exc_info=True)
+            break
@@ -0,0 +1,413 @@
+import math
+from typing import Optional, Union
+
+import numpy as np
+
+# Longest segment of a waypoint path, in seconds at full speed, see
+# WaypointTrajectory.from_limits
+MAX_SEGMENT_SECONDS = 0.01
+# Change in velocity at full speed, as a fraction of the speed limit, above which a waypoint
+# path stops at a corner
+SHARP_CORNER = 0.05
+# Control period over which the motors see the change in velocity at a corner, that of the 1 kHz
+# motion controller
+CORNER_SECONDS = 0.001
+
+# A piece of a trajectory: when it starts and stops applying, in seconds after the start of the
+# trajectory, and the motion over that span as a Trajectory starting at 0
+Piece = tuple[float, float, "Trajectory"]
+
+
+class Trajectory:
+    """
+    Time-parameterized, synchronized trapezoidal motion of all motors
+
+    Every motor follows the same normalized profile s(t), rising from 0 to 1 with constant
+    acceleration for t_accel, cruising, then decelerating for t_accel:
+        position(t) = start + (end - start) * s(t)
+    so all motors start and arrive together and move along a straight line in joint space.
+    The duration is the shortest for which no motor exceeds its velocity or acceleration limit.
+    With V = max(distance / max_speed) and A = max(distance / max_acceleration) over the motors:
+        A <= V**2: trapezoid with duration V + A / V and t_accel = A / V
+        A >  V**2: triangle with duration 2 * sqrt(A) and t_accel = duration / 2
+    Motion is planned from rest, so retargeting mid-move restarts from zero velocity.
+    A t_accel of 0 moves at constant velocity throughout, e.g. for a linear piece of a path.
+    """
+
+    def __init__(
+        self, start: np.ndarray, end: np.ndarray, duration: float, t_accel: float
+    ):
+        self.start = start
+        self.end = end
+        self.delta = end - start
+        self.duration = duration
+        self.t_accel = t_accel
+        self._accel = (
+            1 / (t_accel * (duration - t_accel))
+            if duration > 0 and t_accel > 0
+            else 0.0
+        )
+
+    @classmethod
+    def plan(
+        cls,
+        start: np.ndarray,
+        end: np.ndarray,
+        max_speeds: np.ndarray,
+        max_accelerations: np.ndarray,
+    ) -> "Trajectory":
+        start = np.asarray(start, dtype=float)
+        end = np.asarray(end, dtype=float)
+        distance = np.abs(end - start)
+        if not distance.any():
+            return cls(start, end, 0.0, 0.0)
+        v = float(np.max(distance / max_speeds))
+        a = float(np.max(distance / max_accelerations))
+        if a <= v**2:
+            return cls(start, end, v + a / v, a / v)
+        duration = 2 * math.sqrt(a)
+        return cls(start, end, duration, duration / 2)
+
+    def progress(self, t: float) -> float:
+        """The normalized profile s(t), from 0 at the start to 1 at the end"""
+        if t >= self.duration:
+            return 1.0
+        if t <= 0:
+            return 0.0
+        if self.t_accel == 0:
+            return t / self.duration
+        if t < self.t_accel:
+            return 0.5 * self._accel * t**2
+        if t <= self.duration - self.t_accel:
+            return self._accel * self.t_accel * (t - 0.5 * self.t_accel)
+        return 1 - 0.5 * self._accel * (self.duration - t) ** 2
+
+    def progress_batch(self, times: np.ndarray) -> np.ndarray:
+        """The normalized profile s(t) for an array of times"""
+        times = np.asarray(times, dtype=float)
+        if self.duration <= 0:
+            return (times >= 0).astype(float)
+        t = np.clip(times, 0, self.duration)
+        if self.t_accel == 0:
+            return t / self.duration
+        return np.where(
+            t < self.t_accel,
+            0.5 * self._accel * t**2,
+            np.where(
+                t <= self.duration - self.t_accel,
+                self._accel * self.t_accel * (t - 0.5 * self.t_accel),
+                1 - 0.5 * self._accel * (self.duration - t) ** 2,
+            ),
+        )
+
+    def sample(self, t: float) -> np.ndarray:
+        """Motor positions at t seconds after the start"""
+        if t >= self.duration:
+            return self.end.copy()
+        return self.start + self.delta * self.progress(t)
+
+    def sample_batch(self, times: np.ndarray) -> np.ndarray:
+        """(N, 5) motor positions at an array of N times"""
+        return self.start + np.outer(self.progress_batch(times), self.delta)
+
+    def velocity(self, t: float) -> np.ndarray:
+        """Motor velocities at t seconds after the start"""
+        if t <= 0 or t >= self.duration:
+            return np.zeros_like(self.delta)
+        if self.t_accel == 0:
+            return self.delta / self.duration
+        rate = self._accel * min(t, self.t_accel, self.duration - t)
+        return self.delta * rate
+
+    def piece(self, t: float, horizon: float) -> Piece:
+        """The piece of the trajectory that t falls in, which is all of it"""
+        return 0.0, self.duration, self
+
+
+class WaypointTrajectory:
+    """
+    Motion along a piecewise-linear path through joint-space waypoints
+
+    times are when each waypoint is reached. rates are the relative speeds along the path at
+    each waypoint, which change linearly in time across each segment, so the motors accelerate
+    and brake smoothly; without rates every segment is crossed at constant velocity.
+    from_limits times a path within the speed and acceleration limits of every motor.
+    """
+
+    def __init__(
+        self,
+        waypoints: np.ndarray,
+        times: np.ndarray,
+        rates: Optional[np.ndarray] = None,
+    ):
+        if len(waypoints) != len(times) or len(waypoints) < 1:
+            raise ValueError("Expected one time per waypoint and at least one waypoint")
+        if rates is not None and len(rates) != len(times):
+            raise ValueError("Expected one rate per waypoint")
+        self.waypoints = waypoints
+        self.times = times
+        self.rates = np.ones(len(times)) if rates is None else rates
+        self.start = waypoints[0]
+        self.end = waypoints[-1]
+        self.duration = float(times[-1])
+
+    @classmethod
+    def from_limits(
+        cls,
+        waypoints: np.ndarray,
+        max_speeds: np.ndarray,
+        max_accelerations: np.ndarray,
+        max_segment: float = MAX_SEGMENT_SECONDS,
+        corner_time: float = CORNER_SECONDS,
+    ) -> "WaypointTrajectory":
+        """
+        Time waypoints from rest to rest within the speed and acceleration limits of every motor
+
+        The path is measured in s, the time it takes at full speed, where each segment takes as
+        long as its slowest motor needs at maximum speed and a motor moves at velocity u. At a
+        path speed of ds/dt, at most 1, a motor accelerates by u * d2s/dt2 within a segment,
+        and turning the corner at a waypoint, where u changes by du over about half of each
+        neighbouring segment, by du / ds * (ds/dt)**2. Half of each motor's acceleration limit
+        goes to each: the corners cap the path speed at each waypoint, and a forward and a
+        backward pass limit how quickly it changes between them. Sharp corners, where the
+        velocity of a motor at full speed changes by more than SHARP_CORNER of its speed limit,
+        such as between a move onto a line and the line, are taken from rest. The velocity of a
+        motor changes at once at a corner, which a controller stepping every corner_time seconds
+        sees as an acceleration, so the change is also capped to half the acceleration limit
+        over corner_time. Sampled at that period or coarser, no motor exceeds its limits.
+        Segments longer than max_segment seconds at full speed are split, so the motors can
+        speed up and brake again along them.
+        """
+        waypoints = np.asarray(waypoints, dtype=float)
+        lengths = np.max(np.abs(np.diff(waypoints, axis=0)) / max_speeds, axis=1)
+        pieces = np.maximum(np.ceil(lengths / max_segment), 1).astype(int)
+        if (pieces > 1).any():
+            segment = np.repeat(np.arange(len(pieces)), pieces)
+            first = np.cumsum(pieces) - pieces
+            fraction = (np.arange(len(segment)) - first[segment]) / pieces[segment]
+            waypoints = np.vstack(
+                [
+                    waypoints[segment]
+                    + fraction[:, None] * (waypoints[segment + 1] - waypoints[segment]),
+                    waypoints[-1:],
+                ]
+            )
+        deltas = np.diff(waypoints, axis=0)
+        lengths = np.max(np.abs(deltas) / max_speeds, axis=1)
+        if not lengths.any():
+            return cls(waypoints, np.zeros(len(waypoints)))
+        half = max_accelerations / 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            velocities = np.where(lengths[:, None] > 0, deltas / lengths[:, None], 0.0)
+            # Largest rate of change of the path speed on each segment
+            accelerations = np.min(half / np.abs(velocities), axis=1)
+            turns = (
+                np.abs(np.diff(velocities, axis=0))
+                / np.minimum(lengths[:-1], lengths[1:])[:, None]
+            )
+            caps = np.minimum(np.sqrt(np.min(half / turns, axis=1)), 1.0)
+            # A motor steps through a corner within one control period, so its velocity may
+            # change by no more than half its acceleration over that period
+            jumps = np.min(
+                half * corner_time / np.abs(np.diff(velocities, axis=0)), axis=1
+            )
+            caps = np.minimum(caps, jumps)
+        caps = np.nan_to_num(caps, nan=1.0)
+        sharp = np.any(
+            np.abs(np.diff(velocities, axis=0)) > SHARP_CORNER * max_speeds, axis=1
+        )
+        caps = [0.0, *np.where(sharp, 0.0, caps).tolist(), 0.0]
+        lengths_list = lengths.tolist()
+        accelerations_list = accelerations.tolist()
+        speeds = caps
+        for k, (length, acceleration) in enumerate(
+            zip(lengths_list, accelerations_list)
+        ):
+            reachable = math.sqrt(speeds[k] ** 2 + 2 * acceleration * length)
+            speeds[k + 1] = min(speeds[k + 1], reachable)
+        for k in range(len(lengths_list) - 1, -1, -1):
+            reachable = math.sqrt(
+                speeds[k + 1] ** 2 + 2 * accelerations_list[k] * lengths_list[k]
+            )
+            speeds[k] = min(speeds[k], reachable)
+        rates = np.array(speeds)
+        total = rates[:-1] + rates[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            durations = np.where(
+                total > 0,
+                2 * lengths / total,
+                # Tiny segments between two stops, e.g. onto the path, speed up and stop again
+                2 * np.sqrt(lengths / accelerations),
+            )
+        durations = np.nan_to_num(durations)
+        return cls(waypoints, np.concatenate([[0.0], np.cumsum(durations)]), rates)
+
+    def _segment(self, t: float) -> tuple[int, float]:
+        """The segment t falls in, and how far along it the motors are, from 0 to 1"""
+        index = int(np.searchsorted(self.times, t, side="right")) - 1
+        index = min(max(index, 0), len(self.times) - 2)
+        span = self.times[index + 1] - self.times[index]
+        if span <= 0:
+            return index, 1.0
+        elapsed = t - self.times[index]
+        first, last = self.rates[index], self.rates[index + 1]
+        if first + last <= 0:
+            return index, elapsed / span
+        # Distance covered with the rate changing linearly from first to last
+        covered = first * elapsed + (last - first) * elapsed**2 / (2 * span)
+        return index, covered / ((first + last) / 2 * span)
+
+    def sample(self, t: float) -> np.ndarray:
+        """Motor positions at t seconds after the start"""
+        if t >= self.duration or len(self.times) == 1:
+            return self.end.copy()
+        if t <= 0:
+            return self.start.copy()
+        index, fraction = self._segment(t)
+        return self.waypoints[index] + fraction * (
+            self.waypoints[index + 1] - self.waypoints[index]
+        )
+
+    def sample_batch(self, times: np.ndarray) -> np.ndarray:
+        """(N, 5) motor positions at an array of N times, as sample does for one"""
+        t = np.clip(np.asarray(times, dtype=float), 0, self.duration)
+        if len(self.times) == 1:
+            return np.tile(self.end, (len(t), 1))
+        index = np.searchsorted(self.times, t, side="right") - 1
+        index = np.clip(index, 0, len(self.times) - 2)
+        span = self.times[index + 1] - self.times[index]
+        elapsed = t - self.times[index]
+        first, last = self.rates[index], self.rates[index + 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covered = first * elapsed + (last - first) * elapsed**2 / (2 * span)
+            fraction = np.where(
+                first + last > 0,
+                covered / ((first + last) / 2 * span),
+                elapsed / span,
+            )
+        fraction = np.where(span > 0, fraction, 1.0)
+        start = self.waypoints[index]
+        return start + fraction[:, None] * (self.waypoints[index + 1] - start)
+
+    def velocity(self, t: float) -> np.ndarray:
+        """Motor velocities at t seconds after the start"""
+        if t <= 0 or t >= self.duration or len(self.times) == 1:
+            return np.zeros_like(self.start)
+        index, _ = self._segment(t)
+        span = self.times[index + 1] - self.times[index]
+        delta = self.waypoints[index + 1] - self.waypoints[index]
+        first, last = self.rates[index], self.rates[index + 1]
+        if span <= 0:
+            return np.zeros_like(self.start)
+        if first + last <= 0:
+            return delta / span
+        rate = first + (last - first) * (t - self.times[index]) / span
+        average = (first + last) / 2
+        return delta * rate / (average * span)
+
+    def piece(self, t: float, horizon: float) -> Piece:
+        """The path from t to horizon seconds later as one linear move"""
+        return linear_piece(self, t, horizon)
+
+
+class ProgramTrajectory:
+    """
+    A motion program: synchronized trapezoidal moves run back to back
+
+    Each step is a Trajectory from the target of the previous step, starting as soon as the
+    previous one ends, or after its dwell. A step with a blend overlaps the start of the next
+    move with the end of its own, and the motor positions are the sum of both moves, so the
+    motors round the corner without stopping. The overlap is no longer than the deceleration of
+    one move or the acceleration of the next, so no motor exceeds its speed limit; a motor that
+    reverses direction can briefly see up to twice its acceleration limit.
+    """
+
+    def __init__(
+        self, segments: list[Trajectory], starts: np.ndarray, dwell: float = 0.0
+    ):
+        if not segments or len(segments) != len(starts):
+            raise ValueError(
+                "Expected one start time per segment and at least one segment"
+            )
+        self.segments = segments
+        self.starts = starts
+        self.ends = starts + np.array([segment.duration for segment in segments])
+        self.start = segments[0].start
+        self.end = segments[-1].end
+        self.duration = float(self.ends[-1] + dwell)
+        # Sum of the motion of the first k segments
+        self._offsets = np.vstack(
+            [np.zeros_like(self.start), np.cumsum([s.delta for s in segments], axis=0)]
+        )
+
+    def _active(self, t: float) -> tuple[int, int]:
+        """Number of segments that have finished, and that have started, by time t"""
+        finished = int(np.searchsorted(self.ends, t, side="right"))
+        started = int(np.searchsorted(self.starts, t, side="right"))
+        return finished, started
+
+    def step_index(self, t: float) -> int:
+        """Index of the most recently started step at t seconds after the start"""
+        _, started = self._active(t)
+        return min(max(started - 1, 0), len(self.segments) - 1)
+
+    def sample(self, t: float) -> np.ndarray:
+        """Motor positions at t seconds after the start"""
+        if t >= self.duration:
+            return self.end.copy()
+        finished, started = self._active(t)
+        positions = self.start + self._offsets[finished]
+        for index in range(finished, started):
+            segment = self.segments[index]
+            positions += segment.delta * segment.progress(t - self.starts[index])
+        return positions
+
+    def sample_batch(self, times: np.ndarray) -> np.ndarray:
+        """
+        (N, 5) motor positions at an array of N times
+
+        Each segment contributes none of its motion before it starts and all of it after it
+        ends, so the positions are the start plus the progress of every segment.
+        """
+        times = np.asarray(times, dtype=float)
+        positions = np.tile(self.start, (len(times), 1))
+        for segment, start in zip(self.segments, self.starts):
+            positions += np.outer(segment.progress_batch(times - start), segment.delta)
+        return positions
+
+    def velocity(self, t: float) -> np.ndarray:
+        """Motor velocities at t seconds after the start"""
+        velocity = np.zeros_like(self.start)
+        if t <= 0 or t >= self.duration:
+            return velocity
+        finished, started = self._active(t)
+        for index in range(finished, started):
+            velocity += self.segments[index].velocity(t - self.starts[index])
+        return velocity
+
+    def piece(self, t: float, horizon: float) -> Piece:
+        """
+        The step that t falls in, until it ends or the next step blends in
+
+        Blends and dwells are returned as a linear move up to horizon seconds long.
+        """
+        finished, started = self._active(t)
+        if started - finished != 1:
+            return linear_piece(self, t, horizon)
+        end = self.ends[finished]
+        if started < len(self.starts):
+            end = min(end, self.starts[started])
+        return float(self.starts[finished]), float(end), self.segments[finished]
+
+
+def linear_piece(trajectory: "JointTrajectory", t: float, horizon: float) -> Piece:
+    """A constant velocity approximation of a trajectory from t to horizon seconds later"""
+    end = min(t + horizon, trajectory.duration)
+    if end <= t:
+        end = t + horizon
+    line = Trajectory(trajectory.sample(t), trajectory.sample(end), end - t, 0.0)
+    return t, end, line
+
+
+# Anything the motion controller can follow
+JointTrajectory = Union[Trajectory, WaypointTrajectory, ProgramTrajectory]
@@ -0,0 +1,81 @@
+"""
+Velocity-level inverse kinematics for continuously tracking moving targets
+
+Instead of solving position IK from scratch every tick, which is wasteful and can jump between
+the elbow up and elbow down solutions, each tick converts the gripper velocity needed to close
+on the target into motor velocities through the Jacobian. The motors then move smoothly from
+wherever they are, on whichever branch they are on.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from crane.crane_service import CraneService, OrientationLike
+from crane.models import DEFAULT_CRANE, Crane
+
+# Damping fades in as the smallest singular value of the Jacobian drops below this, in metres
+# per degree. For 1 m arms it is reached about 10 degrees from fully stretched or folded.
+SINGULAR_THRESHOLD = 0.0015
+# Damping at an exact singularity
+MAX_DAMPING = 0.005
+# Rate at which the remaining distance to the target is closed, per second
+TRACKING_GAIN = 10.0
+
+
+def damped_least_squares(
+    jacobians: np.ndarray,
+    velocities: np.ndarray,
+    max_damping: float = MAX_DAMPING,
+    threshold: float = SINGULAR_THRESHOLD,
+) -> np.ndarray:
+    """
+    Joint velocities that best produce (N, 3) xyz velocities, given (N, 3, 3) Jacobians
+
+    Solves dq = J^T (J J^T + damping**2 I)^-1 dx for every row. Away from singularities the
+    damping is zero and this is the exact inverse. Within threshold of a singularity the damping
+    grows smoothly to max_damping, trading a small tracking error for bounded joint speeds,
+    instead of the unbounded speeds of the exact inverse.
+    """
+    sigma_min = np.linalg.svd(jacobians, compute_uv=False)[:, -1]
+    damping = np.where(
+        sigma_min < threshold,
+        max_damping**2 * (1 - (sigma_min / threshold) ** 2),
+        0.0,
+    )
+    transposed = jacobians.transpose(0, 2, 1)
+    regularized = jacobians @ transposed + damping[:, None, None] * np.eye(3)
+    return (transposed @ np.linalg.solve(regularized, velocities[..., None]))[..., 0]
+
+
+def track(
+    joints: np.ndarray,
+    targets: np.ndarray,
+    time_diff: float,
+    crane: Optional[Crane] = None,
+    orientation: Optional[OrientationLike] = None,
+    target_velocities: Optional[np.ndarray] = None,
+    gain: float = TRACKING_GAIN,
+) -> np.ndarray:
+    """
+    Advance (N, 3) swing, lift, elbow rows one tick towards (N, 3) xyz targets
+
+    The commanded gripper velocity is the target velocity, if known, plus gain times the
+    remaining error. The motor velocities are scaled down together where needed so that no motor
+    exceeds its maximum speed.
+    """
+    crane = crane or DEFAULT_CRANE
+    joints = np.asarray(joints, dtype=float)
+    positions = CraneService.swing_lift_elbow_to_xyz_batch(joints, crane, orientation)
+    velocities = gain * (np.asarray(targets, dtype=float) - positions)
+    if target_velocities is not None:
+        velocities = velocities + target_velocities
+    jacobians = CraneService.swing_lift_elbow_jacobian_batch(joints, crane, orientation)
+    joint_velocities = damped_least_squares(jacobians, velocities)
+
+    max_speeds = np.array(
+        [crane.max_speeds.swing, crane.max_speeds.lift, crane.max_speeds.elbow]
+    )
+    scale = np.max(np.abs(joint_velocities) / max_speeds, axis=1, keepdims=True)
+    joint_velocities /= np.maximum(scale, 1.0)
+    return joints + joint_velocities * time_diff
@@ -0,0 +1,185 @@
+"""
+Compact binary encoding of state frames
+
+Clients opt in by connecting to /ws?format=binary, JSON stays the default.
+All values are little-endian. Each frame is
+
+    header      version u8, kind u8, status u8, flags u8, sequence u32, field mask u16,
+                time f64, NaN if unknown
+    values      one f64 per set bit of the field mask, in FIELDS order
+    segment     start time, duration, acceleration time, then the start and end of every
+                motor in FIELDS order, 13 f64, only when the HAS_SEGMENT flag is set
+    crane id    length u8, utf-8 bytes
+    error       length u16, utf-8 bytes, only when the HAS_ERROR flag is set
+
+A FULL frame carries every field. While a crane is STOPPED, DELTA frames carry only the fields
+that changed since the previous frame with the same crane and orientation, which is usually none.
+When the snapshot version has not changed the fields are known to be the same without
+comparing them.
+Sequence numbers count frames per crane and orientation; a client that sees a gap should ignore
+deltas until the next FULL frame, which is sent at least every keyframe_interval frames, and
+as the first frame to every new client.
+"""
+
+import math
+import struct
+from enum import IntEnum
+from typing import Hashable, Optional
+
+from crane.models import Status
+from crane.snapshot import MOTOR_FIELDS, StateSnapshot, segment_values
+
+VERSION = 2
+FIELDS = ("swing", "lift", "elbow", "wrist", "gripper", "x", "y", "z")
+STATUSES = tuple(Status)
+HEADER = struct.Struct("<BBBBIHd")
+SEGMENT = struct.Struct(f"<3d{2 * len(MOTOR_FIELDS)}d")
+CRANE_ID_LENGTH = struct.Struct("<B")
+ERROR_LENGTH = struct.Struct("<H")
+SUCCESS = 1
+HAS_ERROR = 2
+HAS_SEGMENT = 4
+FULL_MASK = (1 << len(FIELDS)) - 1
+
+
+class FrameKind(IntEnum):
+    FULL = 0
+    DELTA = 1
+
+
+class _Previous:
+    __slots__ = ("sequence", "values", "version", "status", "since_keyframe")
+
+    def __init__(self):
+        self.sequence = 0
+        self.values: tuple[float, ...] = ()
+        self.version: Optional[Hashable] = None
+        self.status: Optional[Status] = None
+        self.since_keyframe = 0
+
+
+class BinaryEncoder:
+    """Encodes snapshots as binary frames, remembering the previous frame per key for deltas"""
+
+    def __init__(self, keyframe_interval: int = 50, max_keys: int = 1024):
+        self.keyframe_interval = keyframe_interval
+        self.max_keys = max_keys
+        self._previous: dict[Hashable, _Previous] = {}
+
+    def encode(
+        self, key: Hashable, snapshot: StateSnapshot, keyframe: bool = False
+    ) -> bytes:
+        """Encode the next frame of key, a FULL frame if keyframe, e.g. for a new client"""
+        if not snapshot.has_xyz:
+            raise ValueError("Binary frames need the gripper position")
+        values = snapshot.values
+        previous = self._previous.get(key)
+        if previous is None:
+            if len(self._previous) >= self.max_keys:
+                # Forget the least recently added key, its clients just get a full frame next
+                del self._previous[next(iter(self._previous))]
+            previous = self._previous[key] = _Previous()
+
+        delta = (
+            not keyframe
+            and snapshot.status == Status.STOPPED
+            and previous.status == Status.STOPPED
+            and previous.since_keyframe < self.keyframe_interval
+        )
+        if (
+            delta
+            and snapshot.version is not None
+            and snapshot.version == previous.version
+        ):
+            mask = 0
+            previous.since_keyframe += 1
+        elif delta:
+            mask = sum(
+                1 << i
+                for i, (value, last) in enumerate(zip(values, previous.values))
+                if value != last
+            )
+            previous.since_keyframe += 1
+        else:
+            mask = FULL_MASK
+            previous.since_keyframe = 0
+        previous.sequence = (previous.sequence + 1) & 0xFFFFFFFF
+        previous.values = values
+        previous.version = snapshot.version
+        previous.status = snapshot.status
+
+        flags = (
+            (SUCCESS if snapshot.success else 0)
+            | (HAS_ERROR if snapshot.error_message is not None else 0)
+            | (HAS_SEGMENT if snapshot.segment is not None else 0)
+        )
+        crane_id = snapshot.crane_id.encode()
+        parts = [
+            HEADER.pack(
+                VERSION,
+                FrameKind.DELTA if delta else FrameKind.FULL,
+                STATUSES.index(snapshot.status),
+                flags,
+                previous.sequence,
+                mask,
+                math.nan if snapshot.time is None else snapshot.time,
+            ),
+            struct.pack(
+                f"<{mask.bit_count()}d",
+                *(value for i, value in enumerate(values) if mask >> i & 1),
+            ),
+        ]
+        if snapshot.segment is not None:
+            parts.append(SEGMENT.pack(*segment_values(snapshot.segment)))
+        parts += [
+            CRANE_ID_LENGTH.pack(len(crane_id)),
+            crane_id,
+        ]
+        if snapshot.error_message is not None:
+            error = snapshot.error_message.encode()
+            parts += [ERROR_LENGTH.pack(len(error)), error]
+        return b"".join(parts)
+
+
+def decode_frame(frame: bytes) -> dict:
+    """Decode a binary frame. values only holds the fields present in the frame."""
+    version, kind, status, flags, sequence, mask, time = HEADER.unpack_from(frame)
+    if version != VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    offset = HEADER.size
+    present = [field for i, field in enumerate(FIELDS) if mask >> i & 1]
+    values = struct.unpack_from(f"<{len(present)}d", frame, offset)
+    offset += 8 * len(present)
+    segment = None
+    if flags & HAS_SEGMENT:
+        segment_fields = SEGMENT.unpack_from(frame, offset)
+        offset += SEGMENT.size
+        start_time, duration, accel_time = segment_fields[:3]
+        n = len(MOTOR_FIELDS)
+        segment = {
+            "startTime": start_time,
+            "duration": duration,
+            "accelTime": accel_time,
+            "start": dict(zip(MOTOR_FIELDS, segment_fields[3 : 3 + n])),
+            "end": dict(zip(MOTOR_FIELDS, segment_fields[3 + n :])),
+        }
+    (crane_id_length,) = CRANE_ID_LENGTH.unpack_from(frame, offset)
+    offset += CRANE_ID_LENGTH.size
+    crane_id = frame[offset : offset + crane_id_length].decode()
+    offset += crane_id_length
+    error_message = None
+    if flags & HAS_ERROR:
+        (error_length,) = ERROR_LENGTH.unpack_from(frame, offset)
+        offset += ERROR_LENGTH.size
+        error_message = frame[offset : offset + error_length].decode()
+    return {
+        "kind": FrameKind(kind),
+        "sequence": sequence,
+        "time": None if math.isnan(time) else time,
+        "craneId": crane_id,
+        "status": STATUSES[status],
+        "success": bool(flags & SUCCESS),
+        "errorMessage": error_message,
+        "values": dict(zip(present, values)),
+        "segment": segment,
+    }
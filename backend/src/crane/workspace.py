@@ -0,0 +1,182 @@
+import logging
+import math
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from crane.crane_service import CraneService, OrientationLike
+from crane.kinematics import KinematicsContext
+from crane.models import Crane, CraneOrientation, XYZPosition
+
+logger = logging.getLogger(__name__)
+
+# Bump when the index contents change so stale cache files are ignored
+INDEX_VERSION = 2
+DEFAULT_RESOLUTION = 0.05
+CACHE_DIR = Path(os.environ.get("CRANE_CACHE_DIR", Path.home() / ".cache" / "crane"))
+
+OUTSIDE = 0
+INSIDE = 1
+BOUNDARY = 2
+
+
+def reachable_and_valid(
+    xyz: np.ndarray,
+    crane: Crane,
+    orientation: Optional[OrientationLike] = None,
+) -> np.ndarray:
+    """Exact check of which rows of an (N, 3) array of positions the crane can reach validly"""
+    swing_lift_elbow, reachable = CraneService.xyz_to_swing_lift_elbow_batch(
+        xyz, crane, orientation
+    )
+    states = np.zeros((len(swing_lift_elbow), 5))
+    states[:, :3] = swing_lift_elbow
+    valid = np.zeros_like(reachable)
+    valid[reachable] = CraneService.is_valid_state_batch(states[reachable], crane)
+    return valid
+
+
+class WorkspaceIndex:
+    """
+    Voxel grid of where a crane can reach, in the frame of the crane
+
+    Each voxel is INSIDE if all of its corners are reachable and valid, OUTSIDE if none are and
+    BOUNDARY otherwise. Lookups of INSIDE and OUTSIDE voxels are a single array index, only
+    BOUNDARY voxels and points beyond the grid fall back to the exact check. Features of the
+    workspace smaller than a voxel can be missed, so the resolution should be well below the
+    size of the smallest link or obstacle.
+
+    The grid spans the full reach of the arm and the length of the column. Indices are cached
+    in memory and on disk, keyed by the crane geometry hash.
+    """
+
+    _cache: dict[str, "WorkspaceIndex"] = {}
+
+    def __init__(
+        self, crane: Crane, lower: np.ndarray, resolution: float, cells: np.ndarray
+    ):
+        self.crane = crane
+        self.lower = lower
+        self.resolution = resolution
+        self.cells = cells
+
+    @classmethod
+    def build(
+        cls, crane: Crane, resolution: float = DEFAULT_RESOLUTION
+    ) -> "WorkspaceIndex":
+        kinematics = KinematicsContext.for_crane(crane)
+        reach, lift_offset = kinematics.max_reach, kinematics.lift_offset
+        lower = np.array([-reach, -lift_offset, -reach]) - resolution
+        upper = np.array([reach, crane.column.height - lift_offset, reach]) + resolution
+        shape = np.ceil((upper - lower) / resolution).astype(int)
+
+        axes = [lower[i] + resolution * np.arange(shape[i] + 1) for i in range(3)]
+        corners = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1)
+        valid = reachable_and_valid(corners.reshape(-1, 3), crane).reshape(
+            corners.shape[:3]
+        )
+        # Count valid corners of every voxel
+        count = sum(
+            valid[dx : dx + shape[0], dy : dy + shape[1], dz : dz + shape[2]].astype(
+                np.uint8
+            )
+            for dx in (0, 1)
+            for dy in (0, 1)
+            for dz in (0, 1)
+        )
+        cells = np.full(tuple(shape), BOUNDARY, dtype=np.uint8)
+        cells[count == 8] = INSIDE
+        cells[count == 0] = OUTSIDE
+        return cls(crane, lower, resolution, cells)
+
+    @classmethod
+    def for_crane(
+        cls,
+        crane: Crane,
+        resolution: float = DEFAULT_RESOLUTION,
+        cache_dir: Optional[Path] = None,
+    ) -> "WorkspaceIndex":
+        """Get the index for a crane from memory, then disk, and only build it if neither has it"""
+        key = f"{crane.geometry_hash()}-{resolution}-v{INDEX_VERSION}"
+        index = cls._cache.get(key)
+        if index is not None:
+            return index
+        path = (cache_dir or CACHE_DIR) / f"workspace-{key}.npz"
+        index = cls._load(crane, resolution, path)
+        if index is None:
+            index = cls.build(crane, resolution)
+            index._save(path)
+        cls._cache[key] = index
+        return index
+
+    @classmethod
+    def _load(
+        cls, crane: Crane, resolution: float, path: Path
+    ) -> Optional["WorkspaceIndex"]:
+        """The index cached at path, or None if there is none or it cannot be read"""
+        try:
+            with np.load(path) as data:
+                index = cls(crane, data["lower"], resolution, data["cells"])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # A truncated or corrupt cache is only a miss, the index is rebuilt
+            logger.warning(f"Ignoring unreadable workspace index {path}: {e}")
+            return None
+        logger.info(f"Loaded workspace index from {path}")
+        return index
+
+    def _save(self, path: Path) -> None:
+        """Cache the index at path, replacing it atomically so readers never see part of it"""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        except OSError as e:
+            logger.warning(f"Could not cache workspace index to {path}: {e}")
+            return
+        try:
+            with os.fdopen(fd, "wb") as file:
+                np.savez_compressed(file, lower=self.lower, cells=self.cells)
+            os.replace(temp, path)
+        except OSError as e:
+            logger.warning(f"Could not cache workspace index to {path}: {e}")
+            os.unlink(temp)
+
+    def contains_batch(
+        self, xyz: np.ndarray, orientation: Optional[OrientationLike] = None
+    ) -> np.ndarray:
+        """Which rows of an (N, 3) array of positions are reachable and valid"""
+        local = CraneService.xyz_to_crane_frame(xyz, orientation)
+        voxels = np.floor((local - self.lower) / self.resolution).astype(np.intp)
+        in_grid = ((voxels >= 0) & (voxels < self.cells.shape)).all(axis=1)
+        cells = np.full(len(local), BOUNDARY, dtype=np.uint8)
+        cells[in_grid] = self.cells[tuple(voxels[in_grid].T)]
+        result = cells == INSIDE
+        exact = cells == BOUNDARY
+        if exact.any():
+            result[exact] = reachable_and_valid(local[exact], self.crane)
+        return result
+
+    def contains(
+        self, xyz: XYZPosition, orientation: Optional[CraneOrientation] = None
+    ) -> bool:
+        """Whether the crane can reach the position validly"""
+        x, y, z = xyz.x, xyz.y, xyz.z
+        if orientation is not None:
+            theta = math.radians(orientation.rotationZ)
+            dx, dy = x - orientation.x, y - orientation.y
+            x = math.cos(theta) * dx + math.sin(theta) * dy
+            y = -math.sin(theta) * dx + math.cos(theta) * dy
+            z = z - orientation.z
+        voxel = tuple(
+            math.floor((value - lower) / self.resolution)
+            for value, lower in zip((x, y, z), self.lower.tolist())
+        )
+        if all(0 <= i < n for i, n in zip(voxel, self.cells.shape)):
+            cell = self.cells[voxel]
+            if cell != BOUNDARY:
+                return bool(cell == INSIDE)
+        return bool(reachable_and_valid(np.array([[x, y, z]]), self.crane)[0])
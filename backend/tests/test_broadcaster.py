@@ -0,0 +1,213 @@
+import asyncio
+
+from crane.broadcaster import StateBroadcaster
+from crane.models import CraneOrientation, Status, WireFormat
+from crane.snapshot import StateSnapshot
+from crane.wire import BinaryEncoder, FrameKind, decode_frame
+
+
+def test_encodes_once_per_orientation():
+    encoded = []
+
+    def encode(snapshot, orientation, wire_format, keyframe):
+        encoded.append(orientation.rotationZ)
+        return f"{snapshot}:{orientation.rotationZ:g}"
+
+    broadcaster = StateBroadcaster(
+        lambda crane_ids: {crane_id: "snap" for crane_id in crane_ids},
+        encode,
+        interval=0.1,
+    )
+    subscribers = [
+        broadcaster.subscribe(CraneOrientation(rotationZ=rotation), {"a"})
+        for rotation in (0, 0, 90, 0)
+    ]
+    broadcaster.publish()
+    assert sorted(encoded) == [0, 90]
+    assert [subscriber.queue.get_nowait() for subscriber in subscribers] == [
+        "snap:0",
+        "snap:0",
+        "snap:90",
+        "snap:0",
+    ]
+
+
+def test_slow_subscriber_drops_oldest():
+    ticks = iter(range(100))
+    broadcaster = StateBroadcaster(
+        lambda crane_ids: {"a": next(ticks)},
+        lambda snapshot, *_: str(snapshot),
+        interval=0.1,
+        max_queue=3,
+    )
+    slow = broadcaster.subscribe(CraneOrientation(), {"a"})
+    fast = broadcaster.subscribe(CraneOrientation(), {"a"})
+    for _ in range(5):
+        broadcaster.publish()
+        fast.queue.get_nowait()
+    assert slow.dropped == 2
+    assert fast.dropped == 0
+    assert [slow.queue.get_nowait() for _ in range(3)] == ["2", "3", "4"]
+
+
+def test_subscribers_only_receive_their_cranes():
+    snapshot_requests = []
+
+    def snapshot(crane_ids):
+        snapshot_requests.append(crane_ids)
+        return {crane_id: crane_id for crane_id in crane_ids if crane_id != "unknown"}
+
+    broadcaster = StateBroadcaster(
+        snapshot, lambda snapshot, *_: snapshot, interval=0.1
+    )
+    first = broadcaster.subscribe(CraneOrientation(), {"a", "b"})
+    second = broadcaster.subscribe(CraneOrientation(), {"b", "unknown"})
+    broadcaster.publish()
+    assert snapshot_requests == [{"a", "b", "unknown"}]
+    assert sorted(first.queue.get_nowait() for _ in range(2)) == ["a", "b"]
+    assert second.queue.get_nowait() == "b"
+    assert second.queue.empty()
+
+
+def test_publishes_only_changed_cranes_and_coalesces_bursts():
+    snapshot_requests = []
+
+    def snapshot(crane_ids):
+        snapshot_requests.append(set(crane_ids))
+        return {crane_id: crane_id for crane_id in crane_ids}
+
+    broadcaster = StateBroadcaster(
+        snapshot,
+        lambda snapshot, *_: snapshot,
+        interval=0.05,
+        max_queue=100,
+        heartbeat_interval=10,
+    )
+    subscriber = broadcaster.subscribe(CraneOrientation(), {"a", "b"})
+
+    async def run():
+        broadcaster.start()
+        await asyncio.sleep(0.01)
+        # A burst of changes within one interval becomes a single frame
+        for _ in range(10):
+            broadcaster.notify(["a"])
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.1)
+        await broadcaster.stop()
+
+    asyncio.run(run())
+    assert snapshot_requests == [{"a", "b"}, {"a"}]
+    assert subscriber.queue.qsize() == 3
+
+
+def test_sends_heartbeat_while_idle():
+    broadcaster = StateBroadcaster(
+        lambda crane_ids: {crane_id: crane_id for crane_id in crane_ids},
+        lambda snapshot, *_: snapshot,
+        interval=0.001,
+        heartbeat_interval=0.02,
+    )
+    subscriber = broadcaster.subscribe(CraneOrientation(), {"a"})
+
+    async def run():
+        broadcaster.start()
+        await asyncio.sleep(0.07)
+        await broadcaster.stop()
+
+    asyncio.run(run())
+    # The initial frame and a few heartbeats, rather than one frame per interval
+    assert 2 <= subscriber.queue.qsize() <= 5
+
+
+class Moving:
+    def __init__(self, key):
+        self.key = key
+
+    def motion_key(self):
+        return self.key
+
+
+def test_interpolating_subscribers_only_get_motion_changes():
+    snapshots = iter(
+        [Moving("a"), Moving("a"), Moving("b"), Moving(None), Moving(None)]
+    )
+    broadcaster = StateBroadcaster(
+        lambda crane_ids: {"crane": next(snapshots)},
+        lambda snapshot, *_: snapshot.key,
+        interval=0.1,
+        interpolated_interval=60,
+    )
+    interpolating = broadcaster.subscribe(
+        CraneOrientation(), {"crane"}, interpolate=True
+    )
+    for _ in range(5):
+        broadcaster.publish()
+    # The repeated motion "a" is skipped, frames without a motion always sent
+    assert [interpolating.queue.get_nowait() for _ in range(4)] == [
+        "a",
+        "b",
+        None,
+        None,
+    ]
+    assert interpolating.queue.empty()
+
+
+def test_relays_get_snapshots_of_their_cranes():
+    class Relay:
+        def __init__(self, crane_ids):
+            self.crane_ids = crane_ids
+            self.batches = []
+
+        def offer(self, snapshots):
+            self.batches.append(snapshots)
+
+    broadcaster = StateBroadcaster(
+        lambda crane_ids: {crane_id: crane_id.upper() for crane_id in crane_ids},
+        lambda snapshot, *_: snapshot,
+        interval=0.1,
+    )
+    relay = Relay({"a", "b"})
+    broadcaster.relays.add(relay)
+    subscriber = broadcaster.subscribe(CraneOrientation(), {"c"})
+    assert broadcaster.subscribed_ids() == {"a", "b", "c"}
+    broadcaster.publish({"b", "c"})
+    assert relay.batches == [{"b": "B"}]
+    assert subscriber.queue.get_nowait() == "C"
+
+
+def test_binary_clients_joining_mid_stream_start_from_a_full_frame():
+    encoder = BinaryEncoder()
+    snapshot = StateSnapshot(
+        "a", (0.0, 1.0, 0.0, 0.0, 0.0, 2.0, 0.5, 0.0), Status.STOPPED
+    )
+    broadcaster = StateBroadcaster(
+        lambda crane_ids: {"a": snapshot},
+        lambda snapshot, orientation, wire_format, keyframe: encoder.encode(
+            "a", snapshot, keyframe
+        ),
+        interval=0.1,
+    )
+
+    def kinds(subscriber):
+        frames = []
+        while not subscriber.queue.empty():
+            frames.append(decode_frame(subscriber.queue.get_nowait())["kind"])
+        return frames
+
+    first = broadcaster.subscribe(CraneOrientation(), {"a"}, WireFormat.BINARY)
+    for _ in range(3):
+        broadcaster.publish()
+    assert kinds(first) == [FrameKind.FULL, FrameKind.DELTA, FrameKind.DELTA]
+
+    second = broadcaster.subscribe(CraneOrientation(), {"a"}, WireFormat.BINARY)
+    broadcaster.publish()
+    broadcaster.publish()
+    assert kinds(second) == [FrameKind.FULL, FrameKind.DELTA]
+    assert kinds(first) == [FrameKind.FULL, FrameKind.DELTA]
+
+    # Subscribing to the crane again starts over too
+    second.crane_ids = set()
+    broadcaster.publish()
+    second.crane_ids = {"a"}
+    broadcaster.publish()
+    assert kinds(second) == [FrameKind.FULL]
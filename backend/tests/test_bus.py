@@ -0,0 +1,101 @@
+import asyncio
+import os
+
+import numpy as np
+
+from crane.broadcaster import StateBroadcaster
+from crane.bus import StateBusClient, StateBusServer
+from crane.models import Status
+from crane.snapshot import StateSnapshot
+from crane.trajectory import Trajectory
+
+
+def make_snapshot(crane_id, swing, version):
+    trajectory = Trajectory(np.zeros(5), np.full(5, 10.0), 2.0, 0.5)
+    return StateSnapshot(
+        crane_id,
+        (swing, 1.0, 0.0, 0.0, 0.0),
+        Status.MOVING,
+        version=version,
+        segment=(100.0 + version, trajectory),
+    )
+
+
+async def wait_for(condition, timeout=5.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_worker_receives_snapshots_and_configs_and_relays_commands(tmp_path):
+    path = str(tmp_path / "bus.sock")
+    versions = {"default": 0, "crane-1": 0}
+    commands = []
+    configs = []
+    updated = []
+
+    def snapshot(crane_ids):
+        return {
+            crane_id: make_snapshot(crane_id, 10.0 * version, version)
+            for crane_id, version in versions.items()
+            if crane_id in crane_ids
+        }
+
+    async def handle_command(message):
+        commands.append(message)
+
+    async def run():
+        broadcaster = StateBroadcaster(snapshot, lambda *_: "", interval=0.01)
+        server = StateBusServer(path, broadcaster, handle_command, lambda: "config-1")
+        await server.start()
+        assert os.stat(path).st_mode & 0o777 == 0o600
+        broadcaster.start()
+        client = StateBusClient(path, updated.extend, configs.append)
+        client.subscribe({"crane-1"})
+        client.start()
+        try:
+            await wait_for(lambda: "crane-1" in client.snapshots)
+            assert configs == ["config-1"]
+            assert set(client.snapshots) == {"crane-1"}
+            first = client.snapshots["crane-1"]
+            assert first.values == (0.0, 1.0, 0.0, 0.0, 0.0)
+
+            # The same motion keeps its Trajectory, so motion keys stay equal
+            versions["crane-1"] = 1
+            broadcaster.notify(["crane-1"])
+            await wait_for(lambda: client.snapshots["crane-1"].version == 1)
+            second = client.snapshots["crane-1"]
+            assert second.swing == 10.0
+            assert second.motion_key() == first.motion_key()
+
+            client.subscribe({"default", "crane-1"})
+            await wait_for(lambda: "default" in client.snapshots)
+            assert client.send_command({"type": "crane_state", "craneId": "crane-1"})
+            await wait_for(lambda: commands)
+            assert commands == [{"type": "crane_state", "craneId": "crane-1"}]
+
+            server.send_config("config-2")
+            await wait_for(lambda: len(configs) == 2)
+            assert configs[-1] == "config-2"
+            assert "crane-1" in updated
+        finally:
+            await client.stop()
+            await broadcaster.stop()
+            await server.stop()
+
+    asyncio.run(run())
+    assert not (tmp_path / "bus.sock").exists()
+
+
+def test_commands_are_refused_without_the_motion_process(tmp_path):
+    async def run():
+        client = StateBusClient(str(tmp_path / "missing.sock"), print, print)
+        client.start()
+        await asyncio.sleep(0.05)
+        assert not client.connected
+        assert not client.send_command({"type": "crane_state"})
+        await client.stop()
+
+    asyncio.run(run())
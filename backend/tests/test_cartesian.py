@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from crane.cartesian import plan_linear_move
+from crane.crane_service import CraneService
+from crane.models import (
+    DEFAULT_CRANE,
+    CraneOrientation,
+    CraneState,
+    XYZPosition,
+)
+
+
+@pytest.mark.parametrize(
+    "orientation",
+    [None, CraneOrientation(x=0.3, y=0.5, z=1, rotationZ=10)],
+)
+def test_gripper_follows_straight_line(orientation):
+    current = CraneState(swing=-30, lift=2, elbow=60, wrist=15, gripper=0.2)
+    start = CraneService.swing_lift_elbow_to_xyz(current, DEFAULT_CRANE, orientation)
+    start = np.array([start.x, start.y, start.z])
+    end = start + [-0.4, -0.5, 0.6]
+    trajectory = plan_linear_move(
+        current, XYZPosition(x=end[0], y=end[1], z=end[2]), DEFAULT_CRANE, orientation
+    )
+    assert trajectory is not None
+    assert len(trajectory.waypoints) > 800
+    assert trajectory.start == pytest.approx(
+        [current.swing, current.lift, current.elbow, current.wrist, current.gripper]
+    )
+    xyz = CraneService.swing_lift_elbow_to_xyz_batch(
+        trajectory.waypoints[:, :3], DEFAULT_CRANE, orientation
+    )
+    direction = (end - start) / np.linalg.norm(end - start)
+    offsets = xyz - start
+    off_line = offsets - np.outer(offsets @ direction, direction)
+    assert np.abs(off_line).max() == pytest.approx(0, abs=1e-9)
+    assert xyz[-1] == pytest.approx(end)
+    assert (trajectory.waypoints[:, 3:] == [15, 0.2]).all()
+
+    speeds = np.abs(
+        np.diff(trajectory.waypoints, axis=0) / np.diff(trajectory.times)[:, None]
+    )
+    assert (speeds[:, :3] <= [10, 0.2, 10] * np.ones(3) + 1e-9).all()
+
+
+def test_unreachable_waypoint_rejects_move():
+    # With a shorter lower arm the crane cannot reach close to its column
+    crane = DEFAULT_CRANE.model_copy(
+        update={"lower_arm": DEFAULT_CRANE.lower_arm.model_copy(update={"width": 0.5})}
+    )
+    state = CraneState(swing=0, lift=2, elbow=180, wrist=0, gripper=0)
+    start = CraneService.swing_lift_elbow_to_xyz(state, crane)
+    assert start.x == pytest.approx(0.5)
+    # Both ends are reachable but the line passes through the unreachable hole
+    target = XYZPosition(x=-1, y=start.y, z=0)
+    assert CraneService.xyz_to_swing_lift_elbow(target, crane) is not None
+    assert plan_linear_move(state, target, crane) is None
+    target = XYZPosition(x=1, y=start.y, z=0)
+    assert plan_linear_move(state, target, crane) is not None
+
+
+def test_swing_stays_continuous_across_branch_cut():
+    state = CraneState(swing=150, lift=2, elbow=30, wrist=0, gripper=0)
+    start = CraneService.swing_lift_elbow_to_xyz(state, DEFAULT_CRANE)
+    target = XYZPosition(x=start.x, y=start.y, z=-start.z)
+    trajectory = plan_linear_move(state, target, DEFAULT_CRANE)
+    assert trajectory is not None
+    assert np.abs(np.diff(trajectory.waypoints[:, 0])).max() < 1
+
+
+@pytest.mark.parametrize(
+    "current, offset",
+    [
+        (
+            CraneState(swing=-30, lift=2, elbow=60, wrist=0, gripper=0),
+            [-0.4, -0.5, 0.6],
+        ),
+        # From the other elbow configuration, with a joint-space move onto the line first
+        (
+            CraneState(swing=-30, lift=2, elbow=-60, wrist=0, gripper=0),
+            [0.3, 0.2, -0.5],
+        ),
+        # A long move past the column with thousands of waypoints, to (0.5, 0.5, 1.6)
+        (
+            CraneState(swing=0, lift=2, elbow=90, wrist=0, gripper=0),
+            [-0.5, -1.0, 2.6],
+        ),
+    ],
+)
+def test_linear_move_ramps_within_acceleration_limits(current, offset):
+    start = CraneService.swing_lift_elbow_to_xyz(current, DEFAULT_CRANE)
+    target = XYZPosition(
+        x=start.x + offset[0], y=start.y + offset[1], z=start.z + offset[2]
+    )
+    trajectory = plan_linear_move(current, target, DEFAULT_CRANE)
+    assert trajectory is not None
+    # Measured per tick of the 1 kHz motion controller, which sees each change in velocity
+    # at a waypoint within one tick. Half the acceleration goes to the corners, so staying
+    # within 5% of the limits leaves no room for a corner to be taken too fast.
+    tick = 0.001
+    for phase in (0, tick / 2):
+        times = np.arange(phase, trajectory.duration + tick, tick)
+        positions = trajectory.sample_batch(times)
+        velocities = np.diff(positions, axis=0) / tick
+        accelerations = np.diff(velocities, axis=0) / tick
+        max_speeds = np.array([10, 0.2, 10, 10, 0.1])
+        max_accelerations = np.array([20, 0.4, 20, 20, 0.2])
+        assert (np.abs(velocities) <= max_speeds * (1 + 1e-6)).all()
+        assert (np.abs(accelerations) <= max_accelerations * 1.05).all()
+    # Starts and ends at rest rather than at full speed
+    assert np.abs(trajectory.velocity(1e-6)) == pytest.approx(np.zeros(5), abs=1e-2)
+    end = trajectory.duration - 1e-6
+    assert np.abs(trajectory.velocity(end)) == pytest.approx(np.zeros(5), abs=1e-2)
@@ -0,0 +1,156 @@
+import asyncio
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from crane.collision import CollisionModel, Prism, footprints_overlap, rotation_axis
+from crane.crane_service import CraneService
+from crane.models import (
+    DEFAULT_CRANE,
+    Box,
+    CranePositions,
+    CraneState,
+    Cylinder,
+    Obstacle,
+    XYZPosition,
+)
+from crane.motion_controller import MotionController, state_to_array
+from crane.trajectory import Trajectory
+
+FREE = CraneState(swing=0, lift=1.5, elbow=90, wrist=0, gripper=0)
+# A pillar 1.5 m out along the x axis, under the lower arm when swing and elbow are 0
+PILLAR = Obstacle(
+    position=XYZPosition(x=1.5, y=0.75, z=0), cylinder=Cylinder(radius=0.2, height=1.5)
+)
+LIMITED = DEFAULT_CRANE.model_copy(
+    update={
+        "min_positions": CranePositions(
+            swing=-360, lift=0, elbow=-180, wrist=-180, gripper=0
+        ),
+        "max_positions": CranePositions(
+            swing=360, lift=3, elbow=180, wrist=180, gripper=0.5
+        ),
+    }
+)
+
+
+def with_obstacles(*obstacles):
+    return DEFAULT_CRANE.model_copy(update={"obstacles": list(obstacles)})
+
+
+def square(x, z, angle, half=0.5):
+    return Prism(
+        np.array([[x, z]]),
+        np.zeros(1),
+        np.ones(1),
+        rotation_axis(np.array([angle])),
+        np.full((1, 2), half),
+    )
+
+
+@pytest.mark.parametrize(
+    "state",
+    [
+        # Beyond the motor limits
+        FREE.model_copy(update={"swing": 400}),
+        FREE.model_copy(update={"gripper": 0.6}),
+        # Upper arm lowered into the base
+        FREE.model_copy(update={"lift": 0.3}),
+        # Lower arm folded back into the column
+        FREE.model_copy(update={"elbow": 175}),
+        # Gripper turned across the column with the elbow folded
+        FREE.model_copy(update={"elbow": 150, "wrist": 90, "gripper": 0.5}),
+    ],
+)
+def test_invalid_states(state):
+    assert CraneService.is_valid_state(FREE, LIMITED)
+    assert not CraneService.is_valid_state(state, LIMITED)
+
+
+def test_cranes_without_limits_only_check_collisions():
+    # The default crane has no motor limits
+    crane = DEFAULT_CRANE
+    assert CraneService.is_valid_state(FREE.model_copy(update={"swing": 400}), crane)
+    assert not CraneService.is_valid_state(FREE.model_copy(update={"lift": 0.3}), crane)
+
+
+def test_obstacles_block_links_that_reach_them():
+    crane = with_obstacles(PILLAR)
+    stretched = FREE.model_copy(update={"elbow": 0})
+    assert not CraneService.is_valid_state(stretched, crane)
+    assert CraneService.is_valid_state(
+        stretched.model_copy(update={"lift": 2.1}), crane
+    )
+    assert CraneService.is_valid_state(FREE, crane)
+    model = CollisionModel.for_crane(crane)
+    # The spacer and gripper at the end of the arm are just beyond the pillar
+    assert model.colliding_pairs(np.array([state_to_array(stretched)])) == [
+        ("lower_arm", "obstacle 0")
+    ]
+
+
+def test_rotated_box_obstacle():
+    # A thin wall along the z axis across the arm, turned so that it runs beside it instead
+    wall = Obstacle(
+        position=XYZPosition(x=1.5, y=1, z=0.4), box=Box(width=0.1, height=2, depth=1)
+    )
+    turned = wall.model_copy(update={"rotationY": 90})
+    stretched = FREE.model_copy(update={"elbow": 0})
+    assert not CraneService.is_valid_state(stretched, with_obstacles(wall))
+    assert CraneService.is_valid_state(stretched, with_obstacles(turned))
+
+
+def test_obstacle_needs_exactly_one_shape():
+    with pytest.raises(ValidationError):
+        Obstacle(position=XYZPosition(x=0, y=0, z=0))
+    with pytest.raises(ValidationError):
+        Obstacle(position=XYZPosition(x=0, y=0, z=0), box=Box(), cylinder=Cylinder())
+
+
+def test_rectangles_overlap_exactly():
+    # A square turned by 45 degrees reaches sqrt(0.5) from its centre along x
+    reach = 0.5 + np.sqrt(0.5)
+    assert footprints_overlap(square(0, 0, 0), square(reach - 1e-6, 0, 45))[0]
+    assert not footprints_overlap(square(0, 0, 0), square(reach + 1e-6, 0, 45))[0]
+    # Their bounding circles overlap along the diagonal but the squares do not
+    assert not footprints_overlap(square(0, 0, 0), square(1.2, 1.2, 0))[0]
+
+
+def test_batch_matches_single_states():
+    crane = with_obstacles(PILLAR)
+    rng = np.random.default_rng(0)
+    states = rng.uniform(
+        [-400, 0, -180, -180, 0], [400, 3, 180, 180, 0.6], size=(300, 5)
+    )
+    valid = CraneService.is_valid_state_batch(states, crane)
+    assert valid.any() and not valid.all()
+    for row, expected in zip(states, valid):
+        state = CraneState(
+            swing=row[0], lift=row[1], elbow=row[2], wrist=row[3], gripper=row[4]
+        )
+        assert CraneService.is_valid_state(state, crane) == expected
+
+
+def test_trajectory_through_an_obstacle_is_rejected():
+    crane = with_obstacles(PILLAR)
+    start = FREE.model_copy(update={"swing": -60, "elbow": 0})
+    target = FREE.model_copy(update={"swing": 60, "elbow": 0})
+    assert CraneService.is_valid_state(start, crane)
+    assert CraneService.is_valid_state(target, crane)
+    trajectory = Trajectory.plan(
+        state_to_array(start),
+        state_to_array(target),
+        state_to_array(crane.max_speeds),
+        state_to_array(crane.max_accelerations),
+    )
+    assert not CraneService.is_valid_trajectory(trajectory, crane)
+
+    controller = MotionController(start, crane, rate=1000)
+
+    async def run():
+        motion = await controller.apply_motion(target)
+        return await motion
+
+    assert asyncio.run(run()) is False
+    assert controller.state == start
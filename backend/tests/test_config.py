@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+from pydantic import ValidationError
+
+from crane.config import CraneConfigStore
+from crane.kinematics import KinematicsContext
+from crane.models import DEFAULT_ACCELERATION_SECONDS, DEFAULT_CRANE, Crane, MessageType
+
+LONG_ARM = DEFAULT_CRANE.model_copy(
+    update={"upper_arm": DEFAULT_CRANE.upper_arm.model_copy(update={"width": 1.5})}
+)
+
+
+def write(path, crane, mtime_ns):
+    path.write_text(crane.model_dump_json())
+    # Distinct modification times, however coarse the file system clock
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_cranes_fall_back_to_the_default_config(tmp_path):
+    store = CraneConfigStore(tmp_path)
+    assert store.load() == []
+    assert store.crane("crane-1") is DEFAULT_CRANE
+    write(tmp_path / "default.json", LONG_ARM, 1)
+    assert store.load() == ["default"]
+    assert store.crane("default") == LONG_ARM
+    assert store.crane("crane-1") is store.crane("default")
+    write(tmp_path / "crane-1.json", DEFAULT_CRANE, 1)
+    assert store.load() == ["crane-1"]
+    assert store.crane("crane-1") == DEFAULT_CRANE
+
+
+def test_reload_only_changed_and_valid_files(tmp_path):
+    store = CraneConfigStore(tmp_path)
+    path = tmp_path / "default.json"
+    write(path, LONG_ARM, 1)
+    assert store.load() == ["default"]
+    loaded = store.crane("default")
+    assert KinematicsContext.for_crane(loaded).upper == 1.5
+    # Unchanged files are not read again, and rewriting the same config is not a change
+    assert store.load() == []
+    write(path, LONG_ARM, 2)
+    assert store.load() == []
+    assert store.crane("default") is loaded
+    # A broken edit keeps the last good config
+    path.write_text('{"base": ')
+    os.utime(path, ns=(3, 3))
+    assert store.load() == []
+    assert store.crane("default") is loaded
+    write(path, DEFAULT_CRANE, 4)
+    assert store.load() == ["default"]
+    assert store.crane("default") == DEFAULT_CRANE
+
+
+def test_message_follows_reloads(tmp_path):
+    store = CraneConfigStore(tmp_path)
+    message = json.loads(store.message(["default", "crane-1"]))
+    assert message["type"] == MessageType.CRANE_CONFIG
+    assert message["cranes"]["crane-1"]["upper_arm"]["width"] == 1
+    write(tmp_path / "crane-1.json", LONG_ARM, 1)
+    store.load()
+    message = json.loads(store.message(["default", "crane-1"]))
+    assert message["cranes"]["default"]["upper_arm"]["width"] == 1
+    assert message["cranes"]["crane-1"]["upper_arm"]["width"] == 1.5
+
+
+def test_configs_without_acceleration_limits_get_defaults():
+    config = DEFAULT_CRANE.model_dump(exclude={"max_accelerations"})
+    crane = Crane.model_validate(config)
+    speeds = DEFAULT_CRANE.max_speeds.model_dump()
+    assert crane.max_accelerations.model_dump() == pytest.approx(
+        {motor: speed / DEFAULT_ACCELERATION_SECONDS for motor, speed in speeds.items()}
+    )
+
+
+@pytest.mark.parametrize("limits", ["max_speeds", "max_accelerations"])
+@pytest.mark.parametrize("value", [0, -1])
+def test_limits_must_be_positive(tmp_path, limits, value):
+    config = DEFAULT_CRANE.model_dump()
+    config[limits]["lift"] = value
+    with pytest.raises(ValidationError):
+        Crane.model_validate(config)
+    # A config file with such a limit is rejected like any other invalid config
+    store = CraneConfigStore(tmp_path)
+    (tmp_path / "default.json").write_text(json.dumps(config))
+    assert store.load() == []
+    assert store.crane("default") is DEFAULT_CRANE
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from crane.crane_service import CraneService
+from crane.fleet import Fleet
+from crane.models import DEFAULT_CRANE, CraneOrientation, CraneState, SwingLiftElbow
+
+INITIAL_STATE = CraneState(swing=0, lift=1, elbow=0, wrist=0, gripper=0)
+
+
+def test_step_moves_only_cranes_with_targets():
+    fleet = Fleet()
+    fleet.add("a", DEFAULT_CRANE, INITIAL_STATE)
+    fleet.add("b", DEFAULT_CRANE, INITIAL_STATE)
+    fleet.set_target("b", CraneState(swing=10, lift=1, elbow=5, wrist=0, gripper=0))
+    fleet.step(0.5)
+    assert fleet.state("a") == INITIAL_STATE
+    assert fleet.state("b").swing == pytest.approx(5)
+    assert fleet.state("b").elbow == pytest.approx(5)
+    assert fleet.moving.tolist() == [False, True]
+    assert fleet.versions.tolist() == [0, 1]
+    fleet.step(0.5)
+    assert fleet.state("b").swing == 10
+    assert not fleet.moving.any()
+
+
+def test_motion_stops_after_max_duration():
+    fleet = Fleet()
+    fleet.add("a", DEFAULT_CRANE, INITIAL_STATE)
+    fleet.set_target(
+        "a", CraneState(swing=100, lift=1, elbow=0, wrist=0, gripper=0), max_duration=1
+    )
+    for _ in range(4):
+        fleet.step(0.5)
+    assert fleet.state("a").swing == pytest.approx(10)
+    assert not fleet.moving.any()
+
+
+def test_xyz_matches_crane_service():
+    fleet = Fleet()
+    orientations = [
+        CraneOrientation(x=3, y=0, z=0, rotationZ=0),
+        CraneOrientation(x=0.4, y=0.3, z=0.7, rotationZ=-90),
+    ]
+    states = [
+        CraneState(swing=30, lift=2, elbow=70, wrist=0, gripper=0),
+        CraneState(swing=-30, lift=2.5, elbow=45, wrist=0, gripper=0),
+    ]
+    for i, (state, orientation) in enumerate(zip(states, orientations)):
+        fleet.add(f"crane-{i}", DEFAULT_CRANE, state, orientation)
+    xyz = fleet.xyz(fleet.rows(["crane-1", "crane-0"]))
+    for row, state, orientation in zip(xyz, states[::-1], orientations[::-1]):
+        expected = CraneService.swing_lift_elbow_to_xyz(
+            SwingLiftElbow(swing=state.swing, lift=state.lift, elbow=state.elbow),
+            DEFAULT_CRANE,
+            orientation,
+        )
+        assert row == pytest.approx(np.array([expected.x, expected.y, expected.z]))
+
+
+def test_duplicate_crane_id_rejected():
+    fleet = Fleet()
+    fleet.add("a", DEFAULT_CRANE, INITIAL_STATE)
+    with pytest.raises(ValueError):
+        fleet.add("a", DEFAULT_CRANE, INITIAL_STATE)
+
+
+def test_listeners_hear_about_moving_and_stopping_cranes():
+    fleet = Fleet()
+    fleet.add("a", DEFAULT_CRANE, INITIAL_STATE)
+    fleet.add("b", DEFAULT_CRANE, INITIAL_STATE)
+    changes = []
+    fleet.listeners.append(changes.append)
+    fleet.set_target("a", INITIAL_STATE.model_copy(update={"swing": 1}))
+    fleet.step(0.01)
+    fleet.step(10)
+    fleet.step(0.01)
+    assert changes == [["a"], ["a"], ["a"]]
+    assert not fleet.moving.any()
+
+
+def test_set_crane_moves_the_gripper_and_keeps_the_target():
+    fleet = Fleet()
+    state = CraneState(swing=0, lift=2, elbow=0, wrist=0, gripper=0)
+    fleet.add("crane-0", DEFAULT_CRANE, state)
+    target = CraneState(swing=10, lift=2, elbow=0, wrist=0, gripper=0)
+    fleet.set_target("crane-0", target)
+    longer = DEFAULT_CRANE.model_copy(
+        update={"lower_arm": DEFAULT_CRANE.lower_arm.model_copy(update={"width": 2})}
+    )
+    fleet.set_crane("crane-0", longer)
+    assert fleet.crane("crane-0") is longer
+    assert fleet.moving[0]
+    assert fleet.xyz(fleet.rows(["crane-0"]))[0, 0] == pytest.approx(3)
@@ -1,6 +1,11 @@
+import logging
+
+import numpy as np
 import pytest
-from crane.models import SwingLiftElbow, XYZPosition, DEFAULT_CRANE, CraneOrientation
+
 from crane.crane_service import CraneService
+from crane.kinematics import KinematicsContext
+from crane.models import DEFAULT_CRANE, CraneOrientation, SwingLiftElbow, XYZPosition
 
 
 def test_simple_cases():
@@ -95,3 +100,123 @@ def test_xyz_there_and_back_again(xyz_there, orientation):
     assert xyz_back.x == pytest.approx(xyz_there.x)
     assert xyz_back.y == pytest.approx(xyz_there.y)
     assert xyz_back.z == pytest.approx(xyz_there.z)
+
+
+@pytest.mark.parametrize(
+    "orientation",
+    [
+        None,
+        CraneOrientation(x=0, y=0, z=0, rotationZ=0),
+        CraneOrientation(x=0.3, y=0.5, z=1, rotationZ=10),
+    ],
+)
+def test_batch_matches_scalar(orientation):
+    rng = np.random.default_rng(0)
+    xyz = rng.uniform(-2.5, 2.5, size=(500, 3))
+    swe, reachable = CraneService.xyz_to_swing_lift_elbow_batch(
+        xyz, DEFAULT_CRANE, orientation
+    )
+    assert swe.shape == (500, 3)
+    assert reachable.any() and not reachable.all()
+    for row, ok, (x, y, z) in zip(swe, reachable, xyz):
+        expected = CraneService.xyz_to_swing_lift_elbow(
+            XYZPosition(x=x, y=y, z=z), DEFAULT_CRANE, orientation
+        )
+        if expected is None:
+            assert not ok
+            assert np.isnan(row).all()
+        else:
+            assert ok
+            assert row == pytest.approx(
+                [expected.swing, expected.lift, expected.elbow], abs=1e-9
+            )
+
+
+def test_batch_per_row_orientation():
+    orientations = [
+        CraneOrientation(x=100, y=0, z=0, rotationZ=0),
+        CraneOrientation(x=0, y=0, z=0, rotationZ=0),
+    ]
+    xyz = np.array([[101, 0, 0], [101, 0, 0]])
+    swe, reachable = CraneService.xyz_to_swing_lift_elbow_batch(
+        xyz, DEFAULT_CRANE, orientations
+    )
+    assert reachable.tolist() == [True, False]
+    assert swe[0] == pytest.approx([-60, 0.5, 120], abs=1e-5)
+    with pytest.raises(ValueError):
+        CraneService.xyz_to_swing_lift_elbow_batch(xyz, DEFAULT_CRANE, orientations * 2)
+
+
+def _matrix_swing_lift_elbow_to_xyz(state, crane, orientation):
+    """Reference forward kinematics as an explicit chain of homogeneous transforms"""
+
+    def translate_y(dy):
+        mat = np.eye(4)
+        mat[1, 3] = dy
+        return mat
+
+    def link(angle_degrees, length):
+        c, s = np.cos(np.radians(angle_degrees)), np.sin(np.radians(angle_degrees))
+        return np.array(
+            [[c, 0, s, c * length], [0, 1, 0, 0], [-s, 0, c, -s * length], [0, 0, 0, 1]]
+        )
+
+    full_matrix = (
+        CraneService.orientation_to_matrix(orientation)
+        @ translate_y(
+            state.lift - crane.upper_spacer.height - crane.lower_spacer.height
+        )
+        @ link(state.swing, crane.upper_arm.width)
+        @ link(state.elbow, crane.lower_arm.width)
+    )
+    return full_matrix[:3, -1]
+
+
+def test_forward_kinematics_matches_matrix_chain():
+    crane = DEFAULT_CRANE.model_copy(
+        update={"lower_arm": DEFAULT_CRANE.lower_arm.model_copy(update={"width": 0.7})}
+    )
+    rng = np.random.default_rng(1)
+    joints = rng.uniform([-180, 0, -180], [180, 3, 180], size=(50, 3))
+    orientations = rng.uniform(-5, 5, size=(50, 4)) * [1, 1, 1, 72]
+    xyz = CraneService.swing_lift_elbow_to_xyz_batch(joints, crane, orientations)
+    for (swing, lift, elbow), orientation_row, xyz_row in zip(
+        joints, orientations, xyz
+    ):
+        state = SwingLiftElbow(swing=swing, lift=lift, elbow=elbow)
+        orientation = CraneOrientation(
+            x=orientation_row[0],
+            y=orientation_row[1],
+            z=orientation_row[2],
+            rotationZ=orientation_row[3],
+        )
+        expected = _matrix_swing_lift_elbow_to_xyz(state, crane, orientation)
+        scalar = CraneService.swing_lift_elbow_to_xyz(state, crane, orientation)
+        assert xyz_row == pytest.approx(expected, abs=1e-9)
+        assert [scalar.x, scalar.y, scalar.z] == pytest.approx(expected, abs=1e-9)
+
+
+def test_kinematics_context_is_precomputed_and_immutable(caplog):
+    crane = DEFAULT_CRANE.model_copy(
+        update={"upper_arm": DEFAULT_CRANE.upper_arm.model_copy(update={"width": 1.5})}
+    )
+    context = KinematicsContext.for_crane(crane)
+    assert KinematicsContext.for_crane(crane) is context
+    assert context.upper_sq == pytest.approx(2.25)
+    assert context.two_upper_lower == pytest.approx(3.0)
+    assert (context.min_reach, context.max_reach) == pytest.approx((0.5, 2.5))
+    with pytest.raises(AttributeError):
+        context.upper = 1.0
+    # Inside the inner radius of the annulus, as well as beyond the outer one, is out of reach
+    inside = XYZPosition(x=0.4, y=0, z=0)
+    with caplog.at_level(logging.WARNING, logger="crane.crane_service"):
+        assert CraneService.xyz_to_swing_lift_elbow(inside, crane) is None
+    assert [record.message for record in caplog.records] == ["Target is out of reach"]
+    solved, reachable = CraneService.xyz_to_swing_lift_elbow_batch(
+        np.array([[0.4, 0, 0], [2.0, 0, 0.5], [2.6, 0, 0]]), crane
+    )
+    assert reachable.tolist() == [False, True, False]
+    xyz = CraneService.swing_lift_elbow_to_xyz(
+        SwingLiftElbow(swing=solved[1, 0], lift=solved[1, 1], elbow=solved[1, 2]), crane
+    )
+    assert (xyz.x, xyz.y, xyz.z) == pytest.approx((2.0, 0, 0.5))
@@ -0,0 +1,91 @@
+import threading
+
+from crane.crane_service import CraneService
+from crane.kinematics_cache import KinematicsCache, LRUCache
+from crane.models import DEFAULT_CRANE, CraneOrientation, SwingLiftElbow, XYZPosition
+
+
+def test_repeated_targets_hit_the_cache():
+    cache = KinematicsCache()
+    orientation = CraneOrientation(x=0.3, y=0.5, z=1, rotationZ=10)
+    xyz = XYZPosition(x=1, y=1, z=1.5)
+    first = cache.xyz_to_swing_lift_elbow(xyz, DEFAULT_CRANE, orientation)
+    second = cache.xyz_to_swing_lift_elbow(
+        XYZPosition(x=1 + 1e-8, y=1, z=1.5), DEFAULT_CRANE, orientation
+    )
+    assert first == second
+    assert first == CraneService.xyz_to_swing_lift_elbow(
+        xyz, DEFAULT_CRANE, orientation
+    )
+    assert first is not second
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+    state = SwingLiftElbow(swing=30, lift=2, elbow=70)
+    assert cache.swing_lift_elbow_to_xyz(state) == cache.swing_lift_elbow_to_xyz(state)
+    assert cache.stats()["hits"] == 2
+
+
+def test_unreachable_results_are_cached():
+    cache = KinematicsCache()
+    xyz = XYZPosition(x=100, y=0, z=0)
+    assert cache.xyz_to_swing_lift_elbow(xyz) is None
+    assert cache.xyz_to_swing_lift_elbow(xyz) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_crane_changes_miss_the_cache():
+    cache = KinematicsCache()
+    xyz = XYZPosition(x=1.5, y=0, z=0)
+    longer = DEFAULT_CRANE.model_copy(
+        update={"lower_arm": DEFAULT_CRANE.lower_arm.model_copy(update={"width": 1.2})}
+    )
+    default = cache.xyz_to_swing_lift_elbow(xyz, DEFAULT_CRANE)
+    changed = cache.xyz_to_swing_lift_elbow(xyz, longer)
+    assert default != changed
+    assert changed == CraneService.xyz_to_swing_lift_elbow(xyz, longer)
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction():
+    cache = LRUCache(max_size=2)
+    for key in ["a", "b", "a", "c"]:
+        cache.get_or_compute(key, lambda key=key: key.upper())
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 3, "evictions": 1}
+    # "b" was least recently used
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+
+
+def test_concurrent_use():
+    cache = KinematicsCache(max_size=50)
+
+    def worker():
+        for i in range(200):
+            xyz = XYZPosition(x=1, y=(i % 80) / 100, z=0.5)
+            assert cache.xyz_to_swing_lift_elbow(
+                xyz
+            ) == CraneService.xyz_to_swing_lift_elbow(xyz)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 1600
+    assert stats["size"] <= 50
+
+
+def test_forward_solves_do_not_evict_inverse_solutions():
+    cache = KinematicsCache(max_size=8)
+    slots = [XYZPosition(x=1, y=y / 10, z=0.5) for y in range(4)]
+    for xyz in slots:
+        cache.xyz_to_swing_lift_elbow(xyz)
+    # A moving crane, every frame a new position
+    for i in range(1000):
+        cache.swing_lift_elbow_to_xyz(SwingLiftElbow(swing=i / 10, lift=2, elbow=70))
+    misses = cache.inverse.misses
+    for xyz in slots:
+        cache.xyz_to_swing_lift_elbow(xyz)
+    assert cache.inverse.misses == misses
+    assert cache.inverse.stats()["evictions"] == 0
+    assert len(cache.forward) == 8
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from crane.broadcaster import FRAMES_DROPPED, StateBroadcaster
+from crane.metrics import MetricsRegistry, monitor_event_loop
+from crane.models import CraneOrientation
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("op",), (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.labels("read").observe(value)
+    lines = registry.render().splitlines()
+    assert lines[:2] == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+    ]
+    assert lines[2:] == [
+        'latency_seconds_bucket{op="read",le="0.1"} 2',
+        'latency_seconds_bucket{op="read",le="1.0"} 3',
+        'latency_seconds_bucket{op="read",le="+Inf"} 4',
+        'latency_seconds_sum{op="read"} 2.65',
+        'latency_seconds_count{op="read"} 4',
+    ]
+
+
+def test_counter_labels_and_removal():
+    registry = MetricsRegistry()
+    frames = registry.counter("frames_total", "Frames", ("client",))
+    frames.labels("a").inc()
+    frames.labels("a").inc(2)
+    frames.labels("b").inc()
+    assert 'frames_total{client="a"} 3.0' in registry.render()
+    frames.remove("a")
+    assert 'client="a"' not in registry.render()
+    assert 'frames_total{client="b"} 1.0' in registry.render()
+    with pytest.raises(ValueError):
+        frames.labels()
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests")
+    assert registry.counter("requests_total", "Requests") is counter
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests")
+
+
+def test_timed_function_is_observed():
+    registry = MetricsRegistry()
+    calls = registry.histogram("call_seconds", "Calls").labels()
+
+    @calls.time
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3
+    assert calls.count == 1
+    assert calls.sum >= 0
+
+
+def test_subscriber_reports_dropped_frames_until_unsubscribed():
+    broadcaster = StateBroadcaster(
+        lambda crane_ids: {"a": "snap"}, lambda snapshot, *_: snapshot, 0.1, max_queue=1
+    )
+    subscriber = broadcaster.subscribe(CraneOrientation(), {"a"})
+    for _ in range(3):
+        broadcaster.publish()
+    assert FRAMES_DROPPED.labels(subscriber.client_id).value == 2
+    broadcaster.unsubscribe(subscriber)
+    assert (subscriber.client_id,) not in FRAMES_DROPPED.values
+
+
+def test_event_loop_lag_is_recorded():
+    lag = MetricsRegistry().histogram("lag_seconds", "Lag")
+
+    async def run():
+        monitor = asyncio.create_task(monitor_event_loop(0.001, lag))
+        await asyncio.sleep(0.02)
+        monitor.cancel()
+
+    asyncio.run(run())
+    assert lag.labels().count > 0
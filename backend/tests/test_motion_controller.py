@@ -0,0 +1,122 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from crane.models import DEFAULT_CRANE, CraneState
+from crane.motion_controller import MotionController, state_to_array
+from crane.scheduler import SimulatedClock
+from crane.trajectory import ProgramTrajectory, Trajectory
+
+INITIAL_STATE = CraneState(swing=0, lift=1, elbow=0, wrist=0, gripper=0)
+
+
+def test_step_samples_planned_trajectory():
+    controller = MotionController(INITIAL_STATE, DEFAULT_CRANE)
+    target = CraneState(swing=10, lift=0, elbow=-1, wrist=0, gripper=0.05)
+    trajectory = controller.plan(target)
+    assert not controller.step(trajectory.duration / 2)
+    halfway = controller.state
+    assert halfway.swing == pytest.approx(5)
+    assert halfway.lift == pytest.approx(0.5)
+    assert halfway.elbow == pytest.approx(-0.5)
+    assert controller.step(trajectory.duration / 2)
+    assert controller.state == target
+    assert controller.trajectory is None
+
+
+def test_state_view_is_cached_until_motion():
+    controller = MotionController(INITIAL_STATE, DEFAULT_CRANE)
+    view = controller.state
+    assert controller.step(0.1)
+    assert controller.state is view
+    controller.plan(CraneState(swing=1, lift=1, elbow=0, wrist=0, gripper=0))
+    controller.step(0.05)
+    assert controller.state is not view
+    assert controller.state.swing > 0
+
+
+def test_execute_motion_reaches_target():
+    controller = MotionController(INITIAL_STATE, DEFAULT_CRANE, rate=1000)
+    target = CraneState(swing=1, lift=1.01, elbow=-1, wrist=0.5, gripper=0)
+
+    async def run():
+        await asyncio.wait_for(controller._execute_motion(target), timeout=2)
+
+    asyncio.run(run())
+    assert controller.state == target
+
+
+def test_listeners_hear_every_change_and_the_end_of_motion():
+    controller = MotionController(INITIAL_STATE, DEFAULT_CRANE, rate=1000)
+    notified = []
+    controller.listeners.append(lambda: notified.append(controller.moving))
+    target = CraneState(swing=0.5, lift=1, elbow=0, wrist=0, gripper=0)
+
+    async def run():
+        await asyncio.wait_for(controller._execute_motion(target), timeout=2)
+
+    asyncio.run(run())
+    assert len(notified) > 2
+    assert notified[0] is True
+    assert notified[-1] is False
+    assert not controller.moving
+
+
+def test_tick_listeners_hear_every_tick_even_without_motion():
+    controller = MotionController(
+        INITIAL_STATE, DEFAULT_CRANE, rate=100, clock=SimulatedClock()
+    )
+    changes, ticks = [], []
+    controller.listeners.append(lambda: changes.append(controller.elapsed))
+    controller.tick_listeners.append(lambda: ticks.append(controller.elapsed))
+    move = Trajectory(
+        state_to_array(INITIAL_STATE), state_to_array(INITIAL_STATE) + 1, 0.5, 0.0
+    )
+    # The motors hold still for the dwell at the end of the program
+    program = ProgramTrajectory([move], np.array([0.0]), dwell=0.5)
+
+    async def run():
+        await controller.apply_trajectory(program)
+        await controller._current_task
+
+    asyncio.run(run())
+    assert len(ticks) == pytest.approx(100, abs=2)
+    assert len(changes) == pytest.approx(50, abs=2)
+    assert ticks[-1] >= program.duration
+
+
+def test_segment_is_stable_and_matches_the_motion():
+    controller = MotionController(INITIAL_STATE, DEFAULT_CRANE)
+    assert controller.segment() is None
+    trajectory = controller.plan(
+        CraneState(swing=10, lift=0, elbow=-1, wrist=0, gripper=0.05)
+    )
+    controller.step(trajectory.duration / 3)
+    offset, segment = controller.segment()
+    assert segment is trajectory
+    assert segment.sample(controller.elapsed - offset) == pytest.approx(
+        controller.positions
+    )
+    controller.step(trajectory.duration / 3)
+    assert controller.segment()[1] is segment
+    controller.pause()
+    assert controller.segment() is None
+
+
+def test_set_crane_keeps_the_motion_in_progress():
+    controller = MotionController(INITIAL_STATE, DEFAULT_CRANE)
+    trajectory = controller.plan(
+        CraneState(swing=10, lift=1, elbow=0, wrist=0, gripper=0)
+    )
+    controller.step(trajectory.duration / 2)
+    version = controller.version
+    slower = DEFAULT_CRANE.model_copy(
+        update={"max_speeds": DEFAULT_CRANE.max_speeds.model_copy(update={"swing": 5})}
+    )
+    controller.set_crane(slower)
+    assert controller.version > version
+    assert controller.trajectory is trajectory
+    assert controller.max_speeds[0] == 5
+    assert controller.step(trajectory.duration / 2)
+    assert controller.state.swing == pytest.approx(10)
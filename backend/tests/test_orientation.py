@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from crane.orientation import SAMPLE_DTYPE, OrientationFilter
+
+RATE = 1000
+
+
+def samples(times, orientations):
+    result = np.empty(len(times), dtype=SAMPLE_DTYPE)
+    result["time"] = times
+    result["orientation"] = orientations
+    return result
+
+
+def turning(times, speed=10.0, start=0.0):
+    """A crane driving along x at 0.5 m/s while turning at speed degrees per second"""
+    orientations = np.zeros((len(times), 4))
+    orientations[:, 0] = 0.5 * times
+    orientations[:, 3] = start + speed * times
+    return orientations
+
+
+def test_noise_is_filtered_out():
+    rng = np.random.default_rng(0)
+    times = np.arange(2 * RATE) / RATE
+    truth = np.tile([1.0, 2.0, 0.5, 30.0], (len(times), 1))
+    noisy = truth + rng.normal(0, [0.01, 0.01, 0.01, 0.5], truth.shape)
+    orientations = OrientationFilter()
+    orientations.push("a", samples(times, noisy), received=times[-1])
+    assert orientations.update() == ["a"]
+    error = np.abs(orientations.predict(["a"], times[-1])[0] - truth[0])
+    # A third of the noise on a single sample
+    assert (error < [0.004, 0.004, 0.004, 0.2]).all()
+
+
+def test_delayed_samples_are_predicted_to_now():
+    latency = 0.1
+    orientations = OrientationFilter(latency=latency)
+    for tick in range(1, 201):
+        now = tick * 0.01
+        # Untimed samples, each taken latency seconds before it arrives
+        taken = np.array([now - latency])
+        orientations.push("a", samples([np.nan], turning(taken)), received=now)
+        orientations.update()
+    now = 2.0
+    estimate = orientations.estimate("a", now)
+    truth = turning(np.array([now]))[0]
+    last_sample = turning(np.array([now - latency]))[0]
+    assert [estimate.x, estimate.rotationZ] == pytest.approx(truth[[0, 3]], abs=1e-3)
+    assert abs(last_sample[3] - truth[3]) == pytest.approx(1.0)
+
+
+def test_turning_through_180_degrees_is_continuous():
+    times = np.arange(RATE) / RATE
+    measured = turning(times, speed=40, start=160)
+    measured[:, 3] = (measured[:, 3] + 180) % 360 - 180
+    orientations = OrientationFilter()
+    orientations.push("a", samples(times, measured), received=times[-1])
+    orientations.update()
+    estimate = orientations.predict(["a"], times[-1])[0]
+    assert estimate[3] == pytest.approx(160 + 40 * times[-1], abs=0.1)
+
+
+def test_late_samples_are_dropped():
+    orientations = OrientationFilter()
+    orientations.push("a", samples([1.0], [[1, 0, 0, 0]]), received=1.0)
+    orientations.update()
+    orientations.push("a", samples([0.5], [[5, 0, 0, 0]]), received=1.0)
+    orientations.update()
+    assert orientations.predict(["a"], 1.0)[0] == pytest.approx([1, 0, 0, 0])
+
+
+def test_stale_cranes_have_no_estimate():
+    orientations = OrientationFilter(stale_seconds=0.5)
+    assert orientations.estimate("a", 0.0) is None
+    orientations.push("a", samples([1.0], [[1, 2, 3, 4]]), received=1.0)
+    orientations.update()
+    assert orientations.estimate("a", 1.2).rotationZ == pytest.approx(4)
+    assert orientations.estimate("a", 1.6) is None
+    assert orientations.live(["a", "b"], 1.2).tolist() == [True, False]
+
+
+def test_cranes_are_filtered_independently_in_one_pass():
+    times = np.arange(500) / RATE
+    together = OrientationFilter()
+    apart = {crane_id: OrientationFilter() for crane_id in ("a", "b")}
+    for crane_id, speed, count in (("a", 10.0, 500), ("b", -30.0, 200)):
+        batch = samples(times[:count], turning(times[:count], speed))
+        together.push(crane_id, batch, received=1.0)
+        apart[crane_id].push(crane_id, batch, received=1.0)
+        apart[crane_id].update()
+    assert sorted(together.update()) == ["a", "b"]
+    for crane_id in ("a", "b"):
+        assert together.predict([crane_id], 1.0) == pytest.approx(
+            apart[crane_id].predict([crane_id], 1.0)
+        )
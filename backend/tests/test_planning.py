@@ -0,0 +1,79 @@
+import asyncio
+import math
+import threading
+
+from crane.planning import PLANNING_JOBS, PLANNING_WAIT, PlanningPool, PoolKind
+
+
+def blocking(started: threading.Event, release: threading.Event, value):
+    started.set()
+    release.wait(5)
+    return value
+
+
+def test_newer_job_supersedes_running_job():
+    pool = PlanningPool(2)
+    superseded = PLANNING_JOBS.labels("superseded").value
+
+    async def run():
+        started, release = threading.Event(), threading.Event()
+        first = pool.submit("crane", blocking, started, release, 1)
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        second = pool.submit("crane", math.hypot, 3, 4)
+        # The handler of the first job resumes without waiting for it to finish
+        assert await first is None
+        assert first.cancelled
+        assert await second == 5.0
+        release.set()
+        while pool.pending:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    pool.shutdown()
+    assert PLANNING_JOBS.labels("superseded").value == superseded + 1
+
+
+def test_queued_job_never_runs():
+    pool = PlanningPool(1)
+    ran = []
+    waits = PLANNING_WAIT.labels().count
+
+    async def run():
+        started, release = threading.Event(), threading.Event()
+        busy = pool.submit("other", blocking, started, release, None)
+        queued = pool.submit("crane", ran.append, "queued")
+        assert pool.pending == 2
+        newer = pool.submit("crane", ran.append, "newer")
+        release.set()
+        assert await queued is None
+        await busy
+        await newer
+        while pool.pending:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    pool.shutdown()
+    assert ran == ["newer"]
+    # Jobs that never started have no wait time
+    assert PLANNING_WAIT.labels().count == waits + 2
+
+
+def test_failed_job_gives_none():
+    pool = PlanningPool(1)
+
+    async def run():
+        return await pool.submit("crane", math.sqrt, -1)
+
+    assert asyncio.run(run()) is None
+    pool.shutdown()
+
+
+def test_process_pool_runs_jobs():
+    pool = PlanningPool(1, PoolKind.PROCESS)
+    assert not pool.shares_memory
+
+    async def run():
+        return await pool.submit("crane", math.hypot, 3, 4)
+
+    assert asyncio.run(run()) == 5.0
+    pool.shutdown()
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from crane.crane_service import CraneService
+from crane.models import (
+    DEFAULT_CRANE,
+    CraneState,
+    ProgramStep,
+    SwingLiftElbow,
+    XYZPosition,
+)
+from crane.motion_controller import MotionController, state_to_array
+from crane.program import plan_program
+
+CURRENT = CraneState(swing=0, lift=1, elbow=0, wrist=0, gripper=0)
+FIRST = CraneState(swing=40, lift=1.2, elbow=30, wrist=10, gripper=0.1)
+SECOND = CraneState(swing=80, lift=1.2, elbow=0, wrist=10, gripper=0.1)
+MAX_SPEEDS = state_to_array(DEFAULT_CRANE.max_speeds)
+
+
+def sample_speeds(program, n=2000):
+    times = np.linspace(0, program.duration, n)
+    return np.array([np.abs(program.velocity(t)) for t in times])
+
+
+def test_steps_run_back_to_back():
+    program = plan_program(
+        CURRENT,
+        [ProgramStep(craneState=FIRST), ProgramStep(craneState=SECOND)],
+        DEFAULT_CRANE,
+    )
+    first, second = program.segments
+    assert program.duration == pytest.approx(first.duration + second.duration)
+    assert program.sample(first.duration) == pytest.approx(state_to_array(FIRST))
+    assert program.sample(program.duration) == pytest.approx(state_to_array(SECOND))
+    assert program.step_index(first.duration / 2) == 0
+    assert program.step_index(first.duration + 0.01) == 1
+
+
+def test_dwell_holds_the_target():
+    program = plan_program(
+        CURRENT,
+        [ProgramStep(craneState=FIRST, dwell=0.5), ProgramStep(craneState=SECOND)],
+        DEFAULT_CRANE,
+    )
+    first, second = program.segments
+    assert program.duration == pytest.approx(first.duration + 0.5 + second.duration)
+    for t in (first.duration, first.duration + 0.25, first.duration + 0.5):
+        assert program.sample(t) == pytest.approx(state_to_array(FIRST))
+
+
+def test_blend_rounds_the_corner_within_speed_limits():
+    steps = [ProgramStep(craneState=FIRST), ProgramStep(craneState=SECOND)]
+    stopped = plan_program(CURRENT, steps, DEFAULT_CRANE)
+    steps[0].blendRadius = 0.2
+    blended = plan_program(CURRENT, steps, DEFAULT_CRANE)
+    assert blended.duration < stopped.duration
+    assert blended.sample(blended.duration) == pytest.approx(state_to_array(SECOND))
+    assert (sample_speeds(blended) <= MAX_SPEEDS + 1e-9).all()
+    # The motors never all come to rest between the steps
+    speeds = sample_speeds(blended)[1:-1]
+    assert (speeds.max(axis=1) > 0).all()
+
+
+def test_xyz_steps_keep_wrist_and_gripper():
+    xyz = CraneService.swing_lift_elbow_to_xyz(
+        SwingLiftElbow(swing=20, lift=1.5, elbow=40), DEFAULT_CRANE
+    )
+    program = plan_program(
+        CURRENT,
+        [ProgramStep(craneState=FIRST), ProgramStep(xyzPosition=xyz)],
+        DEFAULT_CRANE,
+    )
+    end = program.sample(program.duration)
+    assert end[3:] == pytest.approx([FIRST.wrist, FIRST.gripper])
+    reached = CraneService.swing_lift_elbow_to_xyz(
+        SwingLiftElbow(swing=end[0], lift=end[1], elbow=end[2]), DEFAULT_CRANE
+    )
+    assert [reached.x, reached.y, reached.z] == pytest.approx([xyz.x, xyz.y, xyz.z])
+
+
+@pytest.mark.parametrize(
+    "step",
+    [
+        ProgramStep(xyzPosition=XYZPosition(x=100, y=0, z=0)),
+        ProgramStep(),
+        ProgramStep(craneState=FIRST, xyzPosition=XYZPosition(x=1, y=0, z=0)),
+    ],
+)
+def test_invalid_steps_reject_the_program(step):
+    steps = [ProgramStep(craneState=FIRST), step]
+    assert plan_program(CURRENT, steps, DEFAULT_CRANE) is None
+
+
+def test_pause_brakes_to_a_stop_and_resume_continues():
+    controller = MotionController(CURRENT, DEFAULT_CRANE)
+    program = plan_program(CURRENT, [ProgramStep(craneState=FIRST)], DEFAULT_CRANE)
+    controller._start(program)
+    dt = 0.001
+    for _ in range(200):
+        controller.step(dt)
+    assert controller.pause()
+    previous = controller.positions.copy()
+    for _ in range(int(controller.stop_time / dt) + 10):
+        controller.step(dt)
+        assert (
+            (np.abs(controller.positions - previous) / dt) <= MAX_SPEEDS + 1e-9
+        ).all()
+        previous = controller.positions.copy()
+    paused_at = controller.positions.copy()
+    assert controller.time_scale == 0
+    controller.step(1.0)
+    assert (controller.positions == paused_at).all()
+    assert controller.resume()
+    while not controller.step(dt):
+        pass
+    assert controller.positions == pytest.approx(state_to_array(FIRST))
+    assert not controller.resume()
+
+
+def test_pieces_follow_the_program():
+    steps = [
+        ProgramStep(craneState=FIRST, blendRadius=0.2),
+        ProgramStep(craneState=SECOND),
+    ]
+    program = plan_program(CURRENT, steps, DEFAULT_CRANE)
+    first = program.segments[0]
+    # A single step is handed out whole, until the next step blends in
+    start, end, piece = program.piece(first.duration / 4, 0.5)
+    assert piece is first
+    assert (start, end) == (0.0, pytest.approx(program.starts[1]))
+    # A blend is approximated by a short linear move that starts and ends on the program
+    t = (program.starts[1] + program.ends[0]) / 2
+    start, end, piece = program.piece(t, 0.05)
+    assert (start, end) == (t, pytest.approx(t + 0.05))
+    assert piece.t_accel == 0
+    assert piece.sample(0) == pytest.approx(program.sample(t))
+    assert piece.sample(0.05) == pytest.approx(program.sample(t + 0.05))
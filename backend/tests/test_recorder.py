@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from crane.crane_service import CraneService
+from crane.models import DEFAULT_CRANE
+from crane.recorder import Recorder, read_recording, replay
+
+
+def record_session(path, n=10, batch_size=4):
+    recorder = Recorder(path, DEFAULT_CRANE, batch_size=batch_size)
+    target = np.array([90.0, 2, 45, 0, 0.1])
+    states = np.column_stack(
+        [
+            np.linspace(0, 90, n),
+            np.full(n, 1.5),
+            np.linspace(0, 45, n),
+            np.zeros((n, 2)),
+        ]
+    )
+    for i, state in enumerate(states):
+        recorder.record(1000 + i * 0.01, target, state)
+    recorder.close()
+    return target, states
+
+
+def test_records_round_trip_through_memory_map(tmp_path):
+    path = tmp_path / "session.crec"
+    target, states = record_session(path)
+    records = read_recording(path)
+    assert isinstance(records, np.memmap)
+    assert len(records) == 10
+    assert records["time"] == pytest.approx(1000 + np.arange(10) * 0.01)
+    assert (records["target"] == target).all()
+    assert (records["state"] == states).all()
+    xyz = CraneService.swing_lift_elbow_to_xyz_batch(states[:, :3], DEFAULT_CRANE)
+    assert records["xyz"] == pytest.approx(xyz)
+
+
+def test_records_use_the_crane_they_were_taken_with(tmp_path):
+    path = tmp_path / "session.crec"
+    longer = DEFAULT_CRANE.model_copy(
+        update={"upper_arm": DEFAULT_CRANE.upper_arm.model_copy(update={"width": 1.5})}
+    )
+    recorder = Recorder(path, DEFAULT_CRANE, batch_size=8)
+    state = np.array([0.0, 1.5, 0, 0, 0])
+    recorder.record(1000, state, state)
+    recorder.set_crane(longer)
+    recorder.record(1001, state, state)
+    recorder.close()
+    records = read_recording(path)
+    assert records["xyz"][:, 0] == pytest.approx([2.0, 2.5])
+
+
+def test_partial_record_is_ignored(tmp_path):
+    path = tmp_path / "session.crec"
+    record_session(path, n=3, batch_size=8)
+    with open(path, "ab") as file:
+        file.write(b"\0" * 20)
+    assert len(read_recording(path)) == 3
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        read_recording(path)
+
+
+def test_replay_ends_on_last_record_faster_than_real_time(tmp_path):
+    path = tmp_path / "session.crec"
+    _, states = record_session(path, n=50)
+    applied = []
+    start = time.monotonic()
+    asyncio.run(replay(read_recording(path), applied.append, speed=5))
+    # 0.49 s of recording played back at 5x
+    assert time.monotonic() - start < 0.3
+    assert (applied[-1] == states[-1]).all()
+    assert 1 < len(applied) < 50
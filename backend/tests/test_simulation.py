@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from crane.models import DEFAULT_CRANE, CraneState
+from crane.motion_controller import MotionController, state_to_array
+from crane.scheduler import FixedRateScheduler, SimulatedClock
+from crane.simulation import run_scenarios, simulate, summarize
+
+
+def test_simulated_clock_ticks_without_waiting():
+    clock = SimulatedClock()
+
+    async def run():
+        ticks = []
+        async for time_diff in FixedRateScheduler(10, clock).ticks():
+            ticks.append(time_diff)
+            if len(ticks) == 100:
+                return ticks
+
+    start = time.monotonic()
+    ticks = asyncio.run(run())
+    assert time.monotonic() - start < 0.5
+    assert ticks[1:] == pytest.approx([0.1] * 99)
+    assert clock.time() == pytest.approx(9.9)
+
+
+def test_long_move_completes_on_simulated_clock():
+    clock = SimulatedClock(cooperative=False)
+    start = CraneState(swing=0, lift=1, elbow=0, wrist=0, gripper=0)
+    target = CraneState(swing=300, lift=2, elbow=0, wrist=0, gripper=0)
+    controller = MotionController(start, DEFAULT_CRANE, rate=100, clock=clock)
+    trajectory_duration = controller.plan(target).duration
+    assert trajectory_duration > 30
+
+    async def run():
+        motion = await controller.apply_motion(target, max_duration=60)
+        await motion
+
+    asyncio.run(run())
+    assert controller.positions == pytest.approx(state_to_array(target))
+    assert clock.time() == pytest.approx(trajectory_duration, abs=0.011)
+
+
+def test_scenarios_are_reproducible():
+    first = run_scenarios(DEFAULT_CRANE, np.random.SeedSequence(1), 5, max_duration=60)
+    second = run_scenarios(DEFAULT_CRANE, np.random.SeedSequence(1), 5, max_duration=60)
+    assert (first["cycle_time"] == second["cycle_time"]).all()
+    assert (first["accepted"] == second["accepted"]).all()
+    accepted = first["accepted"]
+    assert first["joint_error"][accepted].max() == pytest.approx(0)
+    assert first["xyz_error"][accepted].max() == pytest.approx(0)
+
+
+def test_simulate_reports_summary_across_processes():
+    results = simulate(DEFAULT_CRANE, 6, max_duration=5, workers=2)
+    summary = summarize(results, max_duration=5)
+    assert summary["scenarios"] == 6
+    assert summary["cycle_time"]["max"] <= 5.01
+    # Random moves across the whole range rarely finish in 5 seconds
+    assert summary["timed_out"] > 0
+    assert summary["max_xyz_error"] > 0
+
+
+def test_summary_of_only_rejected_moves_has_counts():
+    results = {
+        "accepted": np.zeros(3, dtype=bool),
+        "cycle_time": np.zeros(3),
+        "joint_error": np.zeros((3, 5)),
+        "xyz_error": np.zeros(3),
+    }
+    assert summarize(results, max_duration=5) == {"scenarios": 3, "rejected": 3}
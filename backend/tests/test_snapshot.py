@@ -0,0 +1,60 @@
+import json
+
+from crane.models import (
+    CraneState,
+    MotionSegment,
+    ProgramProgress,
+    Response,
+    Status,
+    XYZPosition,
+)
+from crane.snapshot import StateSnapshot
+
+
+def make_response(**fields):
+    return Response(
+        craneId='crane-"1"',
+        craneState=CraneState(swing=1e-7, lift=2, elbow=-45.5, wrist=0, gripper=0.1),
+        **fields,
+    )
+
+
+def test_json_matches_response():
+    responses = [
+        make_response(status=Status.STOPPED, success=True),
+        make_response(
+            xyzPosition=XYZPosition(x=1.25, y=-0.5, z=3),
+            program=ProgramProgress(step=1, steps=3),
+            errorMessage='Step "2" is out of reach',
+            status=Status.ERROR,
+            success=False,
+        ),
+        make_response(
+            status=Status.MOVING,
+            success=True,
+            time=1234.5,
+            segment=MotionSegment(
+                startTime=1234.0,
+                duration=2.5,
+                accelTime=0.5,
+                start=CraneState(swing=0, lift=1, elbow=0, wrist=0, gripper=0),
+                end=CraneState(swing=90, lift=2, elbow=-30, wrist=10, gripper=0.1),
+            ),
+        ),
+    ]
+    for response in responses:
+        snapshot = StateSnapshot.from_response(response)
+        assert json.loads(snapshot.to_json()) == json.loads(response.model_dump_json())
+        assert snapshot.to_response() == response
+
+
+def test_with_xyz_keeps_motors_and_version():
+    snapshot = StateSnapshot(
+        "default", (10.0, 2.0, 30.0, 0.0, 0.0), Status.MOVING, version=7
+    )
+    assert not snapshot.has_xyz
+    located = snapshot.with_xyz((1.0, 2.0, 3.0))
+    assert located.has_xyz
+    assert located.values == (10.0, 2.0, 30.0, 0.0, 0.0, 1.0, 2.0, 3.0)
+    assert located.version == 7
+    assert (located.swing, located.lift, located.elbow) == (10.0, 2.0, 30.0)
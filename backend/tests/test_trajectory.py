@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from crane.trajectory import ProgramTrajectory, Trajectory, WaypointTrajectory
+
+MAX_SPEEDS = np.array([10, 0.2, 10, 10, 0.1])
+MAX_ACCELERATIONS = np.array([20, 0.4, 20, 20, 0.2])
+
+
+@pytest.mark.parametrize(
+    "end",
+    [
+        [90, 0, 0, 0, 0],  # long swing move, trapezoid
+        [1, 0, 0, 0, 0],  # short swing move, triangle
+        [90, 2, -45, 30, 0.5],  # all axes, lift limited
+        [5, 0.5, 0, 0, 0.01],  # velocity and acceleration limits from different axes
+    ],
+)
+def test_profile_is_synchronized_and_within_limits(end):
+    start = np.zeros(5)
+    end = np.array(end, dtype=float)
+    trajectory = Trajectory.plan(start, end, MAX_SPEEDS, MAX_ACCELERATIONS)
+    times = np.linspace(0, trajectory.duration, 2001)
+    positions = np.array([trajectory.sample(t) for t in times])
+    velocities = np.diff(positions, axis=0) / np.diff(times)[:, None]
+    accelerations = np.diff(velocities, axis=0) / np.diff(times)[1:, None]
+
+    assert positions[0] == pytest.approx(start)
+    assert positions[-1] == pytest.approx(end)
+    assert (np.abs(velocities) <= MAX_SPEEDS * (1 + 1e-6)).all()
+    # Finite differences smear the acceleration steps, so allow some slack
+    assert (np.abs(accelerations) <= MAX_ACCELERATIONS * 1.05).all()
+    # All axes progress together
+    moving = end != start
+    progress = (positions[:, moving] - start[moving]) / (end - start)[moving]
+    assert np.ptp(progress, axis=1) == pytest.approx(0, abs=1e-9)
+    # A limit is reached, so the move cannot be any faster
+    peak_velocity = np.abs(trajectory.velocity(trajectory.duration / 2))
+    peak_acceleration = np.abs(end - start) / (
+        trajectory.t_accel * (trajectory.duration - trajectory.t_accel)
+    )
+    assert max(
+        (peak_velocity / MAX_SPEEDS).max(),
+        (peak_acceleration / MAX_ACCELERATIONS).max(),
+    ) == pytest.approx(1)
+
+
+def test_single_axis_durations():
+    trapezoid = Trajectory.plan(
+        np.zeros(5), np.array([90, 0, 0, 0, 0]), MAX_SPEEDS, MAX_ACCELERATIONS
+    )
+    # 90 / 10 cruising plus 10 / 20 lost to acceleration and deceleration
+    assert trapezoid.duration == pytest.approx(9.5)
+    triangle = Trajectory.plan(
+        np.zeros(5), np.array([1, 0, 0, 0, 0]), MAX_SPEEDS, MAX_ACCELERATIONS
+    )
+    assert triangle.duration == pytest.approx(2 * np.sqrt(1 / 20))
+    assert triangle.velocity(triangle.duration / 2)[0] == pytest.approx(np.sqrt(20 * 1))
+
+
+def test_no_motion():
+    trajectory = Trajectory.plan(np.ones(5), np.ones(5), MAX_SPEEDS, MAX_ACCELERATIONS)
+    assert trajectory.duration == 0
+    assert trajectory.sample(0) == pytest.approx(np.ones(5))
+
+
+def test_zero_acceleration_time_is_constant_velocity():
+    line = Trajectory(np.zeros(5), np.full(5, 2.0), 4.0, 0.0)
+    assert line.sample(1.0) == pytest.approx(np.full(5, 0.5))
+    assert line.velocity(3.0) == pytest.approx(np.full(5, 0.5))
+    assert line.sample(4.0) == pytest.approx(np.full(5, 2.0))
+
+
+def waypoint_path():
+    waypoints = np.array([[0, 0, 0, 0, 0], [10, 0.1, 0, 0, 0], [10, 0.2, 20, 0, 0]])
+    return WaypointTrajectory.from_limits(waypoints, MAX_SPEEDS, MAX_ACCELERATIONS)
+
+
+def blended_program():
+    first = Trajectory.plan(
+        np.zeros(5), np.array([30, 0, 0, 0, 0.0]), MAX_SPEEDS, MAX_ACCELERATIONS
+    )
+    second = Trajectory.plan(
+        first.end, np.array([30, 0, 45, 0, 0.0]), MAX_SPEEDS, MAX_ACCELERATIONS
+    )
+    # The second move starts half a second before the first ends, and a dwell follows
+    return ProgramTrajectory([first, second], np.array([0, first.duration - 0.5]), 1.0)
+
+
+@pytest.mark.parametrize(
+    "trajectory",
+    [
+        Trajectory.plan(
+            np.zeros(5), np.array([90, 2, -45, 30, 0.5]), MAX_SPEEDS, MAX_ACCELERATIONS
+        ),
+        Trajectory(np.zeros(5), np.full(5, 2.0), 4.0, 0.0),
+        Trajectory.plan(np.ones(5), np.ones(5), MAX_SPEEDS, MAX_ACCELERATIONS),
+        waypoint_path(),
+        blended_program(),
+    ],
+)
+def test_sample_batch_matches_sample(trajectory):
+    times = np.linspace(-1, trajectory.duration + 1, 501)
+    expected = np.array([trajectory.sample(t) for t in times])
+    assert trajectory.sample_batch(times) == pytest.approx(expected, abs=1e-9)
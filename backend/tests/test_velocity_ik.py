@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from crane.crane_service import CraneService
+from crane.models import DEFAULT_CRANE, CraneOrientation, SwingLiftElbow, XYZPosition
+from crane.velocity_ik import damped_least_squares, track
+
+ORIENTATION = CraneOrientation(x=0.3, y=-0.2, z=0.5, rotationZ=25)
+
+
+@pytest.mark.parametrize("orientation", [None, ORIENTATION])
+def test_jacobian_matches_finite_differences(orientation):
+    rng = np.random.default_rng(0)
+    joints = rng.uniform([-180, 0, -150], [180, 3, 150], size=(20, 3))
+    jacobians = CraneService.swing_lift_elbow_jacobian_batch(
+        joints, DEFAULT_CRANE, orientation
+    )
+    step = 1e-6
+    for j in range(3):
+        offset = np.zeros(3)
+        offset[j] = step
+        forward = CraneService.swing_lift_elbow_to_xyz_batch(
+            joints + offset, DEFAULT_CRANE, orientation
+        )
+        backward = CraneService.swing_lift_elbow_to_xyz_batch(
+            joints - offset, DEFAULT_CRANE, orientation
+        )
+        assert jacobians[:, :, j] == pytest.approx((forward - backward) / (2 * step))
+
+
+def test_jacobian_is_singular_when_arm_is_straight():
+    jacobians = CraneService.swing_lift_elbow_jacobian_batch(
+        np.array([[30, 1, 0], [30, 1, 90]]), DEFAULT_CRANE
+    )
+    k = np.pi / 180
+    assert np.linalg.det(jacobians) == pytest.approx([0, -(k**2)], abs=1e-12)
+
+
+def test_closest_branch_keeps_current_elbow_and_turn():
+    current = SwingLiftElbow(swing=370, lift=1, elbow=-40)
+    xyz = CraneService.swing_lift_elbow_to_xyz(
+        SwingLiftElbow(swing=12, lift=1.1, elbow=-45), DEFAULT_CRANE
+    )
+    default = CraneService.xyz_to_swing_lift_elbow(xyz, DEFAULT_CRANE)
+    assert default.elbow == pytest.approx(45)
+    closest = CraneService.xyz_to_swing_lift_elbow(
+        xyz, DEFAULT_CRANE, closest_to=current
+    )
+    assert [closest.swing, closest.lift, closest.elbow] == pytest.approx(
+        [372, 1.1, -45]
+    )
+
+    batch, reachable = CraneService.xyz_to_swing_lift_elbow_batch(
+        np.array([[xyz.x, xyz.y, xyz.z], [10, 0, 0]]),
+        DEFAULT_CRANE,
+        closest_to=np.array([370, 1, -40]),
+    )
+    assert reachable.tolist() == [True, False]
+    assert batch[0] == pytest.approx([372, 1.1, -45])
+    assert np.isnan(batch[1]).all()
+
+
+def test_damped_least_squares_is_exact_away_from_singularities():
+    joints = np.array([[30, 1, 60], [-100, 2, -90]])
+    jacobians = CraneService.swing_lift_elbow_jacobian_batch(joints, DEFAULT_CRANE)
+    velocities = np.array([[0.1, -0.05, 0.2], [-0.3, 0.1, 0.0]])
+    joint_velocities = damped_least_squares(jacobians, velocities)
+    assert (jacobians @ joint_velocities[..., None])[..., 0] == pytest.approx(
+        velocities
+    )
+
+
+def test_damped_least_squares_stays_bounded_at_singularity():
+    jacobians = CraneService.swing_lift_elbow_jacobian_batch(
+        np.array([[0, 1, 1e-9]]), DEFAULT_CRANE
+    )
+    # Pulling the stretched arm outwards asks for an impossible velocity
+    joint_velocities = damped_least_squares(jacobians, np.array([[1.0, 0, 0]]))
+    assert np.isfinite(joint_velocities).all()
+    assert np.abs(joint_velocities).max() < 1e3
+
+
+@pytest.mark.parametrize("orientation", [None, ORIENTATION])
+def test_track_follows_moving_target_on_its_branch(orientation):
+    joints = np.array([[20.0, 1.5, -60]])
+    start = CraneService.swing_lift_elbow_to_xyz_batch(
+        joints, DEFAULT_CRANE, orientation
+    )
+    velocity = np.array([[0.02, 0.01, -0.03]])
+    dt = 0.01
+    max_speeds = np.array([10, 0.2, 10])
+    for tick in range(1, 301):
+        target = start + velocity * tick * dt
+        previous = joints
+        joints = track(
+            joints, target, dt, DEFAULT_CRANE, orientation, target_velocities=velocity
+        )
+        assert (np.abs(joints - previous) / dt <= max_speeds + 1e-9).all()
+        assert joints[0, 2] < 0
+    reached = CraneService.swing_lift_elbow_to_xyz_batch(
+        joints, DEFAULT_CRANE, orientation
+    )
+    assert reached == pytest.approx(target, abs=1e-3)
+    expected = CraneService.xyz_to_swing_lift_elbow(
+        XYZPosition(x=target[0, 0], y=target[0, 1], z=target[0, 2]),
+        DEFAULT_CRANE,
+        orientation,
+        closest_to=SwingLiftElbow(swing=20, lift=1.5, elbow=-60),
+    )
+    assert joints[0] == pytest.approx(
+        [expected.swing, expected.lift, expected.elbow], abs=0.1
+    )
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from crane.models import CraneState, Response, Status, XYZPosition
+from crane.snapshot import StateSnapshot
+from crane.trajectory import Trajectory
+from crane.wire import FIELDS, BinaryEncoder, FrameKind, decode_frame
+
+
+def make_response(status=Status.STOPPED, swing=0.0, x=2.0, error=None, version=None):
+    response = Response(
+        craneId="crane-1",
+        craneState=CraneState(swing=swing, lift=2, elbow=0, wrist=0, gripper=0.1),
+        xyzPosition=XYZPosition(x=x, y=1.5, z=0),
+        status=status,
+        success=error is None,
+        errorMessage=error,
+    )
+    return StateSnapshot.from_response(response, version)
+
+
+def test_full_frame_round_trip():
+    frame = BinaryEncoder().encode("key", make_response(Status.MOVING, swing=12.5))
+    decoded = decode_frame(frame)
+    assert decoded["kind"] == FrameKind.FULL
+    assert decoded["craneId"] == "crane-1"
+    assert decoded["status"] == Status.MOVING
+    assert decoded["success"]
+    assert decoded["errorMessage"] is None
+    assert list(decoded["values"]) == list(FIELDS)
+    assert decoded["values"]["swing"] == 12.5
+    assert decoded["values"]["gripper"] == pytest.approx(0.1)
+    assert len(frame) < len(make_response().to_json())
+
+
+def test_stopped_frames_are_deltas_until_keyframe():
+    encoder = BinaryEncoder(keyframe_interval=2)
+    frames = [decode_frame(encoder.encode("key", make_response())) for _ in range(4)]
+    assert [frame["kind"] for frame in frames] == [
+        FrameKind.FULL,
+        FrameKind.DELTA,
+        FrameKind.DELTA,
+        FrameKind.FULL,
+    ]
+    assert frames[1]["values"] == {}
+    assert [frame["sequence"] for frame in frames] == [1, 2, 3, 4]
+
+    changed = decode_frame(encoder.encode("key", make_response(x=3.0)))
+    assert changed["kind"] == FrameKind.DELTA
+    assert changed["values"] == {"x": 3.0}
+
+
+def test_moving_frames_are_always_full():
+    encoder = BinaryEncoder()
+    encoder.encode("key", make_response())
+    frame = decode_frame(encoder.encode("key", make_response(Status.MOVING)))
+    assert frame["kind"] == FrameKind.FULL
+    # First stopped frame after moving is full so clients see the final position
+    frame = decode_frame(encoder.encode("key", make_response()))
+    assert frame["kind"] == FrameKind.FULL
+
+
+def test_error_message_round_trip():
+    frame = BinaryEncoder().encode(
+        "key", make_response(Status.ERROR, error="Out of reach")
+    )
+    decoded = decode_frame(frame)
+    assert decoded["errorMessage"] == "Out of reach"
+    assert not decoded["success"]
+
+
+def test_unchanged_version_is_an_empty_delta():
+    encoder = BinaryEncoder()
+    encoder.encode("key", make_response(version=1))
+    # Same version, so the fields are not compared
+    same = decode_frame(encoder.encode("key", make_response(x=3.0, version=1)))
+    assert same["kind"] == FrameKind.DELTA
+    assert same["values"] == {}
+    changed = decode_frame(encoder.encode("key", make_response(x=3.0, version=2)))
+    assert changed["values"] == {}
+    moved = decode_frame(encoder.encode("key", make_response(x=4.0, version=3)))
+    assert moved["values"] == {"x": 4.0}
+
+
+def test_time_and_segment_round_trip():
+    snapshot = make_response(Status.MOVING)
+    snapshot.time = 12.5
+    snapshot.segment = (
+        12.0,
+        Trajectory(np.zeros(5), np.array([10.0, 2, -5, 0, 0.1]), 2.0, 0.5),
+    )
+    decoded = decode_frame(BinaryEncoder().encode("key", snapshot))
+    assert decoded["time"] == 12.5
+    assert decoded["segment"]["startTime"] == 12.0
+    assert decoded["segment"]["accelTime"] == 0.5
+    assert decoded["segment"]["end"]["elbow"] == -5
+    assert decoded["craneId"] == "crane-1"
+    assert (
+        decode_frame(BinaryEncoder().encode("key", make_response()))["segment"] is None
+    )
@@ -0,0 +1,48 @@
+import numpy as np
+
+from crane.models import DEFAULT_CRANE, CraneOrientation, XYZPosition
+from crane.workspace import BOUNDARY, INSIDE, WorkspaceIndex, reachable_and_valid
+
+
+def test_index_matches_exact_check(tmp_path):
+    orientation = CraneOrientation(x=0.3, y=0.5, z=1, rotationZ=10)
+    index = WorkspaceIndex.for_crane(DEFAULT_CRANE, resolution=0.1, cache_dir=tmp_path)
+    xyz = np.random.default_rng(0).uniform(-3, 4, size=(5000, 3))
+    expected = reachable_and_valid(xyz, DEFAULT_CRANE, orientation)
+    assert expected.any() and not expected.all()
+    assert (index.contains_batch(xyz, orientation) == expected).all()
+    for row, ok in zip(xyz[:200], expected):
+        position = XYZPosition(x=row[0], y=row[1], z=row[2])
+        assert index.contains(position, orientation) == ok
+    # Most lookups are answered by the grid alone
+    assert (index.cells == INSIDE).sum() > (index.cells == BOUNDARY).sum()
+
+
+def test_index_is_cached_on_disk(tmp_path):
+    crane = DEFAULT_CRANE.model_copy(
+        update={"column": DEFAULT_CRANE.column.model_copy(update={"height": 2.5})}
+    )
+    built = WorkspaceIndex.for_crane(crane, resolution=0.2, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("workspace-*.npz"))) == 1
+    WorkspaceIndex._cache.clear()
+    loaded = WorkspaceIndex.for_crane(crane, resolution=0.2, cache_dir=tmp_path)
+    assert loaded is not built
+    assert (loaded.cells == built.cells).all()
+    assert (loaded.lower == built.lower).all()
+
+
+def test_corrupt_cache_is_rebuilt(tmp_path):
+    crane = DEFAULT_CRANE.model_copy(
+        update={"column": DEFAULT_CRANE.column.model_copy(update={"height": 2.4})}
+    )
+    built = WorkspaceIndex.for_crane(crane, resolution=0.2, cache_dir=tmp_path)
+    (path,) = tmp_path.glob("workspace-*.npz")
+    path.write_bytes(b"PK\x03\x04garbage")
+    WorkspaceIndex._cache.clear()
+    rebuilt = WorkspaceIndex.for_crane(crane, resolution=0.2, cache_dir=tmp_path)
+    assert (rebuilt.cells == built.cells).all()
+    # The rebuilt index replaced the corrupt file, and no temporary files are left
+    assert [file.name for file in tmp_path.iterdir()] == [path.name]
+    WorkspaceIndex._cache.clear()
+    loaded = WorkspaceIndex.for_crane(crane, resolution=0.2, cache_dir=tmp_path)
+    assert (loaded.cells == built.cells).all()
@@ -1,5 +1,5 @@
 import { useEffect, useState, useRef } from "react";
-import { WebSocketMessage, Response, Status } from "../types/messages";
+import { WebSocketMessage, Response, Status, CraneConfig, CraneConfigMessage } from "../types/messages";
 import { CraneState } from "../types/crane";
 
 const DEFAULT_CRANE_STATE: CraneState = {
@@ -14,6 +14,7 @@ export default function useWebSocket() {
     const [craneState, setCraneState] = useState<CraneState>(DEFAULT_CRANE_STATE);
     const [errorMessage, setErrorMessage] = useState<string | null>(null);
     const [status, setStatus] = useState<Status>(Status.STOPPED);
+    const [craneConfig, setCraneConfig] = useState<CraneConfig | null>(null);
     const wsRef = useRef<WebSocket | null>(null);
 
     useEffect(() => {
@@ -22,8 +23,14 @@ export default function useWebSocket() {
         wsRef.current.onmessage = (event) => {
             console.log("Received message:", event.data);
             try {
-                const data: Response = JSON.parse(event.data);
-                
+                const message: Response | CraneConfigMessage = JSON.parse(event.data);
+                if ('type' in message && message.type === 'crane_config') {
+                    // The controls drive the default crane
+                    setCraneConfig(message.cranes.default ?? null);
+                    return;
+                }
+                const data = message as Response;
+
                 if (data.status === Status.ERROR) {
                     setErrorMessage(data.errorMessage || "The request failed with missing message");
                     return;
@@ -63,5 +70,5 @@ export default function useWebSocket() {
         }
     };
 
-    return { craneState, sendCommand, errorMessage, status };
+    return { craneState, sendCommand, errorMessage, status, craneConfig };
 }
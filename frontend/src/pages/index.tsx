@@ -1,5 +1,5 @@
 import useWebSocket from "../hooks/useWebSocket";
-import Crane from "../threejs/Crane";
+import Crane, { dimensionsFromConfig } from "../threejs/Crane";
 import MotorControls from "../components/MotorControls";
 import OrientationControls from "../components/OrientationControls";
 import XYZPositionControl from "../components/XYZPositionControl";
@@ -8,7 +8,7 @@ import { CraneOrientation, XYZPosition } from "../types/crane";
 import { CraneStateMessage, Status } from "../types/messages";
 
 export default function Page() {
-    const { craneState, sendCommand, errorMessage, status } = useWebSocket();
+    const { craneState, sendCommand, errorMessage, status, craneConfig } = useWebSocket();
     const [orientation, setOrientation] = useState<CraneOrientation>({
         x: 0,
         y: 0,
@@ -70,6 +70,7 @@ export default function Page() {
             <Crane 
                 craneState={craneState} 
                 orientation={orientation} 
+                dimensions={craneConfig ? dimensionsFromConfig(craneConfig) : undefined}
                 targetPosition={targetPosition}
             />
         </div>
@@ -4,6 +4,7 @@ import { useFrame } from "@react-three/fiber";
 import { useControls } from "leva"; // For debugging movements
 import React from 'react';
 import { CraneOrientation, CraneState, XYZPosition } from '../types/crane';
+import { CraneConfig, CylinderConfig } from '../types/messages';
 import { Text } from '@react-three/drei';
 
 // Define the dimensions interface
@@ -45,9 +46,7 @@ interface CraneDimensions {
     };
 }
 
-// Default dimensions
-// TODO these should be received from the backend
-// This needs to be kept in sync with the DEFAULT_CRANE in backend/src/crane/models.py
+// Shown until the backend sends the crane config on connect
 const DEFAULT_DIMENSIONS: CraneDimensions = {
     base: {
         radius: 0.5,
@@ -86,6 +85,19 @@ const DEFAULT_DIMENSIONS: CraneDimensions = {
     }
 };
 
+export function dimensionsFromConfig(config: CraneConfig): CraneDimensions {
+    const cylinder = ({ radius, height, segment }: CylinderConfig) => ({ radius, height, segments: segment });
+    return {
+        base: cylinder(config.base),
+        column: config.column,
+        upperArm: config.upper_arm,
+        upperSpacer: cylinder(config.upper_spacer),
+        lowerArm: config.lower_arm,
+        lowerSpacer: cylinder(config.lower_spacer),
+        gripper: config.gripper,
+    };
+}
+
 // Add this constant at the top with other constants
 const GLOBAL_SCALE = 6;
 
@@ -1,15 +1,17 @@
 import { CraneOrientation, XYZPosition, CraneState } from './crane';
 
-export type MessageType = 'crane_state' | 'xyz_position';
+export type MessageType = 'crane_state' | 'xyz_position' | 'subscribe' | 'program' | 'program_control';
 export enum Status {
     MOVING = 'moving',
     STOPPED = 'stopped',
-    ERROR = 'error'
+    ERROR = 'error',
+    PAUSED = 'paused'
 }
 
 export interface BaseMessage {
     type: MessageType;
     orientation: CraneOrientation;
+    craneId?: string;
 }
 
 export interface CraneStateMessage extends BaseMessage {
@@ -22,13 +24,94 @@ export interface XYZPositionMessage extends BaseMessage {
     target: XYZPosition;
 }
 
-export type WebSocketMessage = CraneStateMessage | XYZPositionMessage;
+export interface SubscribeMessage {
+    type: 'subscribe';
+    craneIds: string[];
+}
+
+export interface ProgramStep {
+    craneState?: CraneState;
+    xyzPosition?: XYZPosition;
+    blendRadius?: number;
+    dwell?: number;
+}
+
+export interface ProgramMessage extends BaseMessage {
+    type: 'program';
+    steps: ProgramStep[];
+}
+
+export interface ProgramControlMessage {
+    type: 'program_control';
+    craneId?: string;
+    command: 'pause' | 'resume' | 'abort';
+}
+
+export interface ProgramProgress {
+    step: number;
+    steps: number;
+}
+
+export type WebSocketMessage =
+    | CraneStateMessage
+    | XYZPositionMessage
+    | SubscribeMessage
+    | ProgramMessage
+    | ProgramControlMessage;
+
+// Motors move from start to end over duration seconds from startTime on the server clock,
+// accelerating for accelTime and decelerating for accelTime; 0 is constant velocity
+export interface MotionSegment {
+    startTime: number;
+    duration: number;
+    accelTime: number;
+    start: CraneState;
+    end: CraneState;
+}
 
 export interface Response {
+    craneId?: string;
     craneState?: CraneState;
     xyzPosition?: XYZPosition;
+    program?: ProgramProgress;
     targetState?: CraneState;
     targetXyzPostion?: XYZPosition;
     status: Status;
     errorMessage?: string;
-} 
\ No newline at end of file
+    // Monotonic server clock when the state was taken, in seconds
+    time?: number;
+    segment?: MotionSegment;
+} 
+
+export interface CylinderConfig {
+    radius: number;
+    height: number;
+    segment: number;
+}
+
+export interface BoxConfig {
+    width: number;
+    height: number;
+    depth: number;
+}
+
+// A crane as configured in the backend, see Crane in backend/src/crane/models.py
+export interface CraneConfig {
+    max_speeds: CraneState;
+    max_accelerations: CraneState;
+    base: CylinderConfig;
+    column: BoxConfig;
+    upper_arm: BoxConfig;
+    upper_spacer: CylinderConfig;
+    lower_arm: BoxConfig;
+    lower_spacer: CylinderConfig;
+    gripper: BoxConfig;
+    min_positions?: CraneState | null;
+    max_positions?: CraneState | null;
+}
+
+// Sent by the server on connect and whenever a crane config is reloaded
+export interface CraneConfigMessage {
+    type: 'crane_config';
+    cranes: Record<string, CraneConfig>;
+}